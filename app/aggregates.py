@@ -0,0 +1,283 @@
+"""
+Materialized rating aggregates.
+
+``rating_aggregates`` keeps count, sum, min and max of all ratings overall, per
+type and per generation, and ``rating_histogram`` keeps per-bucket counts for
+the same scopes. ``crud.create_or_update_rating`` calls
+:func:`apply_rating_change` in its own transaction, so the statistics endpoints
+read a handful of rows instead of scanning ``ratings``.
+
+Writes that bypass crud (the bulk importer, manual SQL) should finish with
+:func:`rebuild`; :func:`check_consistency` compares the stored values with a
+full recomputation.
+"""
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+
+OVERALL = ("overall", "")
+CATALOGUE = ("catalogue", "")
+
+Scope = Tuple[str, str]
+
+
+def rating_bucket(rating: float) -> int:
+    return math.floor(rating)
+
+
+def scopes_for(pokemon) -> List[Scope]:
+    """The aggregate scopes a rating of ``pokemon`` counts towards."""
+    scopes = [OVERALL, ("type", pokemon.type1), ("generation", str(pokemon.generation))]
+    if pokemon.type2 and pokemon.type2 != pokemon.type1:
+        scopes.append(("type", pokemon.type2))
+    return scopes
+
+
+def _scope_filter(scope: Scope):
+    kind, key = scope
+    if kind == "type":
+        return or_(models.Pokemon.type1 == key, models.Pokemon.type2 == key)
+    if kind == "generation":
+        return models.Pokemon.generation == int(key)
+    return None
+
+
+def _bump(db: Session, model, match: dict, values: dict):
+    """Apply ``SET col = col + delta`` to the row matching ``match``, creating it if missing."""
+    table = model.__table__
+    conditions = [table.c[column] == value for column, value in match.items()]
+    result = db.execute(
+        update(table).where(*conditions).values({column: table.c[column] + delta for column, delta in values.items()})
+    )
+    if result.rowcount == 0:
+        db.execute(insert(table).values(**match, **values))
+
+
+def _recompute_extremes(db: Session, scope: Scope):
+    query = select(func.min(models.Rating.rating), func.max(models.Rating.rating)).join(
+        models.Pokemon, models.Rating.pokemon_id == models.Pokemon.id
+    )
+    condition = _scope_filter(scope)
+    if condition is not None:
+        query = query.where(condition)
+    low, high = db.execute(query).one()
+    db.execute(
+        update(models.RatingAggregate)
+        .where(models.RatingAggregate.scope == scope[0], models.RatingAggregate.key == scope[1])
+        .values(min_rating=low, max_rating=high)
+    )
+
+
+def apply_rating_change(db: Session, pokemon, old_rating: Optional[float], new_rating: float):
+    """Fold a new or changed rating into the aggregates without committing.
+
+    ``old_rating`` is the value being replaced, or ``None`` for a new rating.
+    The changed rating must already be flushed, since removing the current
+    minimum or maximum of a scope recomputes that scope's extremes.
+    """
+    apply_rating_changes(db, [(pokemon, old_rating, new_rating)])
+
+
+def apply_rating_changes(db: Session, changes: Iterable[Tuple[object, Optional[float], float]]):
+    """Fold many ``(pokemon, old_rating, new_rating)`` changes in with one update per scope.
+
+    Same contract as :func:`apply_rating_change`; used by the batch rating endpoint.
+    """
+    totals: Dict[Scope, dict] = {}
+    buckets: Dict[Tuple[Scope, int], int] = defaultdict(int)
+    for pokemon, old_rating, new_rating in changes:
+        if old_rating == new_rating:
+            continue
+        for scope in scopes_for(pokemon):
+            entry = totals.setdefault(scope, {"count": 0, "total": 0.0, "low": new_rating, "high": new_rating, "removed": set()})
+            entry["count"] += 0 if old_rating is not None else 1
+            entry["total"] += new_rating - (old_rating or 0.0)
+            entry["low"] = min(entry["low"], new_rating)
+            entry["high"] = max(entry["high"], new_rating)
+            buckets[(scope, rating_bucket(new_rating))] += 1
+            if old_rating is not None:
+                buckets[(scope, rating_bucket(old_rating))] -= 1
+                entry["removed"].add(old_rating)
+
+    aggregate = models.RatingAggregate.__table__
+    for scope, entry in totals.items():
+        match = {"scope": scope[0], "key": scope[1]}
+        _bump(db, models.RatingAggregate, match, {"count": entry["count"], "total": entry["total"]})
+        db.execute(
+            update(aggregate)
+            .where(aggregate.c.scope == scope[0], aggregate.c.key == scope[1])
+            .values(
+                min_rating=case(
+                    (or_(aggregate.c.min_rating.is_(None), aggregate.c.min_rating > entry["low"]), entry["low"]),
+                    else_=aggregate.c.min_rating,
+                ),
+                max_rating=case(
+                    (or_(aggregate.c.max_rating.is_(None), aggregate.c.max_rating < entry["high"]), entry["high"]),
+                    else_=aggregate.c.max_rating,
+                ),
+            )
+        )
+        if entry["removed"]:
+            low, high = db.execute(
+                select(aggregate.c.min_rating, aggregate.c.max_rating)
+                .where(aggregate.c.scope == scope[0], aggregate.c.key == scope[1])
+            ).one()
+            if low in entry["removed"] or high in entry["removed"]:
+                _recompute_extremes(db, scope)
+    for (scope, bucket), delta in buckets.items():
+        if delta:
+            _bump(db, models.RatingHistogram, {"scope": scope[0], "key": scope[1], "bucket": bucket}, {"count": delta})
+
+
+def apply_pokemon_added(db: Session, count: int = 1):
+    """Track catalogue size so statistics don't need COUNT(*) over pokemon."""
+    _bump(db, models.RatingAggregate, {"scope": CATALOGUE[0], "key": CATALOGUE[1]}, {"count": count, "total": 0.0})
+
+
+def compute(db: Session):
+    """Recompute all aggregates from ``ratings`` and ``pokemon`` in one scan."""
+    aggregates: Dict[Scope, dict] = {}
+    histogram: Dict[Tuple[str, str, int], int] = defaultdict(int)
+    rows = db.execute(
+        select(models.Rating.rating, models.Pokemon.type1, models.Pokemon.type2, models.Pokemon.generation)
+        .join(models.Pokemon, models.Rating.pokemon_id == models.Pokemon.id)
+        .where(models.Rating.rating.is_not(None))
+    )
+    for rating, type1, type2, generation in rows:
+        pokemon = models.Pokemon(type1=type1, type2=type2, generation=generation)
+        for scope in scopes_for(pokemon):
+            entry = aggregates.get(scope)
+            if entry is None:
+                aggregates[scope] = {"count": 1, "total": rating, "min_rating": rating, "max_rating": rating}
+            else:
+                entry["count"] += 1
+                entry["total"] += rating
+                entry["min_rating"] = min(entry["min_rating"], rating)
+                entry["max_rating"] = max(entry["max_rating"], rating)
+            histogram[(scope[0], scope[1], rating_bucket(rating))] += 1
+
+    total_pokemon = db.execute(select(func.count(models.Pokemon.id))).scalar()
+    aggregates[CATALOGUE] = {"count": total_pokemon, "total": 0.0, "min_rating": None, "max_rating": None}
+    return aggregates, dict(histogram)
+
+
+def rebuild(db: Session):
+    """Replace the stored aggregates with a full recomputation. Does not commit."""
+    aggregates, histogram = compute(db)
+    db.execute(delete(models.RatingAggregate))
+    db.execute(delete(models.RatingHistogram))
+    if aggregates:
+        db.execute(insert(models.RatingAggregate), [
+            {"scope": scope, "key": key, **values} for (scope, key), values in aggregates.items()
+        ])
+    if histogram:
+        db.execute(insert(models.RatingHistogram), [
+            {"scope": scope, "key": key, "bucket": bucket, "count": count}
+            for (scope, key, bucket), count in histogram.items()
+        ])
+    return len(aggregates)
+
+
+def ensure_built(db: Session):
+    """Backfill the aggregates for databases created before they existed."""
+    exists = db.execute(
+        select(models.RatingAggregate.id).where(
+            models.RatingAggregate.scope == CATALOGUE[0], models.RatingAggregate.key == CATALOGUE[1]
+        )
+    ).first()
+    if not exists:
+        rebuild(db)
+        db.commit()
+
+
+def check_consistency(db: Session, tolerance: float = 1e-6) -> List[str]:
+    """Compare stored aggregates with a full recomputation and describe any differences."""
+    expected, expected_histogram = compute(db)
+    stored = {
+        (row.scope, row.key): row
+        for row in db.execute(select(models.RatingAggregate)).scalars()
+    }
+    stored_histogram = {
+        (row.scope, row.key, row.bucket): row.count
+        for row in db.execute(select(models.RatingHistogram)).scalars()
+        if row.count
+    }
+
+    problems = []
+    for scope in sorted(set(expected) | set(stored)):
+        want = expected.get(scope)
+        have = stored.get(scope)
+        if want is None:
+            if have.count:
+                problems.append(f"{scope}: stored count {have.count} but no ratings")
+            continue
+        if have is None:
+            problems.append(f"{scope}: missing")
+            continue
+        if have.count != want["count"]:
+            problems.append(f"{scope}: count {have.count} != {want['count']}")
+        if abs(have.total - want["total"]) > tolerance:
+            problems.append(f"{scope}: total {have.total} != {want['total']}")
+        if have.min_rating != want["min_rating"] or have.max_rating != want["max_rating"]:
+            problems.append(
+                f"{scope}: range {have.min_rating}..{have.max_rating} != {want['min_rating']}..{want['max_rating']}"
+            )
+    for key in sorted(set(expected_histogram) | set(stored_histogram)):
+        if expected_histogram.get(key, 0) != stored_histogram.get(key, 0):
+            problems.append(
+                f"histogram {key}: {stored_histogram.get(key, 0)} != {expected_histogram.get(key, 0)}"
+            )
+    return problems
+
+
+def get_summary(db: Session, scope: str, key: str = "") -> dict:
+    """Count, average, range and histogram for one scope, read from the aggregates."""
+    row = db.execute(
+        select(models.RatingAggregate).where(
+            models.RatingAggregate.scope == scope, models.RatingAggregate.key == key
+        )
+    ).scalar()
+    histogram = db.execute(
+        select(models.RatingHistogram.bucket, models.RatingHistogram.count)
+        .where(models.RatingHistogram.scope == scope, models.RatingHistogram.key == key,
+               models.RatingHistogram.count > 0)
+        .order_by(models.RatingHistogram.bucket)
+    ).all()
+    count = row.count if row else 0
+    return {
+        "count": count,
+        "average_rating": row.total / count if count else 0,
+        "min_rating": row.min_rating if row and row.min_rating is not None else 0,
+        "max_rating": row.max_rating if row and row.max_rating is not None else 0,
+        "histogram": {str(bucket): bucket_count for bucket, bucket_count in histogram},
+    }
+
+
+def get_summaries(db: Session, scope: str) -> Dict[str, dict]:
+    """:func:`get_summary` for every key of ``scope`` that has ratings, in two queries."""
+    histograms: Dict[str, Dict[str, int]] = defaultdict(dict)
+    for key, bucket, bucket_count in db.execute(
+        select(models.RatingHistogram.key, models.RatingHistogram.bucket, models.RatingHistogram.count)
+        .where(models.RatingHistogram.scope == scope, models.RatingHistogram.count > 0)
+        .order_by(models.RatingHistogram.key, models.RatingHistogram.bucket)
+    ):
+        histograms[key][str(bucket)] = bucket_count
+    return {
+        row.key: {
+            "count": row.count,
+            "average_rating": row.total / row.count,
+            "min_rating": row.min_rating if row.min_rating is not None else 0,
+            "max_rating": row.max_rating if row.max_rating is not None else 0,
+            "histogram": histograms.get(row.key, {}),
+        }
+        for row in db.execute(
+            select(models.RatingAggregate).where(models.RatingAggregate.scope == scope,
+                                                 models.RatingAggregate.count > 0)
+            .order_by(models.RatingAggregate.key)
+        ).scalars()
+    }
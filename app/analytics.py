@@ -0,0 +1,222 @@
+"""
+Grouped rating analytics over a columnar in-memory snapshot.
+
+:class:`RatingSnapshot` keeps every rating as NumPy columns (rating value and
+the row of its Pokemon) next to a small Pokemon table whose types are
+categorical codes. It is loaded from one ``ratings JOIN pokemon`` query the
+first time it is used, then kept current from the ``rating_events`` log:
+before each use it applies the events logged since the last one it saw, by
+any worker process, overwriting changed ratings in place and appending new
+ones, so a write never triggers a reload. Snapshots older than
+``analytics_snapshot_max_age`` are reloaded to pick up writes that bypass the
+log (the importer and ``generate_data``).
+
+:meth:`RatingSnapshot.summary` computes count, mean, median, standard
+deviation, range and percentiles per type, per type pair, per generation and
+per type x generation cell with pandas group-bys over the whole snapshot.
+pandas is imported on first use, so processes that never summarise do not
+pay for it at startup.
+"""
+import math
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+from .events import latest_event_id
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+DIMENSIONS = ("overall", "type", "type-pair", "generation", "type-generation")
+PERCENTILES = (0.1, 0.25, 0.75, 0.9)
+INITIAL_CAPACITY = 1024
+
+
+def _clean(value):
+    """JSON-safe scalar: NumPy types become Python ones and NaN becomes None."""
+    if isinstance(value, (np.floating, float)):
+        value = float(value)
+        return None if math.isnan(value) else value
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+def describe(frame: "pd.DataFrame", by: List[str]) -> List[dict]:
+    """Per-group rating statistics for ``frame`` grouped by the columns in ``by``."""
+    if frame.empty:
+        return []
+    grouped = frame.groupby(by, observed=True, sort=True)["rating"]
+    stats = grouped.agg(["count", "mean", "median", "std", "min", "max"])
+    quantiles = grouped.quantile(list(PERCENTILES)).unstack()
+    quantiles.columns = [f"p{round(q * 100)}" for q in quantiles.columns]
+    stats = stats.join(quantiles).reset_index()
+    return [{key: _clean(value) for key, value in row.items()} for row in stats.to_dict("records")]
+
+
+class RatingSnapshot:
+    def __init__(self, max_age: float = 300):
+        self.max_age = max_age
+        self.version = 0
+        self.last_event_id = 0
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        self._reset()
+
+    def _reset(self):
+        self.types: List[str] = []
+        self._type_codes: Dict[str, int] = {}
+        # Pokemon table, one row per Pokemon that has been rated
+        self._pokemon_rows: Dict[int, int] = {}
+        self._type1: List[int] = []
+        self._type2: List[int] = []
+        self._generation: List[int] = []
+        # Rating columns, one row per (pokemon_id, user_id)
+        self._positions: Dict[Tuple[int, str], int] = {}
+        self._ratings = np.empty(INITIAL_CAPACITY, dtype=np.float64)
+        self._pokemon_index = np.empty(INITIAL_CAPACITY, dtype=np.int32)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.max_age
+
+    def _type_code(self, name: Optional[str]) -> int:
+        if not name:
+            return -1
+        code = self._type_codes.get(name)
+        if code is None:
+            code = self._type_codes[name] = len(self.types)
+            self.types.append(name)
+        return code
+
+    def _pokemon_row(self, pokemon_id: int, type1, type2, generation) -> int:
+        row = self._pokemon_rows.get(pokemon_id)
+        if row is None:
+            row = self._pokemon_rows[pokemon_id] = len(self._type1)
+            self._type1.append(self._type_code(type1))
+            self._type2.append(self._type_code(type2))
+            self._generation.append(generation or 0)
+        return row
+
+    def _append(self, key: Tuple[int, str], pokemon_row: int, rating: float):
+        if self._size == len(self._ratings):
+            self._ratings = np.resize(self._ratings, self._size * 2)
+            self._pokemon_index = np.resize(self._pokemon_index, self._size * 2)
+        self._positions[key] = self._size
+        self._ratings[self._size] = rating
+        self._pokemon_index[self._size] = pokemon_row
+        self._size += 1
+
+    def load(self, db: Session):
+        """Replace the snapshot with every rating currently in the database."""
+        # Read first: events logged during the load are applied again by catch_up, which is harmless
+        last_event_id = latest_event_id(db)
+        rows = db.execute(
+            select(models.Rating.pokemon_id, models.Rating.user_id, models.Rating.rating,
+                   models.Pokemon.type1, models.Pokemon.type2, models.Pokemon.generation)
+            .join(models.Pokemon, models.Rating.pokemon_id == models.Pokemon.id)
+            .where(models.Rating.rating.is_not(None))
+        )
+        with self._lock:
+            self._reset()
+            ratings, pokemon_index = [], []
+            for pokemon_id, user_id, rating, type1, type2, generation in rows:
+                self._positions[(pokemon_id, user_id)] = len(ratings)
+                ratings.append(rating)
+                pokemon_index.append(self._pokemon_row(pokemon_id, type1, type2, generation))
+            self._size = len(ratings)
+            capacity = max(INITIAL_CAPACITY, self._size * 2)
+            self._ratings = np.resize(np.array(ratings, dtype=np.float64), capacity)
+            self._pokemon_index = np.resize(np.array(pokemon_index, dtype=np.int32), capacity)
+            self._loaded_at = time.monotonic()
+            self.last_event_id = last_event_id
+            self.version += 1
+
+    def catch_up(self, db: Session):
+        """Apply the rating writes logged since the last event seen, in log order."""
+        event = models.RatingEvent
+        rows = db.execute(
+            select(event.id, event.pokemon_id, event.user_id, event.rating,
+                   models.Pokemon.type1, models.Pokemon.type2, models.Pokemon.generation)
+            .join(models.Pokemon, event.pokemon_id == models.Pokemon.id)
+            .where(event.id > self.last_event_id)
+            .order_by(event.id)
+        ).all()
+        if not rows:
+            return
+        with self._lock:
+            for event_id, pokemon_id, user_id, rating, type1, type2, generation in rows:
+                if event_id <= self.last_event_id:
+                    continue  # already applied by a concurrent catch_up
+                position = self._positions.get((pokemon_id, user_id))
+                if position is not None:
+                    self._ratings[position] = rating
+                else:
+                    row = self._pokemon_row(pokemon_id, type1, type2, generation)
+                    self._append((pokemon_id, user_id), row, rating)
+                self.last_event_id = event_id
+            self.version += 1
+
+    def ensure_loaded(self, db: Session):
+        if self.loaded:
+            self.catch_up(db)
+        else:
+            self.load(db)
+
+    def frame(self) -> "pd.DataFrame":
+        """The snapshot as a DataFrame with categorical type columns."""
+        import pandas as pd
+
+        with self._lock:
+            size = self._size
+            pokemon_index = self._pokemon_index[:size].copy()
+            ratings = self._ratings[:size].copy()
+            type1 = np.array(self._type1, dtype=np.int16)
+            type2 = np.array(self._type2, dtype=np.int16)
+            generation = np.array(self._generation, dtype=np.int16)
+            types = list(self.types)
+        return pd.DataFrame({
+            "rating": ratings,
+            "type1": pd.Categorical.from_codes(type1[pokemon_index], categories=types),
+            "type2": pd.Categorical.from_codes(type2[pokemon_index], categories=types),
+            "generation": generation[pokemon_index],
+        })
+
+    def summary(self, dimensions=DIMENSIONS) -> dict:
+        import pandas as pd
+
+        frame = self.frame()
+        result = {"version": self.version, "ratings": len(frame)}
+        # Dual-type Pokemon count towards both types, as in the aggregates
+        second = frame[frame["type2"].notna() & (frame["type2"] != frame["type1"])]
+        by_type = pd.concat([
+            frame[["rating", "generation"]].assign(type=frame["type1"]),
+            second[["rating", "generation"]].assign(type=second["type2"]),
+        ], ignore_index=True)
+
+        if "overall" in dimensions:
+            overall = describe(frame.assign(scope="overall"), ["scope"])
+            result["overall"] = overall[0] if overall else None
+        if "type" in dimensions:
+            result["type"] = describe(by_type, ["type"])
+        if "type-pair" in dimensions:
+            pairs = frame.assign(type2=frame["type2"].cat.add_categories([""]).fillna(""))
+            result["type-pair"] = describe(pairs, ["type1", "type2"])
+        if "generation" in dimensions:
+            result["generation"] = describe(frame, ["generation"])
+        if "type-generation" in dimensions:
+            result["type-generation"] = describe(by_type, ["type", "generation"])
+        return result
+
+
+rating_snapshot = RatingSnapshot(max_age=settings.analytics_snapshot_max_age)
@@ -0,0 +1,106 @@
+"""
+Awaitable versions of the crud functions.
+
+Each function accepts either an ``AsyncSession`` (``DATABASE_ASYNC`` enabled)
+or a regular ``Session``. Async sessions run the crud function through
+``AsyncSession.run_sync``, so queries go through aiosqlite/asyncpg without
+blocking the event loop; sync sessions run it on the threadpool as FastAPI
+would for a plain ``def`` endpoint. Either way the write path, including
+aggregate, cache and sampler maintenance, lives only in :mod:`app.crud`.
+"""
+from typing import List, Optional, Union
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import crud, schemas
+from .analytics import DIMENSIONS
+
+AnySession = Union[AsyncSession, Session]
+
+
+async def run(db: AnySession, fn, *args, **kwargs):
+    """Call ``fn(session, *args, **kwargs)`` without blocking the event loop."""
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+
+async def get_pokemon_list(db: AnySession, skip: int = 0, limit: int = 100, columns=None):
+    return await run(db, crud.get_pokemon_list, skip=skip, limit=limit, columns=columns)
+
+
+async def get_pokemon_by_dex(db: AnySession, dex_number: int):
+    return await run(db, crud.get_pokemon_by_dex, dex_number)
+
+
+async def get_pokemon_page(db: AnySession, limit: int = 100, cursor: Optional[str] = None, order_by: str = "id",
+                           columns=None):
+    return await run(db, crud.get_pokemon_page, limit=limit, cursor=cursor, order_by=order_by, columns=columns)
+
+
+async def get_pokemon_with_rating(db: AnySession, pokemon_name: str, user_id: str = "admin"):
+    return await run(db, crud.get_pokemon_with_rating, pokemon_name, user_id=user_id)
+
+
+async def search_pokemon(db: AnySession, query: str, limit: int = 20):
+    return await run(db, crud.search_pokemon, query, limit)
+
+
+async def get_unrated_pokemon(db: AnySession, limit: int = 10, user_id: str = "admin"):
+    return await run(db, crud.get_unrated_pokemon, limit, user_id=user_id)
+
+
+async def create_or_update_rating(db: AnySession, rating: schemas.RatingCreate, user_id: str = "admin"):
+    return await run(db, crud.create_or_update_rating, rating, user_id=user_id)
+
+
+async def create_or_update_ratings(db: AnySession, ratings: List[schemas.RatingCreate], user_id: str = "admin"):
+    return await run(db, crud.create_or_update_ratings, ratings, user_id=user_id)
+
+
+async def get_top_rated_pokemon(db: AnySession, limit: int = 10):
+    return await run(db, crud.get_top_rated_pokemon, limit)
+
+
+async def get_bottom_rated_pokemon(db: AnySession, limit: int = 10):
+    return await run(db, crud.get_bottom_rated_pokemon, limit)
+
+
+async def get_ratings_by_type(db: AnySession, pokemon_type: str):
+    return await run(db, crud.get_ratings_by_type, pokemon_type)
+
+
+async def get_ratings_by_generation(db: AnySession, generation: int):
+    return await run(db, crud.get_ratings_by_generation, generation)
+
+
+async def get_rating_statistics(db: AnySession):
+    return await run(db, crud.get_rating_statistics)
+
+
+async def get_dashboard(db: AnySession, limit: int = 10):
+    return await run(db, crud.get_dashboard, limit)
+
+
+async def get_type_summary(db: AnySession, pokemon_type: str):
+    return await run(db, crud.get_type_summary, pokemon_type)
+
+
+async def get_generation_summary(db: AnySession, generation: int):
+    return await run(db, crud.get_generation_summary, generation)
+
+
+async def get_community_ranking(db: AnySession, limit: int = 10, pokemon_type: Optional[str] = None,
+                                generation: Optional[int] = None, ascending: bool = False):
+    return await run(db, crud.get_community_ranking, limit, pokemon_type=pokemon_type,
+                     generation=generation, ascending=ascending)
+
+
+async def get_analytics_summary(db: AnySession, dimensions=DIMENSIONS):
+    return await run(db, crud.get_analytics_summary, dimensions)
+
+
+async def get_user(db: AnySession, username: str):
+    return await run(db, crud.get_user, username)
@@ -1,19 +1,50 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from .database import get_db
+from . import async_crud
+from .async_crud import AnySession
+from .cache import make_cache
+from .database import get_session
+from .hashing import password_hasher, pwd_context
 from .models import User
 from .schemas import TokenData
 from .config import settings
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 security = HTTPBearer()
 
 
+class Principal:
+    """The parts of a ``User`` needed to authorize a request, cached between requests."""
+    __slots__ = ("id", "username", "is_active")
+
+    def __init__(self, id: int, username: str, is_active: bool):
+        self.id = id
+        self.username = username
+        self.is_active = is_active
+
+    @classmethod
+    def from_user(cls, user: User):
+        return cls(user.id, user.username, user.is_active)
+
+
+# Authenticated users by username, so valid tokens skip the users query. Shared
+# through CACHE_URL, so a password or status change is seen by every worker
+principal_cache = make_cache("principals", settings.auth_cache_size, settings.auth_cache_ttl)
+
+
+def invalidate_principal(username: str):
+    """Forget the cached principal; call after deactivating a user or changing their password."""
+    principal_cache.invalidate([f"user:{username}"])
+
+
+def token_claims(user: User) -> dict:
+    """Claims for a new access token. ``uid``/``active`` let requests skip the user lookup."""
+    return {"sub": user.username, "uid": user.id, "active": user.is_active}
+
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -35,6 +66,28 @@ def authenticate_user(db: Session, username: str, password: str):
     return user
 
 
+def _store_rehash(db: Session, user: User, hashed_password: str):
+    user.hashed_password = hashed_password
+    db.commit()
+
+
+async def authenticate_user_async(db: AnySession, username: str, password: str):
+    """Like :func:`authenticate_user`, but verifies on the hashing pool.
+
+    Hashes made with outdated argon2 parameters are replaced on success.
+    Raises ``HasherSaturated`` when the pool is full.
+    """
+    user = await async_crud.run(db, get_user, username)
+    if not user:
+        return False
+    valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not valid:
+        return False
+    if new_hash:
+        await async_crud.run(db, _store_rehash, user, new_hash)
+    return user
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -48,7 +101,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AnySession = Depends(get_session)
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -65,13 +118,21 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = get_user(db, username=token_data.username)
+    user = principal_cache.get(token_data.username) if settings.auth_cache_ttl > 0 else None
     if user is None:
-        raise credentials_exception
+        if settings.auth_trust_token_claims and "uid" in payload:
+            user = Principal(payload["uid"], token_data.username, payload.get("active", True))
+        else:
+            db_user = await async_crud.run(db, get_user, token_data.username)
+            if db_user is None:
+                raise credentials_exception
+            user = Principal.from_user(db_user)
+        if settings.auth_cache_ttl > 0:
+            principal_cache.set(token_data.username, user, tags=[f"user:{token_data.username}"])
     return user
 
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)):
+async def get_current_active_user(current_user: Principal = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""
+In-process caches.
+
+:class:`TTLCache` is a size-bounded LRU with per-entry expiry and hit, miss,
+eviction and invalidation counters. Entries can carry tags so writes can drop
+only the entries they affect, e.g. a new fire-type rating invalidates
+``type:fire`` but leaves other types cached. Each invalidation also bumps a
+per-tag generation: a caller that computes a value slowly reads
+:meth:`TTLCache.generation` first and passes it to ``set``, which then drops
+the value if one of its tags was invalidated in the meantime.
+
+``analytics_cache`` holds the encoded analytics responses; crud invalidates it
+whenever a rating is committed. With ``CACHE_URL`` set it is a
+:class:`~app.shared_cache.SharedCache` instead, so every worker process sees
+the same entries and invalidations.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from .aggregates import scopes_for
+from .config import settings
+
+
+class TTLCache:
+    def __init__(self, max_size: int = 1024, ttl: float = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tags: Dict[str, set] = {}
+        self._generations: Dict[str, int] = {}  # tag -> invalidations so far; "*" counts clears
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value, _ = entry
+            if expires_at < time.time():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def generation(self, tags: Iterable[str]) -> tuple:
+        """A token that changes whenever any of ``tags`` is invalidated or the cache is cleared."""
+        with self._lock:
+            return tuple(self._generations.get(tag, 0) for tag in ("*", *tags))
+
+    def set(self, key: str, value, tags: Iterable[str] = (), generation: Optional[tuple] = None):
+        """Store ``value``, unless ``generation`` is given and ``tags`` were invalidated since it was read."""
+        with self._lock:
+            tags = tuple(tags)
+            if generation is not None and self.generation(tags) != generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            tags = frozenset(tags)
+            self._entries[key] = (time.time() + self.ttl, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        """Drop every entry carrying any of ``tags``. Returns the number removed."""
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._tags.get(tag, set())
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._generations["*"] = self._generations.get("*", 0) + 1
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+def rating_tags(pokemon) -> list:
+    """Cache tags affected by a rating change for ``pokemon``."""
+    return [f"{kind}:{key}" for kind, key in scopes_for(pokemon)]
+
+
+def make_cache(name: str, max_size: int, ttl: float):
+    """A cache shared through ``CACHE_URL`` if one is configured, else an in-process :class:`TTLCache`."""
+    if settings.cache_url:
+        from .shared_cache import SharedCache, connect
+        return SharedCache(connect(settings.cache_url), prefix=f"{name}:", ttl=ttl)
+    return TTLCache(max_size=max_size, ttl=ttl)
+
+
+analytics_cache = make_cache("analytics", settings.analytics_cache_size, settings.analytics_cache_ttl)
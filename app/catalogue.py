@@ -0,0 +1,238 @@
+"""
+In-memory snapshot of the Pokemon catalogue.
+
+The ``pokemon`` table is small and only changes when Pokemon are imported, so
+lookups by id, name and dex number, catalogue pages and search results are
+served from :data:`catalogue` instead of querying and building ORM objects on
+every request. A snapshot holds:
+
+- one :class:`PokemonRecord` (a slotted dataclass) per Pokemon, with types and
+  timestamps shared between records that have equal values
+- dictionaries from id, name and dex number to records
+- the records sorted by id and by dex number, for offset and keyset pages
+- the ids of each type and generation
+
+Every write to ``pokemon`` bumps ``catalogue_version`` in its own transaction
+(:func:`bump_version`). A process compares that with the version it loaded at
+most every ``catalogue_refresh_interval`` seconds and reloads when they
+differ, so Pokemon added by the importer or another worker appear within the
+interval; ``crud.create_pokemon`` applies its own additions immediately.
+"""
+import bisect
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, fields
+from datetime import datetime
+from operator import attrgetter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+from .pagination import SORT_KEYS, InvalidCursor, cursor_value, decode_cursor, encode_cursor
+
+MISSING_DEX = float("-inf")  # sorts Pokemon without a dex number first, as the database pages them
+
+
+@dataclass(slots=True, eq=False)
+class PokemonRecord:
+    """A Pokemon row without an ORM identity; read-only by convention."""
+
+    name: str
+    dex_number: Optional[int]
+    type1: str
+    type2: Optional[str]
+    generation: int
+    id: int
+    sprite_url: Optional[str] = None
+    artwork_url: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+FIELDS = tuple(field.name for field in fields(PokemonRecord))
+COLUMNS = tuple(getattr(models.Pokemon, field) for field in FIELDS)
+
+
+def current_version(db: Session) -> int:
+    return db.scalar(select(models.CatalogueVersion.version).where(models.CatalogueVersion.id == 1)) or 0
+
+
+def bump_version(db: Session) -> int:
+    """Record a write to ``pokemon`` inside the writing transaction. Returns the new version."""
+    counter = models.CatalogueVersion
+    if not db.execute(update(counter).where(counter.id == 1).values(version=counter.version + 1)).rowcount:
+        db.execute(insert(counter).values(id=1, version=1))
+    return current_version(db)
+
+
+class CatalogueSnapshot:
+    """The catalogue at one version. Lookups never block; :meth:`add` is the only mutation."""
+
+    def __init__(self, version: int, records: List[PokemonRecord]):
+        self.version = version
+        self.records = records  # by id
+        self.by_id: Dict[int, PokemonRecord] = {}
+        self.by_name: Dict[str, PokemonRecord] = {}
+        self.by_dex: Dict[int, PokemonRecord] = {}
+        self.by_type: Dict[str, List[int]] = defaultdict(list)
+        self.by_generation: Dict[int, List[int]] = defaultdict(list)
+        # order_by -> (sort keys, records), built on first use
+        self._orders: Dict[str, Tuple[list, List[PokemonRecord]]] = {}
+        for record in records:
+            self._index(record)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _index(self, record: PokemonRecord):
+        self.by_id[record.id] = record
+        self.by_name[record.name] = record
+        if record.dex_number is not None:
+            self.by_dex[record.dex_number] = record
+        self.by_type[record.type1].append(record.id)
+        if record.type2 and record.type2 != record.type1:
+            self.by_type[record.type2].append(record.id)
+        self.by_generation[record.generation].append(record.id)
+
+    def add(self, record: PokemonRecord, version: int):
+        if record.id in self.by_id:
+            return
+        if self.records and record.id < self.records[-1].id:
+            self.records.insert(bisect.bisect([r.id for r in self.records], record.id), record)
+        else:
+            self.records.append(record)
+        self._index(record)
+        self._orders = {}
+        self.version = version
+
+    def ordered(self, order_by: str) -> Tuple[list, List[PokemonRecord]]:
+        order = self._orders.get(order_by)
+        if order is None:
+            def key(record):
+                return _sort_key(order_by, cursor_value(order_by, record))
+
+            records = self.records if order_by == "id" else sorted(self.records, key=key)
+            order = self._orders[order_by] = ([key(record) for record in records], records)
+        return order
+
+
+def _sort_key(order_by: str, value):
+    """A comparable form of a :func:`cursor_value`."""
+    if order_by == "id":
+        return value
+    dex_number, pokemon_id = value
+    return (MISSING_DEX if dex_number is None else dex_number, pokemon_id)
+
+
+def _projection(columns: Optional[Sequence]):
+    """Rows of ``columns`` (ORM column attributes) for records, or the records themselves."""
+    if not columns:
+        return None
+    getter = attrgetter(*(column.key for column in columns))
+    return getter if len(columns) > 1 else lambda record: (getter(record),)
+
+
+class Catalogue:
+    def __init__(self):
+        self._snapshot: Optional[CatalogueSnapshot] = None
+        self._checked_at = 0.0
+        self._load_lock = threading.Lock()
+
+    def load(self, db: Session) -> CatalogueSnapshot:
+        """Replace the snapshot with the current contents of ``pokemon``."""
+        # The version is read first: a write landing in between only causes one more reload
+        version = current_version(db)
+        shared = {}
+        records = [
+            PokemonRecord(
+                name, dex_number, shared.setdefault(type1, type1), shared.setdefault(type2, type2), generation,
+                pokemon_id, sprite_url, artwork_url, shared.setdefault(created_at, created_at),
+                shared.setdefault(updated_at, updated_at),
+            )
+            for name, dex_number, type1, type2, generation, pokemon_id, sprite_url, artwork_url, created_at, updated_at
+            in db.execute(select(*COLUMNS).order_by(models.Pokemon.id))
+        ]
+        self._snapshot = CatalogueSnapshot(version, records)
+        self._checked_at = time.monotonic()
+        return self._snapshot
+
+    def snapshot(self, db: Session) -> CatalogueSnapshot:
+        """The current snapshot, reloaded first if the database version moved on since the last check."""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < settings.catalogue_refresh_interval:
+            return snapshot
+        with self._load_lock:
+            snapshot = self._snapshot
+            if snapshot is None or time.monotonic() - self._checked_at >= settings.catalogue_refresh_interval:
+                if snapshot is None or current_version(db) != snapshot.version:
+                    snapshot = self.load(db)
+                self._checked_at = time.monotonic()
+        return snapshot
+
+    def add(self, pokemon, version: int):
+        """Apply a committed ``create_pokemon`` that bumped the database to ``version``."""
+        with self._load_lock:
+            snapshot = self._snapshot
+            if snapshot is None:
+                return
+            if version != snapshot.version + 1:
+                # Someone else wrote in between; reload on the next lookup
+                self._checked_at = float("-inf")
+                return
+            snapshot.add(PokemonRecord(**{field: getattr(pokemon, field) for field in FIELDS}), version)
+
+    def get(self, db: Session, pokemon_id: int) -> Optional[PokemonRecord]:
+        return self.snapshot(db).by_id.get(pokemon_id)
+
+    def get_by_name(self, db: Session, name: str) -> Optional[PokemonRecord]:
+        return self.snapshot(db).by_name.get(name)
+
+    def get_by_dex(self, db: Session, dex_number: int) -> Optional[PokemonRecord]:
+        return self.snapshot(db).by_dex.get(dex_number)
+
+    def get_many(self, db: Session, ids: Sequence[int]) -> List[PokemonRecord]:
+        """Records for ``ids`` in the same order, skipping unknown ids."""
+        by_id = self.snapshot(db).by_id
+        return [by_id[pokemon_id] for pokemon_id in ids if pokemon_id in by_id]
+
+    def ids(self, db: Session, pokemon_type: Optional[str] = None, generation: Optional[int] = None) -> List[int]:
+        """Ids of the Pokemon of a type and/or generation, in id order."""
+        snapshot = self.snapshot(db)
+        if pokemon_type is None and generation is None:
+            return [record.id for record in snapshot.records]
+        if generation is None:
+            return list(snapshot.by_type.get(pokemon_type, ()))
+        ids = snapshot.by_generation.get(generation, [])
+        if pokemon_type is None:
+            return list(ids)
+        of_type = set(snapshot.by_type.get(pokemon_type, ()))
+        return [pokemon_id for pokemon_id in ids if pokemon_id in of_type]
+
+    def slice(self, db: Session, skip: int = 0, limit: int = 100, columns=None) -> list:
+        """Like ``OFFSET skip LIMIT limit`` over the table in id order (a negative limit means no limit)."""
+        skip = max(skip, 0)
+        records = self.snapshot(db).records
+        records = records[skip:] if limit < 0 else records[skip:skip + limit]
+        project = _projection(columns)
+        return [project(record) for record in records] if project else records
+
+    def page(self, db: Session, limit: int = 100, cursor: Optional[str] = None, order_by: str = "id",
+             columns=None) -> Tuple[list, Optional[str]]:
+        """Same pages and cursors as :func:`app.pagination.get_pokemon_page`."""
+        if order_by not in SORT_KEYS:
+            raise InvalidCursor(f"Cannot paginate by {order_by!r}")
+        keys, records = self.snapshot(db).ordered(order_by)
+        start = bisect.bisect_right(keys, _sort_key(order_by, decode_cursor(cursor, order_by))) if cursor else 0
+        page = records[start:start + max(limit, 0)]
+        next_cursor = None
+        if start + limit < len(records) and page:
+            next_cursor = encode_cursor(order_by, cursor_value(order_by, page[-1]))
+        project = _projection(columns)
+        return ([project(record) for record in page] if project else page), next_cursor
+
+
+catalogue = Catalogue()
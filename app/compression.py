@@ -0,0 +1,249 @@
+"""
+Response compression and long-lived caching of static assets.
+
+:class:`CompressionMiddleware` (``COMPRESSION_ENABLED``) compresses text
+responses (HTML, JSON, NDJSON, CSV, CSS, JavaScript) with brotli when the
+client accepts it and the ``brotli`` package is installed, and with gzip
+otherwise. Streaming responses are compressed chunk by chunk and flushed
+after each one, so exports still arrive incrementally. Images, event streams
+and responses that already carry a ``Content-Encoding`` pass through. A
+compressed response is a different representation, so its ETag gets the
+coding as a suffix (``"abc-gzip"``); the suffix is removed from
+``If-None-Match`` before the app compares it, and put back on the 304.
+
+:class:`PrecompressedStaticFiles` serves ``/static``. Next to each asset,
+``scripts/compress_static.py`` writes ``.br`` and ``.gz`` copies compressed at
+the highest level; they are sent as-is to clients that accept them, so static
+files are never compressed per request. Templates that link an asset should
+do so through :func:`static_url` (a Jinja global), which adds a hash of the
+file's content; those URLs are cached by browsers as ``immutable`` for a year,
+since any edit changes the URL.
+"""
+import hashlib
+import os
+import zlib
+from mimetypes import guess_type
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "text/html", "text/css", "text/plain", "text/csv", "text/javascript", "application/javascript",
+    "application/json", "application/x-ndjson", "application/xml", "image/svg+xml",
+)
+STATIC_EXTENSIONS = (".css", ".js", ".html", ".json", ".svg", ".txt")
+DYNAMIC_BROTLI_QUALITY = 5  # per request; static copies use the maximum, 11
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def accepted_encodings(accept_encoding: str) -> List[str]:
+    """Content codings in an ``Accept-Encoding`` header, without those refused with ``q=0``."""
+    encodings = []
+    for part in accept_encoding.split(","):
+        name, *params = (piece.strip() for piece in part.split(";"))
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            encodings.append(name.lower())
+    return encodings
+
+
+def choose_encoding(accept_encoding: str, available=("br", "gzip")) -> Optional[str]:
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in available:
+        if encoding == "br" and brotli is None:
+            continue
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """The ETag of the ``encoding``-compressed representation: ``"abc"`` becomes ``"abc-gzip"``."""
+    return etag[:-1] + f'-{encoding}"' if etag.endswith('"') else etag
+
+
+def _strip_encoded_etags(if_none_match: str, encoding: str) -> Tuple[str, bool]:
+    """``If-None-Match`` with the ``encoding`` suffix removed from its tags, and whether any had it."""
+    suffix = f'-{encoding}"'
+    tags, stripped = [], False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.endswith(suffix):
+            tag, stripped = tag[:-len(suffix)] + '"', True
+        tags.append(tag)
+    return ", ".join(tags), stripped
+
+
+class _Compressor:
+    def __init__(self, encoding: str, level: int):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=DYNAMIC_BROTLI_QUALITY)
+            self._compress, self._flush = self._compressor.process, self._compressor.flush
+            self._finish = self._compressor.finish
+        else:
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+            self._compress = self._compressor.compress
+            self._flush = lambda: self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._compressor.flush
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compress(data) + self._flush()
+
+    def last(self, data: bytes) -> bytes:
+        return self._compress(data) + self._finish()
+
+
+class CompressionMiddleware:
+    """Compress compressible responses of at least ``minimum_size`` bytes."""
+
+    def __init__(self, app, minimum_size: int = 500, level: int = 6):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        request_headers = Headers(scope=scope)
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        # Validators the client got from a compressed response are compared without the suffix
+        revalidating = False
+        if "if-none-match" in request_headers:
+            if_none_match, revalidating = _strip_encoded_etags(request_headers["if-none-match"], encoding)
+            if revalidating:
+                scope = dict(scope, headers=[
+                    (key, if_none_match.encode("latin-1") if key == b"if-none-match" else value)
+                    for key, value in scope["headers"]
+                ])
+
+        start = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                if message["status"] == 304:
+                    passthrough = True
+                    if revalidating and "etag" in headers:
+                        headers["ETag"] = encoded_etag(headers["etag"], encoding)
+                    return await send(message)
+                content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+                passthrough = "content-encoding" in headers or content_type not in COMPRESSIBLE_TYPES
+                if passthrough:
+                    return await send(message)
+                start = message  # held until the first body chunk shows whether it is worth it
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                return await send(message)
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                headers = MutableHeaders(raw=start["headers"])
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    return await send(message)
+                compressor = _Compressor(encoding, self.level)
+                headers["Content-Encoding"] = encoding
+                if "etag" in headers:
+                    headers["ETag"] = encoded_etag(headers["etag"], encoding)
+                if more_body:
+                    del headers["Content-Length"]
+                    body = compressor.chunk(body)
+                else:
+                    body = compressor.last(body)
+                    headers["Content-Length"] = str(len(body))
+                await send(start)
+                start = None
+            else:
+                body = compressor.chunk(body) if more_body else compressor.last(body)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def precompressed_paths(path: str) -> Dict[str, str]:
+    """The ``.br``/``.gz`` copies of ``path``, keyed by content coding."""
+    return {"br": path + ".br", "gzip": path + ".gz"}
+
+
+def compress_file(path: str) -> List[str]:
+    """Write the precompressed copies of ``path`` (brotli only if installed). Returns the files written."""
+    with open(path, "rb") as source:
+        data = source.read()
+    written = []
+    for encoding, target in precompressed_paths(path).items():
+        if encoding == "br":
+            if brotli is None:
+                continue
+            compressed = brotli.compress(data, quality=11)
+        else:
+            compressed = zlib.compress(data, 9, wbits=31)
+        with open(target, "wb") as output:
+            output.write(compressed)
+        written.append(target)
+    return written
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """``StaticFiles`` that prefers precompressed copies and caches versioned URLs forever."""
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        media_type = None
+        headers = {"Vary": "Accept-Encoding"}
+        candidates = precompressed_paths(str(full_path))
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""), tuple(candidates))
+        if encoding:
+            try:
+                compressed_stat = os.stat(candidates[encoding])
+            except FileNotFoundError:
+                compressed_stat = None
+            # A copy older than the asset is stale; serve the asset until it is regenerated
+            if compressed_stat is not None and compressed_stat.st_mtime >= stat_result.st_mtime:
+                media_type = guess_type(str(full_path))[0] or "text/plain"
+                full_path, stat_result = candidates[encoding], compressed_stat
+                headers["Content-Encoding"] = encoding
+        versioned = "v" in parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        headers["Cache-Control"] = IMMUTABLE if versioned else "no-cache"
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result,
+                                method=scope["method"], media_type=media_type, headers=headers)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+_versions: Dict[str, Tuple[float, str]] = {}
+
+
+def static_url(path: str, directory: str = "static") -> str:
+    """``/static/<path>?v=<content hash>``, for assets served with immutable caching."""
+    full_path = os.path.join(directory, path)
+    mtime = os.stat(full_path).st_mtime
+    cached = _versions.get(full_path)
+    if cached is None or cached[0] != mtime:
+        with open(full_path, "rb") as asset:
+            cached = _versions[full_path] = (mtime, hashlib.sha1(asset.read()).hexdigest()[:12])
+    return f"/static/{path}?v={cached[1]}"
@@ -5,11 +5,44 @@ from typing import Optional
 class Settings(BaseSettings):
     # Database
     database_url: str = "sqlite:///./data/pokemon_rater.db"
+    # Serve requests with an async engine (aiosqlite / asyncpg) instead of threadpool sessions
+    database_async: bool = False
+
+    # SQLite performance profile: PRAGMAs applied on connect, plus a single
+    # writer connection and a pool of read-only connections
+    sqlite_profile: bool = True
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_size: int = 268435456  # 256 MiB
+    sqlite_cache_size: int = -65536  # negative = KiB, i.e. 64 MiB
+    sqlite_busy_timeout: int = 5000  # ms
+    sqlite_temp_store: str = "MEMORY"
+    sqlite_read_pool_size: int = 8
+    # Run migrations and create the admin user / derived tables on startup.
+    # Turn off when they run once per deploy (python -m app.migrate) instead
+    auto_migrate: bool = True
+    # Build the search index and analytics snapshot in the background after startup
+    warm_caches_on_startup: bool = True
     
     # Security
     secret_key: str = "your-secret-key-change-this-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    # Cache authenticated users between requests (0 disables)
+    auth_cache_size: int = 1024
+    auth_cache_ttl: int = 60
+    # Build the user from the token's uid/active claims instead of querying
+    # users on a cache miss. Deactivation then only applies to new tokens.
+    auth_trust_token_claims: bool = False
+
+    # Password hashing: argon2 cost parameters (changing them rehashes on
+    # next login) and the bounded pool that runs it off the event loop
+    argon2_time_cost: int = 3
+    argon2_memory_cost: int = 65536  # KiB
+    argon2_parallelism: int = 4
+    password_hash_executor: str = "thread"  # "thread", "process" or "inline"
+    password_hash_workers: int = 2
+    password_hash_queue: int = 8
     
     # Admin credentials
     admin_username: str = "admin"
@@ -17,6 +50,78 @@ class Settings(BaseSettings):
     
     # PokeAPI
     pokeapi_base_url: str = "https://pokeapi.co/api/v2"
+    pokeapi_max_connections: int = 20
+    pokeapi_concurrency: int = 10
+    pokeapi_timeout: float = 10.0
+    pokeapi_cache_size: int = 4096
+    pokeapi_cache_ttl: int = 86400
+    pokeapi_cache_path: Optional[str] = None
+
+    # Largest number of ratings accepted by one POST /api/rate/batch
+    rating_batch_max_items: int = 1000
+
+    # Rows fetched from the server-side cursor and sent per chunk by /api/pokemon/export
+    export_batch_size: int = 1000
+
+    # Community rankings: score = (weight * mean + sum of ratings) / (weight + count).
+    # Run scripts/rebuild_aggregates.py after changing these
+    ranking_prior_mean: float = 5.0
+    ranking_prior_weight: float = 10.0
+
+    # Local sprite/artwork cache behind /media. MEDIA_UPSTREAM_URL replaces the
+    # scheme and host of stored image URLs (a mirror, or a fake for tests)
+    media_cache_dir: str = "data/media"
+    media_upstream_url: Optional[str] = None
+    media_concurrency: int = 8
+    media_offline: bool = False
+    media_prefetch_on_startup: bool = False
+    media_max_age: int = 604800
+
+    # Serve Pokemon lookups, pages and search results from an in-memory copy of
+    # the catalogue, checked against the database version at most this often
+    catalogue_enabled: bool = True
+    catalogue_refresh_interval: float = 5.0
+
+    # Encode list endpoints from column rows with orjson instead of ORM objects
+    # + pydantic + jsonable_encoder
+    fast_serialization: bool = False
+
+    # Per-route latency histograms, SQL counts and Server-Timing headers, with
+    # /metrics in the Prometheus format. A request repeating one statement at
+    # least the threshold number of times is logged as a likely N+1 query
+    instrumentation_enabled: bool = False
+    instrumentation_n_plus_one_threshold: int = 10
+    # Allow ?profile=cprofile|pyinstrument to return a profile of any request
+    profiling_enabled: bool = False
+
+    # Cache shared by all worker processes: sqlite:///path or redis://host:port/db.
+    # Unset keeps the caches in each process
+    cache_url: Optional[str] = None
+
+    # gzip (or brotli, if installed) for text responses of at least the minimum size in bytes
+    compression_enabled: bool = True
+    compression_minimum_size: int = 500
+    compression_level: int = 6
+
+    # Render the analytics page with its data inlined instead of fetching it after load
+    analytics_server_render: bool = True
+
+    # /api/events: rating changes pushed to dashboards. The latest
+    # events_queue_size events are buffered; a subscriber further behind gets a
+    # reset instead. Other workers' ratings are picked up every
+    # events_poll_interval seconds
+    events_queue_size: int = 10000
+    events_max_subscribers: int = 10000
+    events_poll_interval: float = 1.0
+    events_heartbeat_interval: float = 15.0
+    events_max_connection_age: float = 300.0
+    events_replay_limit: int = 1000
+
+    # Analytics response cache
+    analytics_cache_size: int = 512
+    analytics_cache_ttl: int = 300
+    # Seconds before the in-memory ratings snapshot is reloaded from the database
+    analytics_snapshot_max_age: int = 300
     
     class Config:
         env_file = ".env"
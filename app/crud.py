@@ -1,26 +1,80 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, asc
+from sqlalchemy import func, desc, asc, insert, inspect, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from typing import List, Optional, Dict, Any
-from . import models, schemas
+from . import aggregates, models, pagination, rankings, schemas
+from .analytics import DIMENSIONS, rating_snapshot
+from .cache import analytics_cache, rating_tags
+from .catalogue import bump_version, catalogue
+from .config import settings
+from .events import event_broker, latest_event_id
+from .search import search_index
+from .unrated import unrated_sampler
+
+UPSERT_INSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+
+# With the in-memory catalogue enabled, Pokemon lookups return catalogue
+# records rather than ORM objects; both have the same attributes
 
 
 def get_pokemon_by_name(db: Session, name: str):
+    if settings.catalogue_enabled:
+        return catalogue.get_by_name(db, name)
     return db.query(models.Pokemon).filter(models.Pokemon.name == name).first()
 
 
 def get_pokemon_by_id(db: Session, pokemon_id: int):
+    if settings.catalogue_enabled:
+        return catalogue.get(db, pokemon_id)
     return db.query(models.Pokemon).filter(models.Pokemon.id == pokemon_id).first()
 
 
-def get_pokemon_list(db: Session, skip: int = 0, limit: int = 100):
+def get_pokemon_by_dex(db: Session, dex_number: int):
+    if settings.catalogue_enabled:
+        return catalogue.get_by_dex(db, dex_number)
+    return db.query(models.Pokemon).filter(models.Pokemon.dex_number == dex_number).first()
+
+
+def get_pokemon_by_ids(db: Session, ids: List[int]):
+    """Pokemon for ``ids``, in the same order; unknown ids are skipped."""
+    if settings.catalogue_enabled:
+        return catalogue.get_many(db, ids)
+    pokemon = {p.id: p for p in db.query(models.Pokemon).filter(models.Pokemon.id.in_(ids))}
+    return [pokemon[pokemon_id] for pokemon_id in ids if pokemon_id in pokemon]
+
+
+def get_media_sources(db: Session):
+    """``(dex_number, sprite_url, artwork_url)`` for every Pokemon, for prefetching images."""
+    return db.query(models.Pokemon.dex_number, models.Pokemon.sprite_url, models.Pokemon.artwork_url).all()
+
+
+def get_pokemon_list(db: Session, skip: int = 0, limit: int = 100, columns=None):
+    if settings.catalogue_enabled:
+        return catalogue.slice(db, skip=skip, limit=limit, columns=columns)
+    if columns:
+        return db.query(*columns).offset(skip).limit(limit).all()
     return db.query(models.Pokemon).offset(skip).limit(limit).all()
 
 
+def get_pokemon_page(db: Session, limit: int = 100, cursor: Optional[str] = None, order_by: str = "id", columns=None):
+    if settings.catalogue_enabled:
+        return catalogue.page(db, limit=limit, cursor=cursor, order_by=order_by, columns=columns)
+    return pagination.get_pokemon_page(db, limit=limit, cursor=cursor, order_by=order_by, columns=columns)
+
+
 def create_pokemon(db: Session, pokemon: schemas.PokemonCreate):
     db_pokemon = models.Pokemon(**pokemon.dict())
     db.add(db_pokemon)
+    aggregates.apply_pokemon_added(db)
+    version = bump_version(db)
     db.commit()
+    analytics_cache.clear()
     db.refresh(db_pokemon)
+    catalogue.add(db_pokemon, version)
+    search_index.add(db_pokemon.id, db_pokemon.name)
+    unrated_sampler.add_pokemon(db_pokemon.id)
     return db_pokemon
 
 
@@ -32,25 +86,126 @@ def get_rating_by_pokemon_and_user(db: Session, pokemon_id: int, user_id: str =
 
 
 def create_or_update_rating(db: Session, rating: schemas.RatingCreate, user_id: str = "admin"):
+    pokemon = get_pokemon_by_id(db, rating.pokemon_id)
     existing_rating = get_rating_by_pokemon_and_user(db, rating.pokemon_id, user_id)
     if existing_rating:
+        old_value = existing_rating.rating
         existing_rating.rating = rating.rating
         existing_rating.comment = rating.comment
-        db.commit()
-        db.refresh(existing_rating)
-        return existing_rating
-    db_rating = models.Rating(
-        pokemon_id=rating.pokemon_id,
-        rating=rating.rating,
-        comment=rating.comment,
-        user_id=user_id,
-    )
-    db.add(db_rating)
+        db_rating = existing_rating
+    else:
+        old_value = None
+        db_rating = models.Rating(
+            pokemon_id=rating.pokemon_id,
+            rating=rating.rating,
+            comment=rating.comment,
+            user_id=user_id,
+        )
+        db.add(db_rating)
+    db.flush()
+    if pokemon:
+        aggregates.apply_rating_change(db, pokemon, old_value, rating.rating)
+        rankings.apply_rating_changes(db, [(pokemon, old_value, rating.rating)])
+        db.add(models.RatingEvent(pokemon_id=pokemon.id, user_id=user_id, old_rating=old_value, rating=rating.rating))
     db.commit()
+    if pokemon:
+        analytics_cache.invalidate(rating_tags(pokemon))
+        event_broker.notify()
+    if not existing_rating:
+        unrated_sampler.mark_rated(user_id, rating.pokemon_id)
     db.refresh(db_rating)
     return db_rating
 
 
+def _upsert_ratings(db: Session, rows: List[Dict[str, Any]]):
+    """INSERT ... ON CONFLICT (pokemon_id, user_id) DO UPDATE for all ``rows`` at once."""
+    dialect = db.get_bind().dialect.name
+    if dialect not in UPSERT_INSERTS:
+        for row in rows:
+            updated = db.query(models.Rating).filter(
+                models.Rating.pokemon_id == row["pokemon_id"], models.Rating.user_id == row["user_id"]
+            ).update({"rating": row["rating"], "comment": row["comment"]})
+            if not updated:
+                db.add(models.Rating(**row))
+        db.flush()
+        return
+    statement = UPSERT_INSERTS[dialect](models.Rating)
+    statement = statement.on_conflict_do_update(
+        index_elements=[models.Rating.pokemon_id, models.Rating.user_id],
+        set_={
+            "rating": statement.excluded.rating,
+            "comment": statement.excluded.comment,
+            "updated_at": func.now(),
+        },
+    )
+    db.execute(statement, rows)
+
+
+def create_or_update_ratings(db: Session, ratings: List[schemas.RatingCreate], user_id: str = "admin") -> List[str]:
+    """Upsert many ratings for ``user_id`` in a single transaction.
+
+    Returns one status per input: ``created``, ``updated``, ``not_found`` for
+    unknown Pokemon, or ``superseded`` when a later item in the same batch
+    rates the same Pokemon (the last one wins).
+    """
+    ids = {rating.pokemon_id for rating in ratings}
+    pokemon = {p.id: p for p in db.query(models.Pokemon).filter(models.Pokemon.id.in_(ids))}
+    existing = dict(db.query(models.Rating.pokemon_id, models.Rating.rating).filter(
+        models.Rating.user_id == user_id, models.Rating.pokemon_id.in_(ids)
+    ))
+    last_index = {rating.pokemon_id: i for i, rating in enumerate(ratings)}
+
+    statuses = []
+    rows = []
+    for i, rating in enumerate(ratings):
+        if rating.pokemon_id not in pokemon:
+            statuses.append("not_found")
+        elif last_index[rating.pokemon_id] != i:
+            statuses.append("superseded")
+        else:
+            statuses.append("updated" if rating.pokemon_id in existing else "created")
+            rows.append({"pokemon_id": rating.pokemon_id, "user_id": user_id,
+                         "rating": rating.rating, "comment": rating.comment})
+    if not rows:
+        return statuses
+
+    _upsert_ratings(db, rows)
+    changes = [(pokemon[row["pokemon_id"]], existing.get(row["pokemon_id"]), row["rating"]) for row in rows]
+    aggregates.apply_rating_changes(db, changes)
+    rankings.apply_rating_changes(db, changes)
+    db.execute(insert(models.RatingEvent), [
+        {"pokemon_id": row["pokemon_id"], "user_id": user_id, "old_rating": existing.get(row["pokemon_id"]),
+         "rating": row["rating"]}
+        for row in rows
+    ])
+    db.commit()
+    analytics_cache.invalidate({tag for row in rows for tag in rating_tags(pokemon[row["pokemon_id"]])})
+    event_broker.notify()
+    for row in rows:
+        if row["pokemon_id"] not in existing:
+            unrated_sampler.mark_rated(user_id, row["pokemon_id"])
+    return statuses
+
+
+def ensure_unique_ratings(db: Session) -> int:
+    """Add the (pokemon_id, user_id) unique index to databases created without it.
+
+    Older databases could hold several ratings for the same Pokemon and user;
+    all but the newest are deleted first. Returns the number of rows removed.
+    """
+    inspector = inspect(db.get_bind())
+    columns = ["pokemon_id", "user_id"]
+    if any(c["column_names"] == columns for c in inspector.get_unique_constraints("ratings")) or any(
+        i["unique"] and i["column_names"] == columns for i in inspector.get_indexes("ratings")
+    ):
+        return 0
+    keep = db.query(func.max(models.Rating.id)).group_by(models.Rating.pokemon_id, models.Rating.user_id)
+    removed = db.query(models.Rating).filter(models.Rating.id.not_in(keep)).delete(synchronize_session=False)
+    db.execute(text("CREATE UNIQUE INDEX uq_ratings_pokemon_user ON ratings (pokemon_id, user_id)"))
+    db.commit()
+    return removed
+
+
 def get_pokemon_with_rating(db: Session, pokemon_name: str, user_id: str = "admin"):
     pokemon = get_pokemon_by_name(db, pokemon_name)
     rating = None
@@ -59,15 +214,29 @@ def get_pokemon_with_rating(db: Session, pokemon_name: str, user_id: str = "admi
     return {"pokemon": pokemon, "rating": rating}
 
 
-def get_unrated_pokemon(db: Session, limit: int = 10):
-    """Get Pokemon that haven't been rated yet."""
-    rated_pokemon_ids = db.query(models.Rating.pokemon_id).distinct().all()
-    rated_ids = [row[0] for row in rated_pokemon_ids]
-    return db.query(models.Pokemon).filter(~models.Pokemon.id.in_(rated_ids)).order_by(func.random()).limit(limit).all()
+def get_unrated_pokemon(db: Session, limit: int = 10, user_id: str = "admin"):
+    """Get a random selection of Pokemon the user hasn't rated yet."""
+    ids = unrated_sampler.sample(db, user_id, limit)
+    return get_pokemon_by_ids(db, ids) if ids else []
+
+
+def ensure_search_index(db: Session):
+    """Build the search index, or rebuild it if the catalogue has reloaded since."""
+    if settings.catalogue_enabled:
+        search_index.sync(catalogue.snapshot(db))
+    else:
+        search_index.ensure_built(db)
 
 
 def search_pokemon(db: Session, query: str, limit: int = 20):
-    """Search Pokemon by name."""
+    """Search Pokemon by name using the in-memory search index."""
+    ensure_search_index(db)
+    ids = search_index.search(query, limit)
+    return get_pokemon_by_ids(db, ids) if ids else []
+
+
+def search_pokemon_ilike(db: Session, query: str, limit: int = 20):
+    """Search Pokemon by name with a LIKE scan. Kept for comparison benchmarks."""
     return db.query(models.Pokemon).filter(
         models.Pokemon.name.ilike(f"%{query}%")
     ).limit(limit).all()
@@ -82,6 +251,7 @@ def get_top_rated_pokemon(db: Session, limit: int = 10):
         models.Rating.comment,
         models.Pokemon.sprite_url,
         models.Pokemon.artwork_url,
+        models.Pokemon.dex_number,
     ).join(models.Pokemon, models.Rating.pokemon_id == models.Pokemon.id)
     results = results.order_by(desc(models.Rating.rating)).limit(limit).all()
     return [
@@ -91,6 +261,7 @@ def get_top_rated_pokemon(db: Session, limit: int = 10):
             "comment": row[2],
             "sprite_url": row[3],
             "artwork_url": row[4],
+            "dex_number": row[5],
         }
         for row in results
     ]
@@ -104,6 +275,7 @@ def get_bottom_rated_pokemon(db: Session, limit: int = 10):
         models.Rating.comment,
         models.Pokemon.sprite_url,
         models.Pokemon.artwork_url,
+        models.Pokemon.dex_number,
     ).join(models.Pokemon, models.Rating.pokemon_id == models.Pokemon.id)
     results = results.order_by(asc(models.Rating.rating)).limit(limit).all()
     return [
@@ -113,6 +285,7 @@ def get_bottom_rated_pokemon(db: Session, limit: int = 10):
             "comment": row[2],
             "sprite_url": row[3],
             "artwork_url": row[4],
+            "dex_number": row[5],
         }
         for row in results
     ]
@@ -125,6 +298,7 @@ def get_ratings_by_type(db: Session, pokemon_type: str):
         models.Rating.rating,
         models.Pokemon.sprite_url,
         models.Pokemon.artwork_url,
+        models.Pokemon.dex_number,
     ).join(
         models.Pokemon, models.Rating.pokemon_id == models.Pokemon.id
     ).filter(
@@ -132,7 +306,7 @@ def get_ratings_by_type(db: Session, pokemon_type: str):
     ).all()
     
     # Convert to list of dictionaries
-    return [{"pokemon_name": row[0], "rating": row[1], "sprite_url": row[2], "artwork_url": row[3]} for row in results]
+    return [{"pokemon_name": row[0], "rating": row[1], "sprite_url": row[2], "artwork_url": row[3], "dex_number": row[4]} for row in results]
 
 
 def get_ratings_by_generation(db: Session, generation: int):
@@ -142,6 +316,7 @@ def get_ratings_by_generation(db: Session, generation: int):
         models.Rating.rating,
         models.Pokemon.sprite_url,
         models.Pokemon.artwork_url,
+        models.Pokemon.dex_number,
     ).join(
         models.Pokemon, models.Rating.pokemon_id == models.Pokemon.id
     ).filter(
@@ -149,30 +324,70 @@ def get_ratings_by_generation(db: Session, generation: int):
     ).all()
     
     # Convert to list of dictionaries
-    return [{"pokemon_name": row[0], "rating": row[1], "sprite_url": row[2], "artwork_url": row[3]} for row in results]
+    return [{"pokemon_name": row[0], "rating": row[1], "sprite_url": row[2], "artwork_url": row[3], "dex_number": row[4]} for row in results]
 
 
 def get_rating_statistics(db: Session):
-    """Get overall rating statistics."""
-    stats = db.query(
-        func.count(models.Rating.id).label('total_rated'),
-        func.avg(models.Rating.rating).label('average_rating'),
-        func.max(models.Rating.rating).label('max_rating'),
-        func.min(models.Rating.rating).label('min_rating')
-    ).first()
-    
-    total_pokemon = db.query(func.count(models.Pokemon.id)).scalar()
-    
+    """Get overall rating statistics from the precomputed aggregates."""
+    overall = aggregates.get_summary(db, *aggregates.OVERALL)
+    total_pokemon = aggregates.get_summary(db, *aggregates.CATALOGUE)["count"]
+
     return {
         'total_pokemon': total_pokemon,
-        'total_rated': stats.total_rated,
-        'unrated': total_pokemon - stats.total_rated,
-        'average_rating': float(stats.average_rating) if stats.average_rating else 0,
-        'max_rating': float(stats.max_rating) if stats.max_rating else 0,
-        'min_rating': float(stats.min_rating) if stats.min_rating else 0
+        'total_rated': overall['count'],
+        'unrated': total_pokemon - overall['count'],
+        'average_rating': float(overall['average_rating']),
+        'max_rating': float(overall['max_rating']),
+        'min_rating': float(overall['min_rating']),
+        'histogram': overall['histogram'],
     }
 
 
+def get_dashboard(db: Session, limit: int = 10):
+    """Everything the analytics page shows, read in one session: statistics, top and
+    bottom ``limit`` and the summary of every type and generation."""
+    by_generation = aggregates.get_summaries(db, "generation")
+    return {
+        "statistics": get_rating_statistics(db),
+        "top_rated": get_top_rated_pokemon(db, limit),
+        "bottom_rated": get_bottom_rated_pokemon(db, limit),
+        "by_type": aggregates.get_summaries(db, "type"),
+        "by_generation": dict(sorted(by_generation.items(), key=lambda item: int(item[0]))),
+        # /api/events?after= continues from this point
+        "last_event_id": latest_event_id(db),
+    }
+
+
+def get_type_summary(db: Session, pokemon_type: str):
+    """Get rating count, average, range and histogram for a type."""
+    return aggregates.get_summary(db, "type", pokemon_type)
+
+
+def get_generation_summary(db: Session, generation: int):
+    """Get rating count, average, range and histogram for a generation."""
+    return aggregates.get_summary(db, "generation", str(generation))
+
+
+def get_community_ranking(db: Session, limit: int = 10, pokemon_type: Optional[str] = None,
+                          generation: Optional[int] = None, ascending: bool = False):
+    """Pokemon ranked by Bayesian score over all users' ratings, optionally within a type or a generation."""
+    if pokemon_type is not None and generation is not None:
+        raise ValueError("Rank within a type or a generation, not both")
+    if pokemon_type is not None:
+        scope, key = "type", pokemon_type
+    elif generation is not None:
+        scope, key = "generation", str(generation)
+    else:
+        scope, key = aggregates.OVERALL
+    return rankings.get_leaderboard(db, scope, key, limit=limit, ascending=ascending)
+
+
+def get_analytics_summary(db: Session, dimensions=DIMENSIONS):
+    """Grouped rating statistics from the in-memory snapshot, see :mod:`app.analytics`."""
+    rating_snapshot.ensure_loaded(db)
+    return rating_snapshot.summary(dimensions)
+
+
 # User functions
 def get_user(db: Session, username: str):
     return db.query(models.User).filter(models.User.username == username).first()
@@ -185,4 +400,26 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
-    return db_user
\ No newline at end of file
+    return db_user
+
+
+def update_user_password(db: Session, username: str, password: str):
+    from .auth import get_password_hash, invalidate_principal
+    db_user = get_user(db, username)
+    if db_user is None:
+        return None
+    db_user.hashed_password = get_password_hash(password)
+    db.commit()
+    invalidate_principal(username)
+    return db_user
+
+
+def set_user_active(db: Session, username: str, is_active: bool):
+    from .auth import invalidate_principal
+    db_user = get_user(db, username)
+    if db_user is None:
+        return None
+    db_user.is_active = is_active
+    db.commit()
+    invalidate_principal(username)
+    return db_user
@@ -1,20 +1,146 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
 
-engine = create_engine(
-    settings.database_url, connect_args={"check_same_thread": False}
-)
+
+def is_sqlite(url: str) -> bool:
+    return url.split(":", 1)[0].split("+", 1)[0] == "sqlite"
+
+
+def is_file_sqlite(url: str) -> bool:
+    return is_sqlite(url) and url.split("://", 1)[1] not in ("", "/", "/:memory:")
+
+
+def sqlite_pragmas(read_only: bool = False):
+    """PRAGMA statements for the SQLite performance profile."""
+    pragmas = [
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout}",
+        # Persistent per database file; whichever connection opens it first switches it
+        f"PRAGMA journal_mode={settings.sqlite_journal_mode}",
+        f"PRAGMA synchronous={settings.sqlite_synchronous}",
+        f"PRAGMA cache_size={settings.sqlite_cache_size}",
+        f"PRAGMA mmap_size={settings.sqlite_mmap_size}",
+        f"PRAGMA temp_store={settings.sqlite_temp_store}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+
+def apply_sqlite_profile(engine, read_only: bool = False):
+    """Run the profile's PRAGMAs on every new connection of ``engine``."""
+    pragmas = sqlite_pragmas(read_only)
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    return engine
+
+
+def create_engines(url: str):
+    """Build the writer and reader engines for ``url``.
+
+    With the SQLite profile enabled on a file database, writes go through a
+    single pooled connection (so writers queue in the pool instead of
+    fighting over the database lock) and reads through a separate pool of
+    read-only connections that WAL lets run alongside the writer. Other
+    databases use one engine for both.
+    """
+    if not is_sqlite(url):
+        writer = create_engine(url)
+        return writer, writer
+    connect_args = {"check_same_thread": False}
+    if not (settings.sqlite_profile and is_file_sqlite(url)):
+        writer = create_engine(url, connect_args=connect_args)
+        return writer, writer
+
+    writer = apply_sqlite_profile(create_engine(
+        url, connect_args=connect_args, pool_size=1, max_overflow=0, pool_timeout=30
+    ))
+    reader = apply_sqlite_profile(create_engine(
+        url, connect_args=connect_args, pool_size=settings.sqlite_read_pool_size, max_overflow=0
+    ), read_only=True)
+    return writer, reader
+
+
+engine, read_engine = create_engines(settings.database_url)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 Base = declarative_base()
 
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Map a sync database URL onto its async driver (aiosqlite or asyncpg)."""
+    scheme, rest = url.split("://", 1)
+    dialect = scheme.split("+", 1)[0]
+    if dialect not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {scheme!r} database URLs")
+    return f"{ASYNC_DRIVERS[dialect]}://{rest}"
+
+
+_async_engine = None
+_AsyncSessionLocal = None
+
+
+def get_async_engine():
+    """Create the async engine on first use, so sync deployments never load the driver."""
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        _async_engine = create_async_engine(async_database_url(settings.database_url))
+        if settings.sqlite_profile and is_file_sqlite(settings.database_url):
+            apply_sqlite_profile(_async_engine.sync_engine)
+        # Objects stay loaded after commit; lazy loads are not possible in async code
+        _AsyncSessionLocal = async_sessionmaker(
+            _async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+    return _async_engine
+
+
+def reset_after_fork():
+    """Drop pooled connections inherited from a parent process without closing them for the parent."""
+    for bound in {engine, read_engine}:
+        bound.dispose(close=False)
+    if _async_engine is not None:
+        _async_engine.sync_engine.dispose(close=False)
+
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_read_db():
+    """Session on the read-only pool, for endpoints that never write."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    get_async_engine()
+    async with _AsyncSessionLocal() as db:
+        yield db
+
+
+# Dependencies used by the API: async sessions when DATABASE_ASYNC is enabled
+get_session = get_async_db if settings.database_async else get_db
+get_read_session = get_async_db if settings.database_async else get_read_db
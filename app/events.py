@@ -0,0 +1,214 @@
+"""
+Rating change feed for dashboards (``/api/events``, Server-Sent Events).
+
+Every rating write appends to ``rating_events`` in the same transaction (see
+``crud``), so the log records what changed and in which order.
+:data:`event_broker` tails it and fans new events out to the subscribers of
+this process:
+
+- one task per process reads the events after the last one it delivered,
+  right after a rating write in this process (:meth:`EventBroker.notify`) and
+  every ``events_poll_interval`` seconds for writes by other workers. It runs
+  only while someone is subscribed
+- each event is encoded once into a buffer shared by all subscribers, holding
+  the latest ``events_queue_size`` events. A subscriber is a position in that
+  buffer, so its backlog is bounded by the buffer and an idle connection costs
+  only the connection itself
+- a subscriber that falls further behind than the buffer (a slow or stalled
+  connection) skips its backlog and gets a single ``reset`` event instead,
+  telling it to refetch the dashboard. A fast subscriber never waits for a
+  slow one, and memory does not grow with how far behind anyone is
+- a reconnecting client sends ``Last-Event-ID`` (or ``?after=``) and first
+  receives the events it missed from the log, up to ``events_replay_limit``,
+  or a ``reset`` when it missed more
+
+Event ids are log ids and arrive in increasing order. SQLite commits writers
+one at a time, so ids become visible in order; on PostgreSQL a transaction
+committing after a higher-numbered one can be passed over by the tailer.
+"""
+import asyncio
+from collections import deque
+from itertools import islice
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import models
+from .config import settings
+from .database import ReadSessionLocal
+from .serialization import dumps
+
+RESET = b"event: reset\ndata: {}\n\n"
+HEARTBEAT = b": keep-alive\n\n"
+RETRY_MS = 2000  # EventSource reconnection delay
+BATCH_SIZE = 1000
+CHUNK_EVENTS = 256  # events per write to one connection
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+def latest_event_id(db: Session) -> int:
+    return db.scalar(select(func.max(models.RatingEvent.id))) or 0
+
+
+def read_events(db: Session, after: int, limit: int) -> List[Tuple[int, bytes]]:
+    """``(id, encoded event)`` for up to ``limit`` events after ``after``, oldest first."""
+    event, pokemon = models.RatingEvent, models.Pokemon
+    rows = db.execute(
+        select(event.id, event.pokemon_id, pokemon.name, pokemon.type1, pokemon.type2, pokemon.generation,
+               event.old_rating, event.rating)
+        .join(pokemon, event.pokemon_id == pokemon.id)
+        .where(event.id > after)
+        .order_by(event.id)
+        .limit(limit)
+    )
+    return [
+        (row.id, b"id: %d\nevent: rating\ndata: %s\n\n" % (row.id, dumps({
+            "id": row.id, "pokemon_id": row.pokemon_id, "pokemon_name": row.name, "type1": row.type1,
+            "type2": row.type2, "generation": row.generation, "old_rating": row.old_rating, "rating": row.rating,
+        })))
+        for row in rows
+    ]
+
+
+class Subscriber:
+    """One ``/api/events`` connection: its position in the broker's event buffer."""
+
+    __slots__ = ("position", "ready", "start_id", "resets")
+
+    def __init__(self, position: int, start_id: int):
+        self.position = position  # sequence number of the next event to send
+        self.ready = asyncio.Event()
+        self.start_id = start_id  # events up to this id come from the log, later ones from the buffer
+        self.resets = 0
+
+
+class EventBroker:
+    def __init__(self):
+        self.subscribers: Set[Subscriber] = set()
+        self.last_id = 0
+        self.published = 0  # also the sequence number of the next event
+        self.resets = 0
+        self._buffer: deque = deque(maxlen=settings.events_queue_size)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def full(self) -> bool:
+        return len(self.subscribers) >= settings.events_max_subscribers
+
+    def notify(self):
+        """Wake the tailer after a committed rating write; safe to call from any thread."""
+        loop, wake = self._loop, self._wake
+        if self.subscribers and loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wake.set)
+
+    async def subscribe(self) -> Subscriber:
+        if self.full:
+            raise TooManySubscribers()
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First subscriber on this event loop
+            self._loop, self._wake, self._start_lock, self._task = loop, asyncio.Event(), asyncio.Lock(), None
+            self.subscribers.clear()
+            self._buffer.clear()
+        async with self._start_lock:
+            if self._task is None or self._task.done():
+                self.last_id = await run_in_threadpool(self._read_latest)
+                self._task = asyncio.create_task(self._tail())
+        subscriber = Subscriber(self.published, self.last_id)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    async def next(self, subscriber: Subscriber, timeout: float) -> bytes:
+        """The next events for ``subscriber``, waiting up to ``timeout`` seconds; a heartbeat if none arrived."""
+        if subscriber.position == self.published:
+            subscriber.ready.clear()
+            try:
+                await asyncio.wait_for(subscriber.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return HEARTBEAT
+        oldest = self.published - len(self._buffer)
+        if subscriber.position < oldest:
+            # Too far behind: the client refetches everything up to now instead
+            subscriber.position = self.published
+            subscriber.resets += 1
+            self.resets += 1
+            return RESET
+        start = subscriber.position - oldest
+        chunk = list(islice(self._buffer, start, start + CHUNK_EVENTS))
+        subscriber.position += len(chunk)
+        return b"".join(chunk)
+
+    async def stream(self, after: Optional[int] = None):
+        """The ``/api/events`` body: replay after ``after``, then live events until the connection ages out."""
+        subscriber = await self.subscribe()
+        try:
+            yield b"retry: %d\n\n" % RETRY_MS
+            if after is not None and after < subscriber.start_id:
+                missed = await run_in_threadpool(self._read, after, settings.events_replay_limit + 1)
+                missed = [message for event_id, message in missed if event_id <= subscriber.start_id]
+                yield RESET if len(missed) > settings.events_replay_limit else b"".join(missed)
+            loop = asyncio.get_running_loop()
+            # Ends eventually so a graceful shutdown or restart is not held open; clients reconnect
+            deadline = loop.time() + settings.events_max_connection_age
+            while (remaining := deadline - loop.time()) > 0:
+                yield await self.next(subscriber, min(settings.events_heartbeat_interval, remaining))
+        finally:
+            self.subscribers.discard(subscriber)
+
+    async def _tail(self):
+        while self.subscribers:
+            try:
+                await asyncio.wait_for(self._wake.wait(), settings.events_poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                while self.subscribers:
+                    events = await run_in_threadpool(self._read, self.last_id, BATCH_SIZE)
+                    if events:
+                        self._deliver(events)
+                    if len(events) < BATCH_SIZE:
+                        break
+            except Exception as exc:
+                print(f"Rating event feed: reading rating_events failed: {exc!r}")
+
+    def _deliver(self, events: List[Tuple[int, bytes]]):
+        self._buffer.extend(message for _, message in events)
+        self.last_id = events[-1][0]
+        self.published += len(events)
+        for subscriber in self.subscribers:
+            subscriber.ready.set()
+
+    def _read(self, after: int, limit: int):
+        with ReadSessionLocal() as db:
+            return read_events(db, after, limit)
+
+    def _read_latest(self) -> int:
+        with ReadSessionLocal() as db:
+            return latest_event_id(db)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self):
+        oldest = self.published - len(self._buffer)
+        return {
+            "subscribers": len(self.subscribers),
+            "lagging": sum(subscriber.position < oldest for subscriber in self.subscribers),
+            "last_id": self.last_id,
+            "published": self.published,
+            "resets": self.resets,
+        }
+
+
+event_broker = EventBroker()
@@ -0,0 +1,109 @@
+"""
+Password hashing off the event loop.
+
+argon2 is deliberately slow, so running it inside an ``async def`` handler
+stalls every other request. :class:`PasswordHasher` runs hashing and
+verification on a bounded thread or process pool and tracks how many jobs are
+running or waiting; once ``max_workers + max_queue`` jobs are in flight new
+requests fail fast with :class:`HasherSaturated` (turned into a 429 by the
+login endpoint) instead of piling up.
+
+The argon2 cost parameters come from ``Settings``. ``CryptContext`` marks
+hashes made with other parameters as needing an update, and
+:meth:`PasswordHasher.verify_and_update` returns the replacement hash so
+callers can rehash transparently on login.
+"""
+import asyncio
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from .config import settings
+
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__rounds=settings.argon2_time_cost,
+    argon2__memory_cost=settings.argon2_memory_cost,
+    argon2__parallelism=settings.argon2_parallelism,
+)
+
+
+class HasherSaturated(Exception):
+    """Raised when the hashing pool already has its maximum number of queued jobs."""
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    def __init__(self, max_workers: int = 2, max_queue: int = 8, kind: str = "thread"):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.kind = kind
+        self.rejected = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[Executor] = None
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="argon2")
+        return self._executor
+
+    async def _submit(self, fn, *args):
+        if self.kind == "inline":
+            # Runs on the event loop; only for scripts and comparisons
+            return fn(*args)
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise HasherSaturated()
+            self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify ``password``; also return a new hash if ``hashed_password`` uses outdated parameters."""
+        return await self._submit(_verify_and_update, password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self):
+        return {
+            "in_flight": self._in_flight,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+        }
+
+
+password_hasher = PasswordHasher(
+    max_workers=settings.password_hash_workers,
+    max_queue=settings.password_hash_queue,
+    kind=settings.password_hash_executor,
+)
@@ -0,0 +1,264 @@
+"""
+Opt-in request and SQL instrumentation.
+
+With ``INSTRUMENTATION_ENABLED`` the app is wrapped in
+:class:`InstrumentationMiddleware` and every engine gets SQLAlchemy cursor
+hooks. Each request then records:
+
+- its latency in a per-route histogram
+- the number of SQL statements it ran and the time they took
+- a ``Server-Timing`` header (``app`` and ``db``) that browser dev tools display
+
+A request that runs the same statement ``instrumentation_n_plus_one_threshold``
+or more times is logged as a likely N+1 query. ``/metrics`` exposes the
+counters in the Prometheus text format. :func:`track` applies the same
+accounting to code outside requests, such as the importer.
+
+With ``PROFILING_ENABLED``, a request with ``?profile=cprofile`` (or
+``pyinstrument``, if it is installed) returns the profile of handling that
+request instead of its response. cProfile sees only the event loop thread,
+so work handed to the threadpool shows up as time spent awaiting it;
+pyinstrument attributes time across ``await`` points.
+
+When neither setting is on, nothing is installed. Requests and queries then
+take exactly the uninstrumented path.
+"""
+import cProfile
+import io
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+from sqlalchemy import event
+from starlette.responses import HTMLResponse, PlainTextResponse
+
+from .config import settings
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # pyinstrument is optional; cProfile is always available
+    Profiler = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILERS = ("cprofile", "pyinstrument")
+
+
+class RequestStats:
+    """SQL accounting for one request (or one :func:`track` block)."""
+
+    __slots__ = ("queries", "query_time", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.statements: Dict[str, int] = {}
+
+    def repeated(self, threshold: int) -> Optional[Tuple[str, int]]:
+        """The most repeated statement, if it ran at least ``threshold`` times."""
+        if not self.statements:
+            return None
+        statement, count = max(self.statements.items(), key=lambda item: item[1])
+        return (statement, count) if count >= threshold else None
+
+
+current_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_stats.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats.get()
+    if stats is None:
+        return
+    starts = conn.info.get("query_start")
+    if starts:
+        stats.query_time += time.perf_counter() - starts.pop()
+    stats.queries += 1
+    stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+
+def instrument_engine(engine):
+    """Attach the query hooks to ``engine`` (once)."""
+    if not event.contains(engine, "after_cursor_execute", _after_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    return engine
+
+
+def report_n_plus_one(label: str, stats: RequestStats) -> bool:
+    repeated = stats.repeated(settings.instrumentation_n_plus_one_threshold)
+    if repeated is None:
+        return False
+    statement, count = repeated
+    print(f"Possible N+1 in {label}: {count} of {stats.queries} queries were "
+          f"{' '.join(statement.split())[:200]!r}")
+    return True
+
+
+@contextmanager
+def track(label: str):
+    """Count the queries run inside the block and report N+1 patterns when it ends."""
+    stats = RequestStats()
+    token = current_stats.set(stats)
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        current_stats.reset(token)
+        print(f"{label}: {stats.queries} queries, {stats.query_time * 1000:.0f}ms in SQL, "
+              f"{(time.perf_counter() - start) * 1000:.0f}ms total")
+        report_n_plus_one(label, stats)
+
+
+class Metrics:
+    """Request counters and latency histograms, rendered in the Prometheus text format."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._requests: Dict[Tuple[str, str, int], int] = {}
+        # (method, route) -> [bucket counts..., +Inf count, sum of seconds]
+        self._latency: Dict[Tuple[str, str], list] = {}
+        # (method, route) -> [queries, seconds in SQL, N+1 requests]
+        self._queries: Dict[Tuple[str, str], list] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float, stats: RequestStats, n_plus_one: bool):
+        key = (method, route)
+        with self._lock:
+            self._requests[(method, route, status)] = self._requests.get((method, route, status), 0) + 1
+            latency = self._latency.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+            latency[bisect_left(self.buckets, seconds)] += 1
+            latency[-1] += seconds
+            queries = self._queries.setdefault(key, [0, 0.0, 0])
+            queries[0] += stats.queries
+            queries[1] += stats.query_time
+            queries[2] += n_plus_one
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_requests_total Requests handled, by route and status.",
+            "# TYPE http_requests_total counter",
+        ]
+        with self._lock:
+            for (method, route, status), count in sorted(self._requests.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+            lines += [
+                "# HELP http_request_duration_seconds Request latency, by route.",
+                "# TYPE http_request_duration_seconds histogram",
+            ]
+            for (method, route), latency in sorted(self._latency.items()):
+                labels = f'method="{method}",route="{route}"'
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), latency):
+                    cumulative += count
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"http_request_duration_seconds_sum{{{labels}}} {latency[-1]:.6f}")
+                lines.append(f"http_request_duration_seconds_count{{{labels}}} {cumulative}")
+            for name, index, kind, help_text in (
+                ("db_queries_total", 0, "counter", "SQL statements executed, by route."),
+                ("db_query_duration_seconds_total", 1, "counter", "Time spent in SQL statements, by route."),
+                ("db_n_plus_one_requests_total", 2, "counter", "Requests that repeated one statement "
+                                                               "at least the N+1 threshold, by route."),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for (method, route), values in sorted(self._queries.items()):
+                    value = f"{values[index]:.6f}" if isinstance(values[index], float) else values[index]
+                    lines.append(f'{name}{{method="{method}",route="{route}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def _route_template(app, scope) -> str:
+    """The path template of the route that handled ``scope`` ("unmatched" if none did)."""
+    routes = getattr(app, "_instrumented_routes", None)
+    if routes is None:
+        routes = app._instrumented_routes = {
+            getattr(route, "endpoint", None) or getattr(route, "app", None): route.path for route in app.routes
+        }
+    return routes.get(scope.get("endpoint"), "unmatched")
+
+
+class InstrumentationMiddleware:
+    """Record latency and SQL statistics per request and add a ``Server-Timing`` header."""
+
+    def __init__(self, app, route_app=None):
+        self.app = app
+        # The FastAPI app whose routes name the metrics; the outermost app if not given
+        self.route_app = route_app or app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed = (time.perf_counter() - start) * 1000
+                timing = (f'app;dur={elapsed:.1f}, '
+                          f'db;dur={stats.query_time * 1000:.1f};desc="{stats.queries} queries"')
+                message = {**message, "headers": list(message.get("headers", [])) + [
+                    (b"server-timing", timing.encode()),
+                ]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_stats.reset(token)
+            seconds = time.perf_counter() - start
+            route = _route_template(self.route_app, scope)
+            n_plus_one = report_n_plus_one(f"{scope['method']} {route}", stats)
+            metrics.observe(scope["method"], route, status, seconds, stats, n_plus_one)
+
+
+class ProfilerMiddleware:
+    """Return a profile of the request instead of its response when ``?profile=`` asks for one."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or b"profile=" not in scope.get("query_string", b""):
+            return await self.app(scope, receive, send)
+        kind = parse_qs(scope["query_string"].decode()).get("profile", [""])[0]
+        if kind not in PROFILERS or (kind == "pyinstrument" and Profiler is None):
+            available = "cprofile, pyinstrument" if Profiler is not None else "cprofile"
+            response = PlainTextResponse(f"Unknown profiler {kind!r}; available: {available}", status_code=400)
+            return await response(scope, receive, send)
+
+        async def discard(message):
+            pass
+
+        if kind == "pyinstrument":
+            profiler = Profiler(async_mode="enabled")
+            profiler.start()
+            try:
+                await self.app(scope, receive, discard)
+            finally:
+                profiler.stop()
+            return await HTMLResponse(profiler.output_html())(scope, receive, send)
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(60)
+        return await PlainTextResponse(output.getvalue())(scope, receive, send)
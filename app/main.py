@@ -1,56 +1,115 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Form
+import asyncio
+import hashlib
+import json
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Depends, HTTPException, status, Form, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+from fastapi import Request, Response
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 from datetime import timedelta
 from typing import List, Optional
 
-from . import crud, models, schemas, auth
-from .database import SessionLocal, engine, get_db
+from . import async_crud, crud, schemas, auth
+from .async_crud import AnySession
+from .database import ReadSessionLocal, SessionLocal, engine, get_async_engine, get_read_session, get_session, read_engine
+from .analytics import DIMENSIONS, rating_snapshot
+from .cache import analytics_cache
+from .compression import CompressionMiddleware, PrecompressedStaticFiles, static_url
+from .events import event_broker
+from .hashing import HasherSaturated, password_hasher
+from .instrumentation import InstrumentationMiddleware, ProfilerMiddleware, instrument_engine, metrics
+from .media import KINDS as MEDIA_KINDS, THUMBNAIL_SIZES, catalogue_media, media_cache
+from .pagination import InvalidCursor, iter_csv, iter_ndjson
+from .serialization import POKEMON_COLUMNS, POKEMON_FIELDS, dumps, encode_rows, json_response
 from .config import settings
 from .services.pokeapi import pokeapi_service
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+MAX_PAGE_SIZE = 1000  # rows per list response; /api/pokemon/export streams everything
 
-app = FastAPI(title="Pokemon Rater", description="Rate and analyze Pokemon")
+EXPORT_FORMATS = {
+    "ndjson": (iter_ndjson, "application/x-ndjson"),
+    "csv": (iter_csv, "text/csv"),
+}
 
-# Static files and templates
-app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
+def warm_caches():
+    """Load the catalogue, search index and analytics snapshot before the first requests need them."""
+    db = ReadSessionLocal()
+    try:
+        crud.ensure_search_index(db)
+        rating_snapshot.ensure_loaded(db)
+    finally:
+        db.close()
 
-# Initialize admin user
-def init_admin_user():
+async def prefetch_media():
     db = SessionLocal()
     try:
-        existing_user = crud.get_user(db, settings.admin_username)
-        if not existing_user:
-            hashed_password = auth.get_password_hash(settings.admin_password)
-            admin_user = models.User(
-                username=settings.admin_username,
-                hashed_password=hashed_password,
-                is_active=True
-            )
-            db.add(admin_user)
-            db.commit()
-            print(f"Created admin user: {settings.admin_username}")
+        sources = crud.get_media_sources(db)
     finally:
         db.close()
+    counts = await media_cache.prefetch(catalogue_media(sources))
+    print(f"Media prefetch: {counts['fetched']} fetched, {counts['cached']} already cached, {counts['failed']} failed")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # With AUTO_MIGRATE off the schema is prepared beforehand (python -m app.migrate)
+    if settings.auto_migrate:
+        from . import migrate
+        await run_in_threadpool(migrate.prepare)
+    tasks = []
+    if settings.warm_caches_on_startup:
+        tasks.append(asyncio.create_task(run_in_threadpool(warm_caches)))
+    if settings.media_prefetch_on_startup:
+        tasks.append(asyncio.create_task(prefetch_media()))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await pokeapi_service.close()
+        await media_cache.close()
+        await event_broker.close()
+        password_hasher.shutdown()
+
+app = FastAPI(title="Pokemon Rater", description="Rate and analyze Pokemon", lifespan=lifespan)
+
+# Static files and templates
+app.mount("/static", PrecompressedStaticFiles(directory="static"), name="static")
+templates = Jinja2Templates(directory="templates")
+templates.env.globals["static_url"] = static_url
 
-# Initialize admin user on startup
-@app.on_event("startup")
-async def startup_event():
-    init_admin_user()
+# Opt-in instrumentation; when disabled nothing is installed
+if settings.instrumentation_enabled:
+    instrument_engine(engine)
+    instrument_engine(read_engine)
+    if settings.database_async:
+        instrument_engine(get_async_engine().sync_engine)
+    app.add_middleware(InstrumentationMiddleware, route_app=app)
+if settings.profiling_enabled:
+    app.add_middleware(ProfilerMiddleware)
+if settings.compression_enabled:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_minimum_size,
+                       level=settings.compression_level)
 
 # Authentication endpoints
 @app.post("/token", response_model=schemas.Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AnySession = Depends(get_session)
 ):
-    user = auth.authenticate_user(db, form_data.username, form_data.password)
+    try:
+        user = await auth.authenticate_user_async(db, form_data.username, form_data.password)
+    except HasherSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts in progress, try again shortly",
+            headers={"Retry-After": "1"},
+        )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -59,60 +118,316 @@ async def login_for_access_token(
         )
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = auth.create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=auth.token_claims(user), expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 # Pokemon endpoints
 @app.get("/api/pokemon", response_model=List[schemas.Pokemon])
-def get_pokemon_list(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    pokemon = crud.get_pokemon_list(db, skip=skip, limit=limit)
+async def get_pokemon_list(
+    request: Request,
+    response: Response,
+    skip: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    order_by: str = "id",
+    db: AnySession = Depends(get_read_session)
+):
+    # With fast serialization the rows are plain column tuples encoded
+    # straight to bytes, bypassing response_model validation
+    columns = POKEMON_COLUMNS if settings.fast_serialization else None
+    # skip keeps the old OFFSET paging for existing clients; without it pages
+    # are keyset-based and the next page is advertised in X-Next-Cursor/Link
+    if skip is not None and cursor is None:
+        pokemon = await async_crud.get_pokemon_list(db, skip=skip, limit=limit, columns=columns)
+        return json_response(encode_rows(POKEMON_FIELDS, pokemon)) if columns else pokemon
+    try:
+        pokemon, next_cursor = await async_crud.get_pokemon_page(db, limit=limit, cursor=cursor, order_by=order_by,
+                                                                 columns=columns)
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    if next_cursor:
+        next_url = request.url.include_query_params(cursor=next_cursor, limit=limit, order_by=order_by)
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    if columns:
+        return json_response(encode_rows(POKEMON_FIELDS, pokemon), headers=response.headers)
     return pokemon
 
+def stream_export(iter_rows, user_id: Optional[str]):
+    # The export owns its session: it outlives the request's dependencies
+    db = ReadSessionLocal()
+    try:
+        yield from iter_rows(db, user_id, settings.export_batch_size)
+    finally:
+        db.close()
+
+@app.get("/api/pokemon/export")
+async def export_pokemon(format: str = "ndjson", include_ratings: bool = False, user_id: str = "admin"):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown export format: {format}")
+    iter_rows, media_type = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        stream_export(iter_rows, user_id if include_ratings else None),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="pokemon.{format}"'},
+    )
+
 @app.get("/api/pokemon/{pokemon_name}", response_model=schemas.PokemonWithRating)
-def get_pokemon_with_rating(pokemon_name: str, db: Session = Depends(get_db)):
-    result = crud.get_pokemon_with_rating(db, pokemon_name)
+async def get_pokemon_with_rating(pokemon_name: str, db: AnySession = Depends(get_read_session)):
+    result = await async_crud.get_pokemon_with_rating(db, pokemon_name)
     return result
 
 @app.get("/api/pokemon/search/{query}")
-def search_pokemon(query: str, db: Session = Depends(get_db)):
-    pokemon = crud.search_pokemon(db, query)
+async def search_pokemon(query: str, limit: int = 20, db: AnySession = Depends(get_read_session)):
+    pokemon = await async_crud.search_pokemon(db, query, limit)
     return pokemon
 
 @app.get("/api/unrated-pokemon")
-def get_unrated_pokemon(limit: int = 10, db: Session = Depends(get_db)):
-    pokemon = crud.get_unrated_pokemon(db, limit)
+async def get_unrated_pokemon(limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE), user_id: str = "admin",
+                              db: AnySession = Depends(get_read_session)):
+    pokemon = await async_crud.get_unrated_pokemon(db, limit, user_id=user_id)
     return pokemon
 
 # Rating endpoints
 @app.post("/api/rate", response_model=schemas.Rating)
-def rate_pokemon(
+async def rate_pokemon(
     rating: schemas.RatingCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    db: AnySession = Depends(get_session),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
 ):
-    return crud.create_or_update_rating(db, rating, user_id=current_user.username)
+    return await async_crud.create_or_update_rating(db, rating, user_id=current_user.username)
+
+async def read_rating_batch(request: Request) -> list:
+    """Decode a JSON array or NDJSON body; lines that are not JSON become ``None``."""
+    limit = settings.rating_batch_max_items
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"A batch may contain at most {limit} ratings",
+    )
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        items, buffer = [], b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    try:
+                        items.append(json.loads(line))
+                    except ValueError:
+                        items.append(None)
+            if len(items) > limit:
+                raise too_large
+        if buffer.strip():
+            try:
+                items.append(json.loads(buffer))
+            except ValueError:
+                items.append(None)
+    else:
+        try:
+            items = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be a JSON array or NDJSON")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be a JSON array or NDJSON")
+    if len(items) > limit:
+        raise too_large
+    return items
+
+@app.post("/api/rate/batch", response_model=schemas.RatingBatchResult)
+async def rate_pokemon_batch(
+    request: Request,
+    db: AnySession = Depends(get_session),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
+):
+    results = []
+    ratings = []
+    for index, item in enumerate(await read_rating_batch(request)):
+        try:
+            rating = schemas.RatingCreate.model_validate(item)
+        except ValidationError as exc:
+            error = "Invalid JSON" if item is None else "; ".join(
+                f"{'.'.join(map(str, e['loc'])) or 'item'}: {e['msg']}" for e in exc.errors()
+            )
+            pokemon_id = item.get("pokemon_id") if isinstance(item, dict) else None
+            results.append(schemas.RatingBatchItemResult(
+                index=index, pokemon_id=pokemon_id if isinstance(pokemon_id, int) else None,
+                status="invalid", error=error,
+            ))
+            continue
+        ratings.append((index, rating))
+
+    statuses = await async_crud.create_or_update_ratings(db, [rating for _, rating in ratings], user_id=current_user.username)
+    for (index, rating), item_status in zip(ratings, statuses):
+        results.append(schemas.RatingBatchItemResult(
+            index=index, pokemon_id=rating.pokemon_id, status=item_status,
+            error="Pokemon not found" if item_status == "not_found" else None,
+        ))
+    results.sort(key=lambda result: result.index)
+    return schemas.RatingBatchResult(
+        created=statuses.count("created"),
+        updated=statuses.count("updated"),
+        failed=sum(result.status in ("invalid", "not_found") for result in results),
+        results=results,
+    )
 
 # Analytics endpoints
+async def cached_body(key: str, tags, compute):
+    """``(JSON body, ETag)`` of the result of awaiting ``compute()``, from the analytics cache."""
+    entry = analytics_cache.get(key)
+    if entry is None:
+        # A rating committed while compute() runs must not be masked by its result
+        generation = analytics_cache.generation(tags)
+        result = await compute()
+        body = dumps(result) if settings.fast_serialization else json.dumps(jsonable_encoder(result)).encode()
+        entry = (body, '"%s"' % hashlib.sha1(body).hexdigest())
+        analytics_cache.set(key, entry, tags, generation=generation)
+    return entry
+
+async def cached_json(request: Request, key: str, tags, compute):
+    """Serve the result of awaiting ``compute()`` as JSON from the analytics cache, with ETag revalidation."""
+    body, etag = await cached_body(key, tags, compute)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+@app.get("/api/analytics/dashboard")
+async def get_dashboard(request: Request, limit: int = 10, db: AnySession = Depends(get_read_session)):
+    return await cached_json(request, f"dashboard:{limit}", ["overall:"],
+                             lambda: async_crud.get_dashboard(db, limit))
+
 @app.get("/api/analytics/top-rated")
-def get_top_rated(limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_top_rated_pokemon(db, limit)
+async def get_top_rated(request: Request, limit: int = 10, db: AnySession = Depends(get_read_session)):
+    return await cached_json(request, f"top-rated:{limit}", ["overall:"],
+                             lambda: async_crud.get_top_rated_pokemon(db, limit))
 
 @app.get("/api/analytics/bottom-rated")
-def get_bottom_rated(limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_bottom_rated_pokemon(db, limit)
+async def get_bottom_rated(request: Request, limit: int = 10, db: AnySession = Depends(get_read_session)):
+    return await cached_json(request, f"bottom-rated:{limit}", ["overall:"],
+                             lambda: async_crud.get_bottom_rated_pokemon(db, limit))
 
 @app.get("/api/analytics/statistics")
-def get_statistics(db: Session = Depends(get_db)):
-    return crud.get_rating_statistics(db)
+async def get_statistics(request: Request, db: AnySession = Depends(get_read_session)):
+    return await cached_json(request, "statistics", ["overall:"],
+                             lambda: async_crud.get_rating_statistics(db))
 
 @app.get("/api/analytics/by-type/{pokemon_type}")
-def get_ratings_by_type(pokemon_type: str, db: Session = Depends(get_db)):
-    return crud.get_ratings_by_type(db, pokemon_type)
+async def get_ratings_by_type(request: Request, pokemon_type: str, db: AnySession = Depends(get_read_session)):
+    return await cached_json(request, f"by-type:{pokemon_type}", [f"type:{pokemon_type}"],
+                             lambda: async_crud.get_ratings_by_type(db, pokemon_type))
+
+@app.get("/api/analytics/by-type/{pokemon_type}/summary")
+async def get_type_summary(request: Request, pokemon_type: str, db: AnySession = Depends(get_read_session)):
+    return await cached_json(request, f"by-type-summary:{pokemon_type}", [f"type:{pokemon_type}"],
+                             lambda: async_crud.get_type_summary(db, pokemon_type))
 
 @app.get("/api/analytics/by-generation/{generation}")
-def get_ratings_by_generation(generation: int, db: Session = Depends(get_db)):
-    return crud.get_ratings_by_generation(db, generation)
+async def get_ratings_by_generation(request: Request, generation: int, db: AnySession = Depends(get_read_session)):
+    return await cached_json(request, f"by-generation:{generation}", [f"generation:{generation}"],
+                             lambda: async_crud.get_ratings_by_generation(db, generation))
+
+@app.get("/api/analytics/by-generation/{generation}/summary")
+async def get_generation_summary(request: Request, generation: int, db: AnySession = Depends(get_read_session)):
+    return await cached_json(request, f"by-generation-summary:{generation}", [f"generation:{generation}"],
+                             lambda: async_crud.get_generation_summary(db, generation))
+
+@app.get("/api/rankings/{direction}")
+async def get_community_ranking(
+    request: Request,
+    direction: str,
+    limit: int = 10,
+    type: Optional[str] = None,
+    generation: Optional[int] = None,
+    db: AnySession = Depends(get_read_session)
+):
+    if direction not in ("top", "bottom"):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Expected /api/rankings/top or /api/rankings/bottom")
+    if type is not None and generation is not None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pass type or generation, not both")
+    if type is not None:
+        tag = f"type:{type}"
+    elif generation is not None:
+        tag = f"generation:{generation}"
+    else:
+        tag = "overall:"
+    return await cached_json(
+        request, f"rankings:{direction}:{tag}:{limit}", [tag],
+        lambda: async_crud.get_community_ranking(db, limit, pokemon_type=type, generation=generation,
+                                                 ascending=direction == "bottom"),
+    )
+
+@app.get("/api/analytics/summary")
+async def get_analytics_summary(request: Request, db: AnySession = Depends(get_read_session)):
+    return await cached_json(request, "summary", ["overall:"],
+                             lambda: async_crud.get_analytics_summary(db))
+
+@app.get("/api/analytics/summary/{dimension}")
+async def get_analytics_summary_for(request: Request, dimension: str, db: AnySession = Depends(get_read_session)):
+    if dimension not in DIMENSIONS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"Unknown dimension, expected one of: {', '.join(DIMENSIONS)}")
+    return await cached_json(request, f"summary:{dimension}", ["overall:"],
+                             lambda: async_crud.get_analytics_summary(db, (dimension,)))
+
+@app.get("/api/events")
+async def get_events(request: Request, after: Optional[int] = None):
+    """Server-Sent Events with every rating change after ``after`` (or the ``Last-Event-ID`` header)."""
+    if event_broker.full:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Too many event subscribers, try again shortly", headers={"Retry-After": "5"})
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        after = int(last_event_id)
+    return StreamingResponse(event_broker.stream(after), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    return {
+        "analytics": analytics_cache.stats(),
+        "pokeapi": pokeapi_service.cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "media": media_cache.stats(),
+        "events": event_broker.stats(),
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    if not settings.instrumentation_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Instrumentation is disabled")
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Media endpoints
+@app.get("/media/{dex}/{kind}")
+async def get_media(
+    request: Request,
+    dex: int,
+    kind: str,
+    size: Optional[int] = None,
+):
+    if kind not in MEDIA_KINDS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown media kind: {kind}")
+    if size is not None and size not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"size must be one of {', '.join(map(str, THUMBNAIL_SIZES))}")
+
+    async def resolve_url():
+        # Only reached on a cache miss, so cached images never open a session
+        db = ReadSessionLocal()
+        try:
+            pokemon = await async_crud.get_pokemon_by_dex(db, dex)
+        finally:
+            db.close()
+        return getattr(pokemon, f"{kind}_url") if pokemon else None
+
+    entry = await media_cache.get(dex, kind, resolve_url, size=size)
+    if entry is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Image not available")
+    headers = {"ETag": entry.etag, "Cache-Control": f"public, max-age={settings.media_max_age}"}
+    if request.headers.get("if-none-match") == entry.etag:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(entry.path, media_type=entry.content_type, headers=headers, stat_result=entry.stat)
 
 # Web interface endpoints
 @app.get("/")
@@ -127,9 +442,28 @@ async def login_page(request: Request):
 async def rate_page(request: Request):
     return templates.TemplateResponse("rate.html", {"request": request})
 
+def live_state(dashboard: dict) -> dict:
+    """What the analytics page script needs to apply /api/events changes to a server-rendered dashboard."""
+    def summary(values):
+        return {key: value for key, value in values.items() if key != "histogram"}
+
+    return {
+        "statistics": summary(dashboard["statistics"]),
+        "top_rated": [{"pokemon_name": p["pokemon_name"], "rating": p["rating"]} for p in dashboard["top_rated"]],
+        "bottom_rated": [{"pokemon_name": p["pokemon_name"], "rating": p["rating"]} for p in dashboard["bottom_rated"]],
+        "by_type": {key: summary(values) for key, values in dashboard["by_type"].items()},
+        "by_generation": {key: summary(values) for key, values in dashboard["by_generation"].items()},
+        "last_event_id": dashboard["last_event_id"],
+    }
+
 @app.get("/analytics")
-async def analytics_page(request: Request):
-    return templates.TemplateResponse("analytics.html", {"request": request})
+async def analytics_page(request: Request, db: AnySession = Depends(get_read_session)):
+    dashboard = live = None
+    if settings.analytics_server_render:
+        body, _ = await cached_body("dashboard:10", ["overall:"], lambda: async_crud.get_dashboard(db, 10))
+        dashboard = json.loads(body)
+        live = live_state(dashboard)
+    return templates.TemplateResponse("analytics.html", {"request": request, "dashboard": dashboard, "live": live})
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,261 @@
+"""
+Local cache for Pokemon sprites and artwork.
+
+Images referenced by ``sprite_url``/``artwork_url`` are downloaded once and
+stored content-addressed under ``media_cache_dir``::
+
+    objects/ab/ab12...ef     image bytes, named by their SHA-256
+    refs/25-artwork          "<sha256> <content type>" for Pokemon #25's artwork
+    refs/25-artwork-96       the same for a 96px thumbnail
+
+``/media/{dex}/{kind}`` serves from the cache with the hash as a strong ETag,
+fetching on a miss unless ``media_offline`` is set. :meth:`MediaCache.prefetch`
+downloads a whole catalogue concurrently (importer ``--prefetch-media`` or
+``MEDIA_PREFETCH_ON_STARTUP``). Refs and objects are written to a temporary
+file and renamed into place, so several workers can share one cache
+directory.
+
+Thumbnails need Pillow; without it the original image is served for any size.
+httpx is imported when the first download starts.
+"""
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Iterable, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+from starlette.concurrency import run_in_threadpool
+
+from .config import settings
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; thumbnails fall back to the original
+    Image = None
+
+if TYPE_CHECKING:
+    import httpx
+
+KINDS = ("sprite", "artwork")
+THUMBNAIL_SIZES = (48, 64, 96, 128, 256)
+
+
+class MediaEntry(NamedTuple):
+    path: str
+    digest: str
+    content_type: str
+    stat: os.stat_result
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.digest}"'
+
+
+def ref_key(dex: int, kind: str, size: Optional[int] = None) -> str:
+    return f"{dex}-{kind}" if size is None else f"{dex}-{kind}-{size}"
+
+
+def _write_atomic(path: str, data: bytes):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _thumbnail(data: bytes, size: int) -> Tuple[bytes, str]:
+    with Image.open(io.BytesIO(data)) as image:
+        image.thumbnail((size, size))
+        output = io.BytesIO()
+        image.save(output, format="PNG", optimize=True)
+    return output.getvalue(), "image/png"
+
+
+class MediaCache:
+    def __init__(self, root: str, upstream_url: Optional[str] = None, concurrency: int = 8,
+                 timeout: float = 10.0, offline: bool = False, transport: Optional["httpx.AsyncBaseTransport"] = None):
+        self.root = root
+        self.upstream_url = upstream_url.rstrip("/") if upstream_url else None
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.offline = offline
+        self.transport = transport
+        self.hits = 0
+        self.misses = 0
+        self.fetched = 0
+        self.failed = 0
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+        # Resolved refs; objects are immutable, so these only change when a ref is re-fetched
+        self._entries: Dict[str, MediaEntry] = {}
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def _ref_path(self, key: str) -> str:
+        return os.path.join(self.root, "refs", key)
+
+    def lookup(self, key: str) -> Optional[MediaEntry]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry
+        try:
+            with open(self._ref_path(key)) as handle:
+                digest, content_type = handle.read().split(" ", 1)
+            path = self._object_path(digest)
+            entry = MediaEntry(path, digest, content_type, os.stat(path))
+        except (FileNotFoundError, ValueError):
+            return None
+        self._entries[key] = entry
+        return entry
+
+    def store(self, key: str, data: bytes, content_type: str) -> MediaEntry:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            _write_atomic(path, data)
+        _write_atomic(self._ref_path(key), f"{digest} {content_type}".encode())
+        entry = self._entries[key] = MediaEntry(path, digest, content_type, os.stat(path))
+        return entry
+
+    def source_url(self, url: str) -> str:
+        """``url`` with its scheme and host replaced by ``upstream_url``, if one is configured."""
+        if not self.upstream_url:
+            return url
+        parts = urlsplit(url)
+        return self.upstream_url + parts.path + (f"?{parts.query}" if parts.query else "")
+
+    async def start(self):
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.concurrency),
+                transport=self.transport,
+                follow_redirects=True,
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _download(self, key: str, url: str) -> Optional[MediaEntry]:
+        import httpx
+
+        await self.start()
+        async with self._semaphore:
+            try:
+                response = await self._client.get(self.source_url(url))
+                response.raise_for_status()
+            except httpx.HTTPError as exc:
+                self.failed += 1
+                print(f"Media fetch failed for {url}: {exc}")
+                return None
+        content_type = response.headers.get("content-type", "application/octet-stream").split(";")[0]
+        entry = await run_in_threadpool(self.store, key, response.content, content_type)
+        self.fetched += 1
+        return entry
+
+    async def fetch(self, key: str, url: str) -> Optional[MediaEntry]:
+        """Download ``url`` into the cache under ``key``; concurrent calls for one key share a download."""
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await pending
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            entry = await self._download(key, url)
+            future.set_result(entry)
+            return entry
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            del self._pending[key]
+
+    async def get(self, dex: int, kind: str, resolve_url: Callable[[], Awaitable[Optional[str]]],
+                  size: Optional[int] = None) -> Optional[MediaEntry]:
+        """The cached image (or thumbnail) for ``dex``/``kind``, downloading it on a miss.
+
+        ``resolve_url`` is only awaited on a miss, so cached images are served
+        without touching the database.
+        """
+        if size is not None and Image is None:
+            size = None
+        key = ref_key(dex, kind, size)
+        entry = self._entries.get(key) or await run_in_threadpool(self.lookup, key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+
+        original_key = ref_key(dex, kind)
+        original = None if size is None else await run_in_threadpool(self.lookup, original_key)
+        if original is None:
+            url = None if self.offline else await resolve_url()
+            if not url:
+                return None
+            original = await self.fetch(original_key, url)
+            if original is None or size is None:
+                return original
+
+        def make_thumbnail():
+            with open(original.path, "rb") as handle:
+                data, content_type = _thumbnail(handle.read(), size)
+            return self.store(key, data, content_type)
+
+        return await run_in_threadpool(make_thumbnail)
+
+    async def prefetch(self, items: Iterable[Tuple[int, str, Optional[str]]]) -> Dict[str, int]:
+        """Download every ``(dex, kind, url)`` not already cached. Returns counts by outcome."""
+        counts = {"cached": 0, "fetched": 0, "failed": 0}
+
+        async def one(dex, kind, url):
+            key = ref_key(dex, kind)
+            if await run_in_threadpool(self.lookup, key) is not None:
+                counts["cached"] += 1
+            elif await self.fetch(key, url) is not None:
+                counts["fetched"] += 1
+            else:
+                counts["failed"] += 1
+
+        await asyncio.gather(*(one(dex, kind, url) for dex, kind, url in items if url))
+        return counts
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "fetched": self.fetched,
+            "failed": self.failed,
+            "thumbnails": Image is not None,
+        }
+
+
+def catalogue_media(rows) -> list:
+    """``(dex, kind, url)`` for every sprite and artwork of ``(dex_number, sprite_url, artwork_url)`` rows."""
+    return [
+        (dex, kind, url)
+        for dex, sprite_url, artwork_url in rows
+        for kind, url in (("sprite", sprite_url), ("artwork", artwork_url))
+        if url
+    ]
+
+
+media_cache = MediaCache(
+    root=settings.media_cache_dir,
+    upstream_url=settings.media_upstream_url,
+    concurrency=settings.media_concurrency,
+    offline=settings.media_offline,
+)
@@ -0,0 +1,87 @@
+"""
+Schema migrations with Alembic.
+
+:func:`upgrade` brings a database to the latest revision in ``migrations/``.
+Databases created by ``Base.metadata.create_all`` before migrations existed
+are adopted by the baseline revision, which only creates missing tables.
+``alembic upgrade head`` / ``alembic downgrade -1`` from the project root do
+the same from the command line.
+
+:func:`prepare` is everything the app needs before serving: the migrations
+plus the admin user and the derived tables. The app runs it on startup when
+``AUTO_MIGRATE`` is on; otherwise run ``python -m app.migrate`` once per
+deploy, before starting the workers.
+"""
+import os
+from typing import Optional
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy.orm import Session
+
+from . import aggregates, crud, models, rankings
+from .auth import get_password_hash
+from .config import settings
+from .database import engine as default_engine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def alembic_config(connection=None) -> Config:
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    config.attributes["connection"] = connection
+    return config
+
+
+def current_revision(engine=None) -> Optional[str]:
+    with (engine or default_engine).connect() as connection:
+        return MigrationContext.configure(connection).get_current_revision()
+
+
+def head_revision() -> str:
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+def upgrade(engine=None, revision: str = "head"):
+    """Migrate the database behind ``engine`` (the app's writer by default) to ``revision``."""
+    with (engine or default_engine).begin() as connection:
+        command.upgrade(alembic_config(connection), revision)
+
+
+def downgrade(engine=None, revision: str = "-1"):
+    with (engine or default_engine).begin() as connection:
+        command.downgrade(alembic_config(connection), revision)
+
+
+def prepare(engine=None):
+    """Migrate, then create the admin user and any missing derived tables."""
+    engine = engine or default_engine
+    upgrade(engine)
+    # One session per step: the schema checks inspect the engine, which needs
+    # the (single) writer connection free
+    with Session(engine) as db:
+        if not crud.get_user(db, settings.admin_username):
+            db.add(models.User(
+                username=settings.admin_username,
+                hashed_password=get_password_hash(settings.admin_password),
+                is_active=True,
+            ))
+            db.commit()
+            print(f"Created admin user: {settings.admin_username}")
+    with Session(engine) as db:
+        removed = crud.ensure_unique_ratings(db)
+        if removed:
+            print(f"Removed {removed} duplicate ratings")
+            aggregates.rebuild(db)
+            rankings.rebuild(db)
+            db.commit()
+    with Session(engine) as db:
+        aggregates.ensure_built(db)
+        rankings.ensure_built(db)
+
+if __name__ == "__main__":
+    prepare()
+    print(f"Database at revision {current_revision()}")
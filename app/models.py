@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Text, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Text, DateTime, Boolean, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -20,9 +20,16 @@ class Pokemon(Base):
 
 class Rating(Base):
     __tablename__ = "ratings"
+    __table_args__ = (
+        UniqueConstraint("pokemon_id", "user_id", name="uq_ratings_pokemon_user"),
+        # Covering index for per-type/generation joins; also serves pokemon_id lookups
+        Index("ix_ratings_pokemon_rating", "pokemon_id", "rating"),
+        Index("ix_ratings_rating", "rating"),
+        Index("ix_ratings_user_rating", "user_id", "rating", "pokemon_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    pokemon_id = Column(Integer, ForeignKey("pokemon.id"), index=True)
+    pokemon_id = Column(Integer, ForeignKey("pokemon.id"))
     rating = Column(Float)
     comment = Column(Text, nullable=True)
     user_id = Column(String, default="admin")  # For future multi-user support
@@ -37,4 +44,67 @@ class User(Base):
     username = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class RatingAggregate(Base):
+    """Running rating totals for one scope: overall, a type or a generation."""
+    __tablename__ = "rating_aggregates"
+    __table_args__ = (UniqueConstraint("scope", "key"),)
+
+    id = Column(Integer, primary_key=True)
+    scope = Column(String, nullable=False)  # "overall", "type", "generation" or "catalogue"
+    key = Column(String, nullable=False, default="")
+    count = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0.0)
+    min_rating = Column(Float, nullable=True)
+    max_rating = Column(Float, nullable=True)
+
+
+class RatingHistogram(Base):
+    """Number of ratings per whole-number bucket (floor of the rating) in a scope."""
+    __tablename__ = "rating_histogram"
+    __table_args__ = (UniqueConstraint("scope", "key", "bucket"),)
+
+    id = Column(Integer, primary_key=True)
+    scope = Column(String, nullable=False)
+    key = Column(String, nullable=False, default="")
+    bucket = Column(Integer, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class PokemonRanking(Base):
+    """Per-Pokemon rating count, sum and Bayesian score within a scope, for leaderboards."""
+    __tablename__ = "pokemon_rankings"
+    __table_args__ = (
+        UniqueConstraint("scope", "key", "pokemon_id"),
+        Index("ix_pokemon_rankings_leaderboard", "scope", "key", "score", "pokemon_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    scope = Column(String, nullable=False)  # "overall", "type" or "generation"
+    key = Column(String, nullable=False, default="")
+    pokemon_id = Column(Integer, ForeignKey("pokemon.id"), nullable=False)
+    rating_count = Column(Integer, nullable=False, default=0)
+    rating_total = Column(Float, nullable=False, default=0.0)
+    score = Column(Float, nullable=False)
+
+
+class CatalogueVersion(Base):
+    """Single-row counter bumped by every write to ``pokemon``, so in-memory catalogues know to reload."""
+    __tablename__ = "catalogue_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class RatingEvent(Base):
+    """Append-only log of rating writes, one row per created or changed rating; feeds /api/events."""
+    __tablename__ = "rating_events"
+
+    id = Column(Integer, primary_key=True)
+    pokemon_id = Column(Integer, ForeignKey("pokemon.id"), nullable=False)
+    user_id = Column(String, nullable=False)
+    old_rating = Column(Float, nullable=True)  # None when the rating was created
+    rating = Column(Float, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,153 @@
+"""
+Keyset pagination and streaming export for the Pokemon catalogue.
+
+Pages are fetched with ``WHERE <key> > :last ORDER BY <key> LIMIT :n``
+instead of ``OFFSET``, so page 1,000 costs the same index seek as page 1.
+Pages by ``dex_number`` are ordered by ``(dex_number, id)`` with Pokemon
+without a dex number first, so rows sharing a NULL dex number still have a
+position. The position is handed to clients as an opaque cursor (base64 of
+the sort key and last value) that they pass back unchanged.
+
+Exports read the table through a server-side cursor (``yield_per``) and
+yield encoded rows in chunks, so memory stays flat however large the
+catalogue is.
+"""
+import base64
+import csv
+import io
+import json
+from typing import Iterator, Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+SORT_KEYS = {
+    "id": models.Pokemon.id,
+    "dex_number": models.Pokemon.dex_number,
+}
+
+EXPORT_COLUMNS = [
+    "id", "dex_number", "name", "type1", "type2", "generation",
+    "sprite_url", "artwork_url", "rating", "comment",
+]
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token cannot be decoded or does not match the sort key."""
+
+
+def encode_cursor(order_by: str, value) -> str:
+    payload = json.dumps({"k": order_by, "v": value}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(token: str, order_by: str):
+    """The value :func:`cursor_value` gave for the last row of the previous page."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        key, value = payload["k"], payload["v"]
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursor("Malformed cursor")
+    if order_by == "id":
+        valid = isinstance(value, int)
+    else:
+        valid = (isinstance(value, list) and len(value) == 2 and isinstance(value[1], int)
+                 and (value[0] is None or isinstance(value[0], int)))
+    if key != order_by or not valid:
+        raise InvalidCursor(f"Cursor was not issued for order_by={order_by}")
+    return value
+
+
+def cursor_value(order_by: str, row):
+    """The position of ``row``: its id, or ``[dex_number, id]`` (the dex number may be ``None``)."""
+    if order_by == "id":
+        return row.id
+    return [getattr(row, order_by), row.id]
+
+
+def _order_and_filter(query, order_by: str, after):
+    """Apply the page order and, with ``after`` (a decoded cursor), the position filter."""
+    pokemon_id = models.Pokemon.id
+    if order_by == "id":
+        query = query.order_by(pokemon_id)
+        return query.where(pokemon_id > after) if after is not None else query
+    column = SORT_KEYS[order_by]
+    query = query.order_by(column.asc().nulls_first(), pokemon_id)
+    if after is None:
+        return query
+    value, last_id = after
+    if value is None:
+        return query.where(or_(column.is_not(None), and_(column.is_(None), pokemon_id > last_id)))
+    return query.where(or_(column > value, and_(column == value, pokemon_id > last_id)))
+
+
+def get_pokemon_page(db: Session, limit: int = 100, cursor: Optional[str] = None,
+                     order_by: str = "id", columns=None) -> Tuple[list, Optional[str]]:
+    """Return one page of Pokemon and the cursor for the next page (``None`` on the last page).
+
+    Pass ``columns`` (which must include ``id`` and the ``order_by`` column) to
+    get plain rows of those columns instead of ORM objects.
+    """
+    if order_by not in SORT_KEYS:
+        raise InvalidCursor(f"Cannot paginate by {order_by!r}")
+    after = decode_cursor(cursor, order_by) if cursor else None
+    if limit <= 0:
+        return [], None  # as the catalogue answers
+    query = select(*columns) if columns else select(models.Pokemon)
+    query = _order_and_filter(query, order_by, after).limit(limit + 1)
+    result = db.execute(query)
+    rows = result.all() if columns else result.scalars().all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(order_by, cursor_value(order_by, rows[-1]))
+
+
+def _export_rows(db: Session, user_id: Optional[str], batch_size: int) -> Iterator[tuple]:
+    pokemon = models.Pokemon
+    columns = [pokemon.id, pokemon.dex_number, pokemon.name, pokemon.type1, pokemon.type2,
+               pokemon.generation, pokemon.sprite_url, pokemon.artwork_url]
+    if user_id is None:
+        query = select(*columns)
+    else:
+        rating = models.Rating
+        query = select(*columns, rating.rating, rating.comment).outerjoin(
+            rating, (rating.pokemon_id == pokemon.id) & (rating.user_id == user_id)
+        )
+    query = query.order_by(pokemon.id).execution_options(yield_per=batch_size)
+    yield from db.execute(query)
+
+
+def iter_ndjson(db: Session, user_id: Optional[str] = None, batch_size: int = 1000) -> Iterator[bytes]:
+    """Yield the catalogue as newline-delimited JSON, ``batch_size`` rows per chunk."""
+    fields = EXPORT_COLUMNS if user_id is not None else EXPORT_COLUMNS[:-2]
+    chunk = []
+    for row in _export_rows(db, user_id, batch_size):
+        chunk.append(json.dumps(dict(zip(fields, row)), separators=(",", ":")))
+        if len(chunk) >= batch_size:
+            yield ("\n".join(chunk) + "\n").encode()
+            chunk = []
+    if chunk:
+        yield ("\n".join(chunk) + "\n").encode()
+
+
+def iter_csv(db: Session, user_id: Optional[str] = None, batch_size: int = 1000) -> Iterator[bytes]:
+    """Yield the catalogue as CSV with a header row, ``batch_size`` rows per chunk."""
+    fields = EXPORT_COLUMNS if user_id is not None else EXPORT_COLUMNS[:-2]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    rows = 0
+    for row in _export_rows(db, user_id, batch_size):
+        writer.writerow(row)
+        rows += 1
+        if rows >= batch_size:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode()
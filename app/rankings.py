@@ -0,0 +1,169 @@
+"""
+Community leaderboards with Bayesian-averaged scores.
+
+``pokemon_rankings`` holds one row per Pokemon per aggregate scope (overall,
+each of its types, its generation) with the number and sum of its ratings
+across all users and a score
+
+    score = (prior_weight * prior_mean + total) / (prior_weight + count)
+
+which pulls Pokemon with few ratings towards ``prior_mean`` so a single 10
+cannot top the board. Rows are updated in place by
+:func:`apply_rating_changes` in the same transaction as the rating write, and
+the ``(scope, key, score, pokemon_id)`` index turns top-N and bottom-N into
+an index range scan in either direction.
+
+The prior comes from ``Settings``; after changing it run :func:`rebuild`
+(``scripts/rebuild_aggregates.py``) so existing scores use the new values.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import String, cast, delete, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .aggregates import OVERALL, scopes_for
+from .config import settings
+
+
+def _score(total, count):
+    prior_weight = settings.ranking_prior_weight
+    return (prior_weight * settings.ranking_prior_mean + total) / (prior_weight + count)
+
+
+def apply_rating_changes(db: Session, changes: Iterable[Tuple[object, Optional[float], float]]):
+    """Fold ``(pokemon, old_rating, new_rating)`` changes into the rankings without committing."""
+    deltas: Dict[int, list] = {}
+    for pokemon, old_rating, new_rating in changes:
+        if old_rating == new_rating:
+            continue
+        entry = deltas.setdefault(pokemon.id, [pokemon, 0, 0.0])
+        entry[1] += 0 if old_rating is not None else 1
+        entry[2] += new_rating - (old_rating or 0.0)
+
+    ranking = models.PokemonRanking.__table__
+    for pokemon, count, total in deltas.values():
+        for scope, key in scopes_for(pokemon):
+            result = db.execute(
+                update(ranking)
+                .where(ranking.c.scope == scope, ranking.c.key == key, ranking.c.pokemon_id == pokemon.id)
+                .values(
+                    rating_count=ranking.c.rating_count + count,
+                    rating_total=ranking.c.rating_total + total,
+                    score=_score(ranking.c.rating_total + total, ranking.c.rating_count + count),
+                )
+            )
+            if result.rowcount == 0:
+                db.execute(insert(ranking).values(
+                    scope=scope, key=key, pokemon_id=pokemon.id,
+                    rating_count=count, rating_total=total, score=_score(total, count),
+                ))
+
+
+def rebuild(db: Session) -> int:
+    """Recompute every ranking row from ``ratings`` with INSERT ... SELECT. Does not commit."""
+    pokemon, rating = models.Pokemon, models.Rating
+    ranking = models.PokemonRanking.__table__
+    db.execute(delete(ranking))
+
+    # (scope, key, key columns to group by, condition)
+    groups = [
+        (literal(OVERALL[0]), literal(OVERALL[1]), (), None),
+        (literal("type"), pokemon.type1, (pokemon.type1,), None),
+        (literal("type"), pokemon.type2, (pokemon.type2,),
+         (pokemon.type2.is_not(None)) & (pokemon.type2 != pokemon.type1)),
+        (literal("generation"), cast(pokemon.generation, String), (pokemon.generation,), None),
+    ]
+    rows = 0
+    for scope, key, key_columns, condition in groups:
+        count, total = func.count(rating.rating), func.sum(rating.rating)
+        query = (
+            select(scope, key, rating.pokemon_id, count, total, _score(total, count))
+            .join(pokemon, rating.pokemon_id == pokemon.id)
+            .where(rating.rating.is_not(None))
+            # Every selected column grouped, as PostgreSQL requires
+            .group_by(rating.pokemon_id, pokemon.id, *key_columns)
+        )
+        if condition is not None:
+            query = query.where(condition)
+        result = db.execute(insert(ranking).from_select(
+            ["scope", "key", "pokemon_id", "rating_count", "rating_total", "score"], query
+        ))
+        rows += result.rowcount
+    return rows
+
+
+def ensure_built(db: Session):
+    """Backfill the rankings for databases that have ratings but no ranking rows yet."""
+    if db.execute(select(models.PokemonRanking.id).limit(1)).first():
+        return
+    if db.execute(select(models.Rating.id).limit(1)).first():
+        rebuild(db)
+        db.commit()
+
+
+def check_consistency(db: Session, tolerance: float = 1e-6) -> List[str]:
+    """Compare stored ranking rows with counts and sums recomputed from ``ratings``."""
+    expected: Dict[Tuple[str, str, int], list] = defaultdict(lambda: [0, 0.0])
+    rows = db.execute(
+        select(models.Rating.pokemon_id, models.Rating.rating, models.Pokemon.type1,
+               models.Pokemon.type2, models.Pokemon.generation)
+        .join(models.Pokemon, models.Rating.pokemon_id == models.Pokemon.id)
+        .where(models.Rating.rating.is_not(None))
+    )
+    for pokemon_id, value, type1, type2, generation in rows:
+        pokemon = models.Pokemon(type1=type1, type2=type2, generation=generation)
+        for scope, key in scopes_for(pokemon):
+            entry = expected[(scope, key, pokemon_id)]
+            entry[0] += 1
+            entry[1] += value
+    stored = {
+        (row.scope, row.key, row.pokemon_id): row
+        for row in db.execute(select(models.PokemonRanking)).scalars()
+    }
+
+    problems = []
+    for ranking_key in sorted(set(expected) | set(stored), key=str):
+        want, have = expected.get(ranking_key), stored.get(ranking_key)
+        if have is None:
+            problems.append(f"ranking {ranking_key}: missing")
+        elif want is None:
+            if have.rating_count:
+                problems.append(f"ranking {ranking_key}: stored count {have.rating_count} but no ratings")
+        elif have.rating_count != want[0] or abs(have.rating_total - want[1]) > tolerance:
+            problems.append(
+                f"ranking {ranking_key}: stored count/total {have.rating_count}/{have.rating_total}, "
+                f"expected {want[0]}/{want[1]}"
+            )
+        elif abs(have.score - _score(want[1], want[0])) > tolerance:
+            problems.append(f"ranking {ranking_key}: stale score {have.score}")
+    return problems
+
+
+def get_leaderboard(db: Session, scope: str = OVERALL[0], key: str = OVERALL[1],
+                    limit: int = 10, ascending: bool = False) -> List[dict]:
+    """Top (or bottom, with ``ascending``) ``limit`` Pokemon of a scope by Bayesian score."""
+    ranking = models.PokemonRanking
+    order = (ranking.score.asc(), ranking.pokemon_id.asc()) if ascending else (ranking.score.desc(), ranking.pokemon_id.desc())
+    rows = db.execute(
+        select(ranking.rating_count, ranking.rating_total, ranking.score,
+               models.Pokemon.name, models.Pokemon.dex_number, models.Pokemon.sprite_url, models.Pokemon.artwork_url)
+        .join(models.Pokemon, ranking.pokemon_id == models.Pokemon.id)
+        .where(ranking.scope == scope, ranking.key == key, ranking.rating_count > 0)
+        .order_by(*order)
+        .limit(limit)
+    ).all()
+    return [
+        {
+            "rank": position,
+            "pokemon_name": row.name,
+            "dex_number": row.dex_number,
+            "sprite_url": row.sprite_url,
+            "artwork_url": row.artwork_url,
+            "rating_count": row.rating_count,
+            "average_rating": row.rating_total / row.rating_count,
+            "score": row.score,
+        }
+        for position, row in enumerate(rows, 1)
+    ]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -46,6 +46,20 @@ class Rating(RatingBase):
         from_attributes = True
 
 
+class RatingBatchItemResult(BaseModel):
+    index: int
+    pokemon_id: Optional[int] = None
+    status: str  # created, updated, superseded, not_found or invalid
+    error: Optional[str] = None
+
+
+class RatingBatchResult(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    results: List[RatingBatchItemResult]
+
+
 class UserBase(BaseModel):
     username: str
 
@@ -0,0 +1,203 @@
+"""
+In-memory Pokemon name search.
+
+The index is built in the background at startup (or by the first search, if
+that comes sooner) from the in-memory catalogue, and rebuilt whenever the
+catalogue reloads; without the catalogue it is built from the ``pokemon``
+table. ``crud.create_pokemon`` adds new names directly. It answers prefix, substring and typo-tolerant
+queries without touching the database:
+
+* prefix matches come from a sorted name list via ``bisect``;
+* substring matches intersect n-gram posting lists (trigrams, or bigrams
+  for two-letter queries);
+* fuzzy matches rank names sharing trigrams with the query by edit distance.
+
+Results are ranked exact > prefix > substring > fuzzy, then by match
+position, edit distance and name length.
+"""
+import bisect
+import heapq
+import threading
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+
+GRAM = 3
+FUZZY_CANDIDATES_PER_RESULT = 10
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def grams(text: str, size: int) -> Set[str]:
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance between ``a`` and ``b``, or ``limit + 1`` once it exceeds ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def max_typos(query: str) -> int:
+    if len(query) < 3:
+        return 0
+    return 1 if len(query) <= 5 else 2
+
+
+class SearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self.built = False
+        self.source = None
+        self._reset()
+
+    def _reset(self):
+        self.names: Dict[int, str] = {}
+        self.sorted_names: List[Tuple[str, int]] = []
+        self.postings: Dict[str, Set[int]] = defaultdict(set)
+
+    def __len__(self):
+        return len(self.names)
+
+    def build(self, db: Session):
+        """(Re)load every Pokemon name from the database."""
+        rows = db.execute(select(models.Pokemon.id, models.Pokemon.name)).all()
+        self.load(rows)
+
+    def ensure_built(self, db: Session):
+        """Build the index if nothing has yet; concurrent callers wait for one build."""
+        if self.built:
+            return
+        with self._build_lock:
+            if not self.built:
+                self.build(db)
+
+    def sync(self, source):
+        """Rebuild from a catalogue snapshot (anything with ``records``) unless it is the one last loaded."""
+        if self.source is source:
+            return
+        with self._build_lock:
+            if self.source is not source:
+                self.load((record.id, record.name) for record in source.records)
+                self.source = source
+
+    def load(self, rows):
+        index = SearchIndex.__new__(SearchIndex)
+        index._reset()
+        for pokemon_id, name in rows:
+            index._add(pokemon_id, name)
+        index.sorted_names = sorted((key, pokemon_id) for pokemon_id, key in index.names.items())
+        with self._lock:
+            self.names, self.sorted_names, self.postings = index.names, index.sorted_names, index.postings
+            self.built = True
+
+    def add(self, pokemon_id: int, name: str):
+        with self._lock:
+            if pokemon_id in self.names:
+                return
+            self._add(pokemon_id, name)
+            bisect.insort(self.sorted_names, (self.names[pokemon_id], pokemon_id))
+
+    def _add(self, pokemon_id: int, name: str):
+        key = normalize(name)
+        self.names[pokemon_id] = key
+        for size in range(2, GRAM + 1):
+            for gram in grams(key, size):
+                self.postings[gram].add(pokemon_id)
+
+    def _prefix_matches(self, query: str, limit: int) -> List[int]:
+        position = bisect.bisect_left(self.sorted_names, (query,))
+        matches = []
+        while position < len(self.sorted_names) and len(matches) < limit:
+            key, pokemon_id = self.sorted_names[position]
+            if not key.startswith(query):
+                break
+            matches.append(pokemon_id)
+            position += 1
+        return matches
+
+    def _substring_candidates(self, query: str) -> Set[int]:
+        size = min(len(query), GRAM)
+        query_grams = sorted(grams(query, size), key=lambda gram: len(self.postings.get(gram, ())))
+        if not query_grams:
+            return set()
+        candidates = set(self.postings.get(query_grams[0], ()))
+        for gram in query_grams[1:]:
+            candidates &= self.postings.get(gram, set())
+            if not candidates:
+                break
+        return candidates
+
+    def _fuzzy_candidates(self, query: str, limit: int) -> List[int]:
+        overlap: Dict[int, int] = defaultdict(int)
+        query_grams = grams(query, GRAM)
+        for gram in query_grams:
+            for pokemon_id in self.postings.get(gram, ()):
+                overlap[pokemon_id] += 1
+        # A single typo can destroy up to GRAM trigrams
+        needed = max(1, len(query_grams) - GRAM * max_typos(query))
+        # Only the names sharing the most trigrams are worth an edit-distance check
+        best = heapq.nlargest(limit * FUZZY_CANDIDATES_PER_RESULT, overlap.items(), key=lambda item: item[1])
+        return [pokemon_id for pokemon_id, count in best if count >= needed]
+
+    def search(self, query: str, limit: int = 20, fuzzy: bool = True) -> List[int]:
+        """Return Pokemon ids matching ``query``, best match first."""
+        query = normalize(query)
+        if not query or limit <= 0:
+            return []
+        with self._lock:
+            names = self.names
+            ranked: Dict[int, tuple] = {}
+
+            for pokemon_id in self._prefix_matches(query, limit):
+                name = names[pokemon_id]
+                ranked[pokemon_id] = (0 if name == query else 1, 0, 0, len(name), name)
+
+            if len(query) >= 2 and len(ranked) < limit:
+                for pokemon_id in self._substring_candidates(query):
+                    if pokemon_id in ranked:
+                        continue
+                    name = names[pokemon_id]
+                    position = name.find(query)
+                    if position >= 0:
+                        ranked[pokemon_id] = (2, position, 0, len(name), name)
+
+            typos = max_typos(query)
+            if fuzzy and typos and len(ranked) < limit:
+                for pokemon_id in self._fuzzy_candidates(query, limit):
+                    if pokemon_id in ranked:
+                        continue
+                    name = names[pokemon_id]
+                    # Compare against the whole name and against a prefix of the
+                    # same length, so partially typed names still match
+                    distance = min(
+                        edit_distance(query, name, typos),
+                        edit_distance(query, name[:len(query)], typos),
+                    )
+                    if distance <= typos:
+                        ranked[pokemon_id] = (3, 0, distance, len(name), name)
+
+        return sorted(ranked, key=ranked.get)[:limit]
+
+
+search_index = SearchIndex()
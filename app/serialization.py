@@ -0,0 +1,35 @@
+"""
+Fast JSON encoding for list endpoints.
+
+With ``FAST_SERIALIZATION`` enabled, list endpoints query plain column tuples
+instead of ORM objects and encode them here with orjson, returning the bytes
+in a raw ``Response``. This skips the identity map, the pydantic
+``from_attributes`` validation of every object and ``jsonable_encoder``'s
+recursive walk. Field names and order match the pydantic schemas, so the
+JSON is the same either way.
+"""
+from typing import Iterable, Sequence
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+from . import models
+
+# Same fields, in the same order, as schemas.Pokemon
+POKEMON_FIELDS = ("name", "dex_number", "type1", "type2", "generation", "id", "sprite_url", "artwork_url", "created_at")
+POKEMON_COLUMNS = tuple(getattr(models.Pokemon, field) for field in POKEMON_FIELDS)
+
+
+def dumps(value) -> bytes:
+    """Encode ``value`` with orjson, deferring to ``jsonable_encoder`` for types it does not know."""
+    return orjson.dumps(value, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+
+
+def encode_rows(fields: Sequence[str], rows: Iterable[Sequence]) -> bytes:
+    """Encode column tuples as a JSON array of objects keyed by ``fields``."""
+    return dumps([dict(zip(fields, row)) for row in rows])
+
+
+def json_response(body: bytes, headers=None) -> Response:
+    return Response(body, media_type="application/json", headers=headers)
@@ -1,36 +1,147 @@
-import httpx
-from typing import Optional, Dict, Any
+import asyncio
+import json
+import os
+import time
+from typing import TYPE_CHECKING, Optional, Dict, Any
+
+from ..cache import TTLCache
 from ..config import settings
 
+if TYPE_CHECKING:
+    import httpx
+
+
+class ResponseCache(TTLCache):
+    """TTL + LRU cache for decoded PokeAPI responses.
+
+    When ``path`` is set the cache is loaded from and saved to that JSON file
+    so lookups survive restarts.
+    """
+
+    def __init__(self, max_size: int = 2048, ttl: float = 86400, path: Optional[str] = None):
+        super().__init__(max_size=max_size, ttl=ttl)
+        self.path = path
+        if path:
+            self.load()
+
+    def load(self):
+        """Load unexpired entries from ``path``, ignoring a missing or corrupt file."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        with self._lock:
+            for key, (expires_at, value) in stored.items():
+                if expires_at >= now:
+                    self._entries[key] = (expires_at, value, frozenset())
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            stored = {key: [expires_at, value] for key, (expires_at, value, _) in self._entries.items()}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(stored, f)
+        os.replace(tmp_path, self.path)
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Whether a failed PokeAPI request may succeed when retried: a network error or a 5xx response."""
+    import httpx
+
+    if isinstance(error, httpx.TransportError):
+        return True
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code >= 500
+
 
 class PokeAPIService:
-    def __init__(self):
-        self.base_url = settings.pokeapi_base_url
-        
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        max_connections: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        cache: Optional[ResponseCache] = None,
+        transport: Optional["httpx.AsyncBaseTransport"] = None,
+    ):
+        self.base_url = base_url or settings.pokeapi_base_url
+        self.max_connections = max_connections or settings.pokeapi_max_connections
+        self.concurrency = concurrency or settings.pokeapi_concurrency
+        self.timeout = timeout or settings.pokeapi_timeout
+        self.cache = cache if cache is not None else ResponseCache(
+            max_size=settings.pokeapi_cache_size,
+            ttl=settings.pokeapi_cache_ttl,
+            path=settings.pokeapi_cache_path,
+        )
+        self.transport = transport
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.requests_sent = 0
+
+    async def start(self):
+        """Open the shared connection pool. Called on first use if not called before."""
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                transport=self.transport,
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def close(self):
+        """Close the connection pool and persist the response cache."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._semaphore = None
+        self.cache.save()
+
+    async def _get_json(self, path: str) -> Optional[Dict[Any, Any]]:
+        cached = self.cache.get(path)
+        if cached is not None:
+            return cached
+        if self._client is None:
+            await self.start()
+        async with self._semaphore:
+            self.requests_sent += 1
+            response = await self._client.get(path)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        data = response.json()
+        self.cache.set(path, data)
+        return data
+
     async def get_pokemon_by_name(self, name: str) -> Optional[Dict[Any, Any]]:
         """Fetch Pokemon data from PokeAPI by name."""
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(f"{self.base_url}/pokemon/{name.lower()}")
-                if response.status_code == 200:
-                    return response.json()
-                return None
-            except Exception as e:
-                print(f"Error fetching Pokemon {name}: {e}")
-                return None
-    
+        try:
+            return await self._get_json(f"/pokemon/{name.lower()}")
+        except Exception as e:
+            print(f"Error fetching Pokemon {name}: {e}")
+            return None
+
     async def get_pokemon_species(self, name: str) -> Optional[Dict[Any, Any]]:
         """Fetch Pokemon species data for generation info."""
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(f"{self.base_url}/pokemon-species/{name.lower()}")
-                if response.status_code == 200:
-                    return response.json()
-                return None
-            except Exception as e:
-                print(f"Error fetching Pokemon species {name}: {e}")
-                return None
-    
+        try:
+            return await self._get_json(f"/pokemon-species/{name.lower()}")
+        except Exception as e:
+            print(f"Error fetching Pokemon species {name}: {e}")
+            return None
+
     async def get_generation_number(self, generation_url: str) -> int:
         """Extract generation number from generation URL."""
         try:
@@ -38,23 +149,36 @@ class PokeAPIService:
             return int(generation_url.split('/')[-2])
         except:
             return 1  # Default to generation 1
-    
-    async def get_pokemon_complete_data(self, name: str) -> Optional[Dict[str, Any]]:
-        """Get complete Pokemon data including generation."""
-        pokemon_data = await self.get_pokemon_by_name(name)
+
+    async def get_pokemon_complete_data(self, name: str, raise_errors: bool = False) -> Optional[Dict[str, Any]]:
+        """Get complete Pokemon data including generation.
+
+        With ``raise_errors`` set, request errors propagate instead of being
+        logged and treated as a missing Pokemon, so callers can retry the
+        transient ones (:func:`is_transient_error`).
+        """
+        if raise_errors:
+            pokemon_data, species_data = await asyncio.gather(
+                self._get_json(f"/pokemon/{name.lower()}"),
+                self._get_json(f"/pokemon-species/{name.lower()}"),
+            )
+        else:
+            pokemon_data, species_data = await asyncio.gather(
+                self.get_pokemon_by_name(name),
+                self.get_pokemon_species(name),
+            )
         if not pokemon_data:
             return None
-            
-        species_data = await self.get_pokemon_species(name)
+
         generation = 1
         if species_data and 'generation' in species_data:
             generation = await self.get_generation_number(species_data['generation']['url'])
-        
+
         # Extract types
         types = []
         for type_info in pokemon_data.get('types', []):
             types.append(type_info['type']['name'])
-        
+
         return {
             'name': pokemon_data['name'].title(),
             'dex_number': pokemon_data['id'],
@@ -66,4 +190,4 @@ class PokeAPIService:
         }
 
 
-pokeapi_service = PokeAPIService()
\ No newline at end of file
+pokeapi_service = PokeAPIService()
@@ -0,0 +1,200 @@
+"""
+Caches shared by every worker process.
+
+With several workers, each one's in-process :class:`~app.cache.TTLCache` fills
+and invalidates on its own, so a rating handled by one worker would leave the
+others serving stale analytics. Setting ``CACHE_URL`` moves the cache out of
+the process:
+
+- ``sqlite:///data/cache.db`` uses :class:`SQLiteStore`, a small Redis-like
+  key/value and set store in a local SQLite file (WAL mode, so readers in
+  every worker proceed concurrently with a writer)
+- ``redis://host:6379/0`` uses the ``redis`` client, if it is installed
+
+Both expose the same subset of the Redis commands (``get``, ``set`` with
+``ex``, ``delete``, ``sadd``, ``smembers``), which is all :class:`SharedCache`
+uses. Values are pickled; entries carry tags like the in-process cache, kept as
+Redis sets of the keys that carry them, and each tag has a generation key that
+every invalidation rewrites.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, Optional
+
+try:
+    import redis
+except ImportError:  # redis is optional; the SQLite store is always available
+    redis = None
+
+PURGE_EVERY = 1000  # sets between sweeps of expired SQLite entries
+
+
+class SQLiteStore:
+    """The Redis commands :class:`SharedCache` needs, stored in one SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._sets = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB, expires_at REAL)")
+            connection.execute("CREATE TABLE IF NOT EXISTS sets (key TEXT, member TEXT, PRIMARY KEY (key, member))")
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after a fork
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")  # a lost cache entry only costs a recompute
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def ping(self) -> bool:
+        self._connection().execute("SELECT 1")
+        return True
+
+    def get(self, name: str) -> Optional[bytes]:
+        row = self._connection().execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (name, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, name: str, value, ex: Optional[float] = None) -> bool:
+        if isinstance(value, str):
+            value = value.encode()
+        connection = self._connection()
+        connection.execute("INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                           (name, value, time.time() + ex if ex else None))
+        self._sets += 1
+        if self._sets % PURGE_EVERY == 0:
+            connection.execute("DELETE FROM kv WHERE expires_at <= ?", (time.time(),))
+        return True
+
+    def delete(self, *names: str) -> int:
+        if not names:
+            return 0
+        placeholders = ",".join("?" * len(names))
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            removed = connection.execute(f"DELETE FROM kv WHERE key IN ({placeholders})", names).rowcount
+            removed += connection.execute(
+                f"SELECT COUNT(DISTINCT key) FROM sets WHERE key IN ({placeholders})", names
+            ).fetchone()[0]
+            connection.execute(f"DELETE FROM sets WHERE key IN ({placeholders})", names)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return removed
+
+    def sadd(self, name: str, *members: str) -> int:
+        return self._connection().executemany(
+            "INSERT OR IGNORE INTO sets (key, member) VALUES (?, ?)", [(name, member) for member in members]
+        ).rowcount
+
+    def smembers(self, name: str) -> set:
+        rows = self._connection().execute("SELECT member FROM sets WHERE key = ?", (name,))
+        return {member.encode() for member, in rows}
+
+    def flushdb(self) -> bool:
+        connection = self._connection()
+        connection.execute("DELETE FROM kv")
+        connection.execute("DELETE FROM sets")
+        return True
+
+    def dbsize(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM kv").fetchone()[0]
+
+
+def connect(url: str):
+    """A Redis-compatible client for ``url`` (``sqlite:///path`` or ``redis://...``)."""
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        if redis is None:
+            raise RuntimeError(f"CACHE_URL {url!r} needs the redis package (pip install redis)")
+        return redis.Redis.from_url(url)
+    raise ValueError(f"Unsupported CACHE_URL {url!r}; use sqlite:///path or redis://host:port/db")
+
+
+class SharedCache:
+    """The :class:`~app.cache.TTLCache` interface over a Redis-compatible client.
+
+    Keys are namespaced by ``prefix``. Hit and miss counters are per process.
+    """
+
+    def __init__(self, client, prefix: str, ttl: float = 300):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+    def _generation_key(self, tag: str) -> str:
+        return f"{self.prefix}gen:{tag}"
+
+    def generation(self, tags: Iterable[str]) -> tuple:
+        """A token that changes whenever any of ``tags`` is invalidated or the cache is cleared, in any process."""
+        return tuple(self.client.get(self._generation_key(tag)) for tag in ("*", *tags))
+
+    def get(self, key: str):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(raw)
+
+    def set(self, key: str, value, tags: Iterable[str] = (), generation: Optional[tuple] = None):
+        """Store ``value``, unless ``generation`` is given and ``tags`` were invalidated since it was read."""
+        name = self.prefix + key
+        tags = tuple(tags)
+        if generation is not None and self.generation(tags) != generation:
+            return
+        for tag in (*tags, "*"):
+            self.client.sadd(self._tag_key(tag), name)
+        self.client.set(name, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=int(self.ttl) or None)
+        # invalidate() rewrites the generations before deleting, so an
+        # invalidation racing this set either deletes the entry or shows here
+        if generation is not None and self.generation(tags) != generation:
+            self.client.delete(name)
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        """Drop every entry carrying any of ``tags``, in every process. Returns the number removed."""
+        tags = list(tags)
+        token = uuid.uuid4().hex
+        for tag in tags:
+            self.client.set(self._generation_key(tag), token)
+        tag_keys = [self._tag_key(tag) for tag in tags]
+        names = set()
+        for tag_key in tag_keys:
+            names |= {member.decode() for member in self.client.smembers(tag_key)}
+        removed = self.client.delete(*names) if names else 0
+        if tag_keys:
+            self.client.delete(*tag_keys)
+        self.invalidations += removed
+        return removed
+
+    def clear(self):
+        self.invalidate(["*"])
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "backend": type(self.client).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,111 @@
+"""
+Random selection of Pokemon a user has not rated yet.
+
+For each user the sampler keeps the unrated Pokemon ids in an array with a
+position map, so a newly rated id is removed with a swap-and-pop and ``k``
+ids are sampled by picking random array positions, without sorting or
+scanning the catalogue. Pools are built lazily from one query the first time
+a user asks, updated by ``crud.create_or_update_rating`` and
+``crud.create_pokemon``, and the least recently used pools are dropped once
+``max_users`` is exceeded.
+
+Sampled ids are re-checked against ``ratings`` before they are returned, so
+ratings written by another process (the importer, another worker) never leak
+through; stale ids found that way are removed from the pool.
+"""
+import random
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+class UnratedPool:
+    def __init__(self, ids):
+        self.ids: List[int] = list(ids)
+        self.positions: Dict[int, int] = {pokemon_id: i for i, pokemon_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, pokemon_id: int):
+        if pokemon_id not in self.positions:
+            self.positions[pokemon_id] = len(self.ids)
+            self.ids.append(pokemon_id)
+
+    def discard(self, pokemon_id: int):
+        position = self.positions.pop(pokemon_id, None)
+        if position is None:
+            return
+        last = self.ids.pop()
+        if last != pokemon_id:
+            self.ids[position] = last
+            self.positions[last] = position
+
+    def sample(self, k: int, rng=random) -> List[int]:
+        k = max(0, min(k, len(self.ids)))
+        return [self.ids[i] for i in rng.sample(range(len(self.ids)), k)]
+
+
+class UnratedSampler:
+    def __init__(self, max_users: int = 256):
+        self.max_users = max_users
+        self._pools: "OrderedDict[str, UnratedPool]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _pool(self, db: Session, user_id: str) -> UnratedPool:
+        with self._lock:
+            pool = self._pools.get(user_id)
+            if pool is not None:
+                self._pools.move_to_end(user_id)
+                return pool
+        rated = select(models.Rating.pokemon_id).where(models.Rating.user_id == user_id)
+        ids = db.execute(select(models.Pokemon.id).where(models.Pokemon.id.not_in(rated))).scalars().all()
+        pool = UnratedPool(ids)
+        with self._lock:
+            pool = self._pools.setdefault(user_id, pool)
+            self._pools.move_to_end(user_id)
+            while len(self._pools) > self.max_users:
+                self._pools.popitem(last=False)
+        return pool
+
+    def sample(self, db: Session, user_id: str, k: int) -> List[int]:
+        """Return up to ``k`` random ids of Pokemon ``user_id`` has not rated."""
+        pool = self._pool(db, user_id)
+        while True:
+            with self._lock:
+                ids = pool.sample(k)
+            if not ids:
+                return []
+            stale = set(db.execute(
+                select(models.Rating.pokemon_id).where(
+                    models.Rating.pokemon_id.in_(ids), models.Rating.user_id == user_id
+                )
+            ).scalars())
+            if not stale:
+                return ids
+            with self._lock:
+                for pokemon_id in stale:
+                    pool.discard(pokemon_id)
+
+    def mark_rated(self, user_id: str, pokemon_id: int):
+        with self._lock:
+            pool = self._pools.get(user_id)
+            if pool is not None:
+                pool.discard(pokemon_id)
+
+    def add_pokemon(self, pokemon_id: int):
+        with self._lock:
+            for pool in self._pools.values():
+                pool.add(pokemon_id)
+
+    def clear(self):
+        with self._lock:
+            self._pools.clear()
+
+
+unrated_sampler = UnratedSampler()
@@ -0,0 +1,51 @@
+"""
+Production server settings: gunicorn managing uvicorn workers.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Environment:
+- ``BIND`` (default ``0.0.0.0:8000``)
+- ``WEB_CONCURRENCY``: worker processes (default: one per CPU core)
+- ``GUNICORN_PRELOAD``: import the app once in the master and fork it into the
+  workers (default ``true``; faster starts and shared memory pages). ``HUP``
+  then restarts the workers gracefully on the same code; to deploy new code
+  without dropping requests send ``USR2`` (start a new master) and then
+  ``TERM`` to the old one, or set ``GUNICORN_PRELOAD=false`` so ``HUP`` reloads
+  it.
+- ``GUNICORN_TIMEOUT`` / ``GUNICORN_GRACEFUL_TIMEOUT`` (seconds)
+
+The master migrates and prepares the database once before forking, so the
+workers start with ``AUTO_MIGRATE`` off. Use ``CACHE_URL`` with more than one
+worker so they share the analytics and login caches.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes")
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG")  # "-" for stdout
+
+
+def on_starting(server):
+    from app import migrate
+    from app.config import settings
+    from app.database import engine
+
+    if settings.auto_migrate:
+        migrate.prepare()
+        engine.dispose()
+    # Workers forked from here (or importing the app after the fork) inherit this
+    settings.auto_migrate = False
+    if server.cfg.workers > 1 and not settings.cache_url:
+        print(f"Warning: {server.cfg.workers} workers without CACHE_URL; each keeps its own analytics and login caches")
+
+
+def post_fork(server, worker):
+    from app.database import reset_after_fork
+
+    reset_after_fork()
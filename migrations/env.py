@@ -0,0 +1,51 @@
+"""
+Alembic environment.
+
+Uses ``settings.database_url`` and the models' metadata. When called through
+:func:`app.migrate.upgrade` the caller's connection is passed in
+``config.attributes`` and logging is left alone.
+"""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine
+
+from app import models
+from app.config import settings
+
+config = context.config
+target_metadata = models.Base.metadata
+
+
+def run_migrations(connection):
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # SQLite can only change most of a table by copying it
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_offline():
+    context.configure(url=settings.database_url, target_metadata=target_metadata, literal_binds=True,
+                      render_as_batch=settings.database_url.startswith("sqlite"))
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+elif config.attributes.get("connection") is not None:
+    run_migrations(config.attributes["connection"])
+else:
+    if config.config_file_name is not None:
+        fileConfig(config.config_file_name)
+    engine = create_engine(settings.database_url)
+    try:
+        with engine.connect() as connection:
+            run_migrations(connection)
+            connection.commit()
+    finally:
+        engine.dispose()
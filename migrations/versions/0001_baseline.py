@@ -0,0 +1,118 @@
+"""Baseline schema
+
+The tables as ``Base.metadata.create_all`` created them before migrations.
+Tables that already exist are left alone, so databases created that way are
+adopted by simply upgrading them.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "pokemon" not in existing:
+        op.create_table(
+            "pokemon",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("dex_number", sa.Integer()),
+            sa.Column("name", sa.String()),
+            sa.Column("type1", sa.String()),
+            sa.Column("type2", sa.String(), nullable=True),
+            sa.Column("generation", sa.Integer()),
+            sa.Column("sprite_url", sa.String(), nullable=True),
+            sa.Column("artwork_url", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True)),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_pokemon_id", "pokemon", ["id"])
+        op.create_index("ix_pokemon_dex_number", "pokemon", ["dex_number"], unique=True)
+        op.create_index("ix_pokemon_name", "pokemon", ["name"], unique=True)
+        op.create_index("ix_pokemon_type1", "pokemon", ["type1"])
+        op.create_index("ix_pokemon_type2", "pokemon", ["type2"])
+        op.create_index("ix_pokemon_generation", "pokemon", ["generation"])
+
+    if "ratings" not in existing:
+        op.create_table(
+            "ratings",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("pokemon_id", sa.Integer(), sa.ForeignKey("pokemon.id")),
+            sa.Column("rating", sa.Float()),
+            sa.Column("comment", sa.Text(), nullable=True),
+            sa.Column("user_id", sa.String()),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True)),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("pokemon_id", "user_id", name="uq_ratings_pokemon_user"),
+        )
+        op.create_index("ix_ratings_id", "ratings", ["id"])
+        op.create_index("ix_ratings_pokemon_id", "ratings", ["pokemon_id"])
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("username", sa.String()),
+            sa.Column("hashed_password", sa.String()),
+            sa.Column("is_active", sa.Boolean()),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    if "rating_aggregates" not in existing:
+        op.create_table(
+            "rating_aggregates",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("scope", sa.String(), nullable=False),
+            sa.Column("key", sa.String(), nullable=False),
+            sa.Column("count", sa.Integer(), nullable=False),
+            sa.Column("total", sa.Float(), nullable=False),
+            sa.Column("min_rating", sa.Float(), nullable=True),
+            sa.Column("max_rating", sa.Float(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("scope", "key"),
+        )
+
+    if "rating_histogram" not in existing:
+        op.create_table(
+            "rating_histogram",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("scope", sa.String(), nullable=False),
+            sa.Column("key", sa.String(), nullable=False),
+            sa.Column("bucket", sa.Integer(), nullable=False),
+            sa.Column("count", sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("scope", "key", "bucket"),
+        )
+
+    if "pokemon_rankings" not in existing:
+        op.create_table(
+            "pokemon_rankings",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("scope", sa.String(), nullable=False),
+            sa.Column("key", sa.String(), nullable=False),
+            sa.Column("pokemon_id", sa.Integer(), sa.ForeignKey("pokemon.id"), nullable=False),
+            sa.Column("rating_count", sa.Integer(), nullable=False),
+            sa.Column("rating_total", sa.Float(), nullable=False),
+            sa.Column("score", sa.Float(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("scope", "key", "pokemon_id"),
+        )
+        op.create_index("ix_pokemon_rankings_leaderboard", "pokemon_rankings", ["scope", "key", "score", "pokemon_id"])
+
+
+def downgrade():
+    for table in ("pokemon_rankings", "rating_histogram", "rating_aggregates", "users", "ratings", "pokemon"):
+        op.drop_table(table)
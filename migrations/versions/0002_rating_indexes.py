@@ -0,0 +1,44 @@
+"""Composite and covering indexes on ratings
+
+- (pokemon_id, rating) covers the per-type/per-generation rating joins and
+  replaces the single-column pokemon_id index, which the
+  (pokemon_id, user_id) unique index already serves for lookups.
+- (rating) lets top/bottom-rated read the first rows of an index instead of
+  sorting every rating.
+- (user_id, rating, pokemon_id) serves per-user queries (rated and unrated
+  Pokemon, a user's own top/bottom) without scanning the table.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+INDEXES = {
+    "ix_ratings_pokemon_rating": ["pokemon_id", "rating"],
+    "ix_ratings_rating": ["rating"],
+    "ix_ratings_user_rating": ["user_id", "rating", "pokemon_id"],
+}
+
+
+def upgrade():
+    # Databases created by create_all from the current models already have them
+    existing = {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("ratings")}
+    for name, columns in INDEXES.items():
+        if name not in existing:
+            op.create_index(name, "ratings", columns)
+    if "ix_ratings_pokemon_id" in existing:
+        op.drop_index("ix_ratings_pokemon_id", table_name="ratings")
+
+
+def downgrade():
+    op.create_index("ix_ratings_pokemon_id", "ratings", ["pokemon_id"])
+    for name in INDEXES:
+        op.drop_index(name, table_name="ratings")
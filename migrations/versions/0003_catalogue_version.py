@@ -0,0 +1,34 @@
+"""Catalogue version counter
+
+A single-row table whose ``version`` is bumped in the same transaction as
+every write to ``pokemon``. Processes holding the catalogue in memory compare
+it with the version they loaded to know when to reload.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by create_all from the current models already have it
+    if "catalogue_version" not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            "catalogue_version",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("version", sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+    op.execute("INSERT INTO catalogue_version (id, version) SELECT 1, 1 "
+               "WHERE NOT EXISTS (SELECT 1 FROM catalogue_version)")
+
+
+def downgrade():
+    op.drop_table("catalogue_version")
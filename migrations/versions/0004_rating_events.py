@@ -0,0 +1,37 @@
+"""Rating event log
+
+An append-only ``rating_events`` table with one row per created or changed
+rating (Pokemon, user, old and new value), written in the same transaction as
+the rating. ``/api/events`` streams it to dashboards.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by create_all from the current models already have it
+    if "rating_events" not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            "rating_events",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("pokemon_id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.String(), nullable=False),
+            sa.Column("old_rating", sa.Float(), nullable=True),
+            sa.Column("rating", sa.Float(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.ForeignKeyConstraint(["pokemon_id"], ["pokemon.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+
+
+def downgrade():
+    op.drop_table("rating_events")
@@ -11,5 +11,7 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         reload=True,
+        # Open /api/events streams would otherwise hold each reload until they age out
+        timeout_graceful_shutdown=5,
         log_level="info"
     )
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""
+Compare the per-type/per-generation SQL analytics with the columnar snapshot.
+
+Seeds a temporary SQLite database with synthetic Pokemon and ratings, then
+times computing mean/median/stddev for every type and generation the way the
+analytics page does today (one ``crud.get_ratings_by_*`` query per group,
+statistics in Python), against loading ``RatingSnapshot`` and computing the
+full grouped summary, and against applying logged rating writes to it.
+
+    python scripts/bench_analytics.py [--pokemon 1025] [--ratings 1000000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.analytics import RatingSnapshot
+
+TYPES = ["normal", "fire", "water", "grass", "electric", "ice", "fighting", "poison", "ground",
+         "flying", "psychic", "bug", "rock", "ghost", "dragon", "dark", "steel", "fairy"]
+GENERATIONS = range(1, 10)
+SEED_BATCH = 50000
+
+
+def seed(db, pokemon_count, rating_count, rng):
+    db.execute(insert(models.Pokemon), [
+        {"name": f"pokemon-{i}", "dex_number": i, "type1": rng.choice(TYPES),
+         "type2": rng.choice(TYPES + [None] * 18), "generation": rng.choice(GENERATIONS)}
+        for i in range(1, pokemon_count + 1)
+    ])
+    users = -(-rating_count // pokemon_count)
+    pairs = ((pokemon_id, f"user-{user}") for user in range(users) for pokemon_id in range(1, pokemon_count + 1))
+    batch = []
+    for _, (pokemon_id, user_id) in zip(range(rating_count), pairs):
+        batch.append({"pokemon_id": pokemon_id, "user_id": user_id, "rating": round(rng.gauss(5, 2.5), 1)})
+        if len(batch) == SEED_BATCH:
+            db.execute(insert(models.Rating), batch)
+            batch = []
+    if batch:
+        db.execute(insert(models.Rating), batch)
+    db.commit()
+
+
+def describe(values):
+    if not values:
+        return None
+    return statistics.mean(values), statistics.median(values), statistics.pstdev(values)
+
+
+def sql_path(db):
+    for pokemon_type in TYPES:
+        describe([row["rating"] for row in crud.get_ratings_by_type(db, pokemon_type)])
+    for generation in GENERATIONS:
+        describe([row["rating"] for row in crud.get_ratings_by_generation(db, generation)])
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pokemon", type=int, default=1025)
+    parser.add_argument("--ratings", type=int, default=1000000)
+    parser.add_argument("--writes", type=int, default=10000)
+    args = parser.parse_args()
+    rng = random.Random(3)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/analytics.db")
+        models.Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        seconds = timed(lambda: seed(db, args.pokemon, args.ratings, rng))
+        print(f"Seeded {args.pokemon} Pokemon and {args.ratings} ratings in {seconds:.1f}s")
+
+        print(f"SQL path, {len(TYPES)} types + {len(GENERATIONS)} generations "
+              f"(mean/median/stddev only): {timed(lambda: sql_path(db)):.2f}s")
+
+        snapshot = RatingSnapshot()
+        print(f"Snapshot load: {timed(lambda: snapshot.load(db)):.2f}s")
+        summary = {}
+        seconds = timed(lambda: summary.update(snapshot.summary()))
+        print(f"Snapshot summary (type, type pair, generation, type x generation; "
+              f"with percentiles): {seconds:.2f}s, {len(summary['type-generation'])} cells")
+        seconds = timed(lambda: snapshot.summary(("type",)))
+        print(f"Snapshot summary, type only: {seconds * 1000:.0f}ms")
+
+        pokemon = db.query(models.Pokemon).all()
+        writes = [(rng.choice(pokemon), f"user-{rng.randint(0, 2000)}", rng.uniform(-5, 15))
+                  for _ in range(args.writes)]
+        db.execute(insert(models.RatingEvent), [
+            {"pokemon_id": p.id, "user_id": user_id, "rating": rating} for p, user_id, rating in writes
+        ])
+        db.commit()
+        seconds = timed(lambda: snapshot.catch_up(db))
+        print(f"Incremental writes (catching up on the event log): {seconds / args.writes * 1e6:.1f}us each")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Load test the API with sync (threadpool) and async database sessions.
+
+Seeds a temporary database, then starts the app once per DATABASE_ASYNC
+setting and drives a mix of catalogue, search and unrated lookups plus
+authenticated rating writes, reporting throughput and tail latency.
+
+    python scripts/bench_async_db.py [--concurrency 32] [--duration 10]
+"""
+import argparse
+import asyncio
+import random
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.import_csv import parse_csv
+from scripts.loadgen import AppServer, login, run_load, seeded_database, summarize
+
+
+def request_mix(names, token):
+    auth = {"Authorization": f"Bearer {token}"}
+
+    async def make_request(client, worker_id):
+        roll = random.random()
+        if roll < 0.3:
+            return "pokemon", await client.get(f"/api/pokemon/{random.choice(names)}")
+        if roll < 0.5:
+            return "list", await client.get(f"/api/pokemon?skip={random.randint(0, 900)}&limit=20")
+        if roll < 0.7:
+            return "search", await client.get(f"/api/pokemon/search/{random.choice(names)[:3]}")
+        if roll < 0.9:
+            return "unrated", await client.get("/api/unrated-pokemon?limit=1")
+        body = {"pokemon_id": random.randint(1, len(names)), "rating": round(random.uniform(0, 10), 1)}
+        return "rate", await client.post("/api/rate", json=body, headers=auth)
+
+    return make_request
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    names = [row["name"] for row in parse_csv()]
+    print(f"{'mode':<8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    with seeded_database() as path:
+        for mode in ("sync", "async"):
+            env = {"DATABASE_ASYNC": "true" if mode == "async" else "false"}
+            with AppServer(path, env=env) as server:
+                token = login(server.url)
+                results, elapsed = asyncio.run(run_load(
+                    server.url, request_mix(names, token), concurrency=args.concurrency, duration=args.duration
+                ))
+            latencies = [value for samples, _ in results.values() for value in samples]
+            errors = sum(errors for _, errors in results.values())
+            stats = summarize(latencies, elapsed, errors)
+            print(f"{mode:<8}{stats['rps']:>10.1f}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+                  f"{stats['p99_ms']:>10.2f}{stats['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Measure what the principal cache saves on authenticated rating requests.
+
+Seeds a temporary database and calls auth.get_current_user / POST /api/rate
+in-process with the cache disabled, enabled, and with token claims trusted,
+reporting mean and p99 latency for the dependency alone and the full request.
+
+    python scripts/bench_auth_cache.py [--requests 500]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.loadgen import percentile, seeded_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    with seeded_database() as path:
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+        from fastapi.security import HTTPAuthorizationCredentials
+        from fastapi.testclient import TestClient
+        from app import auth
+        from app.config import settings
+        from app.database import SessionLocal
+        from app.main import app
+
+        modes = [("no cache", 0, False), ("cache", 60, False), ("claims", 60, True)]
+        print(f"{'mode':<10}{'dep mean us':>13}{'dep p99 us':>12}{'rate mean ms':>14}{'rate p99 ms':>13}")
+        with TestClient(app) as client:
+            token = client.post("/token", data={"username": settings.admin_username,
+                                                "password": settings.admin_password}).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+            for label, ttl, trust_claims in modes:
+                settings.auth_cache_ttl = ttl
+                settings.auth_trust_token_claims = trust_claims
+                auth.principal_cache.clear()
+
+                async def time_dependency():
+                    samples = []
+                    db = SessionLocal()
+                    try:
+                        for _ in range(args.requests):
+                            start = time.perf_counter()
+                            await auth.get_current_user(credentials, db)
+                            samples.append((time.perf_counter() - start) * 1e6)
+                    finally:
+                        db.close()
+                    return samples
+
+                dependency = asyncio.run(time_dependency())
+
+                requests = []
+                for _ in range(args.requests):
+                    body = {"pokemon_id": random.randint(1, 1025), "rating": 5.0}
+                    start = time.perf_counter()
+                    client.post("/api/rate", json=body, headers=headers)
+                    requests.append((time.perf_counter() - start) * 1000)
+
+                print(f"{label:<10}{statistics.mean(dependency):>13.1f}{percentile(dependency, 99):>12.1f}"
+                      f"{statistics.mean(requests):>14.3f}{percentile(requests, 99):>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
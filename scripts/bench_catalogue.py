@@ -0,0 +1,108 @@
+"""
+Memory footprint and lookup latency of the in-memory catalogue.
+
+For each catalogue size, generates that many Pokemon (see
+``generate_data.py``) in a temporary SQLite database, then reports:
+
+- the time to load the snapshot, and the memory it holds (``tracemalloc``,
+  records plus indexes) in total and per Pokemon
+- per-call latency of lookups by id, name and dex number, and of a 100-row
+  keyset page, from the catalogue and from the database (ORM objects, as
+  with ``CATALOGUE_ENABLED=false``)
+
+    python scripts/bench_catalogue.py [--sizes 1000,1000000] [--lookups 20000]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+TEMP = tempfile.mkdtemp(prefix="pokemon-rater-catalogue-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEMP, 'catalogue.db')}"
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete
+
+from app import crud, migrate, models
+from app.catalogue import Catalogue, catalogue
+from app.config import settings
+from app.database import ReadSessionLocal, SessionLocal, engine
+from app.pagination import encode_cursor
+from scripts.generate_data import generate
+
+
+def per_call_us(fn, args) -> float:
+    start = time.perf_counter()
+    for arg in args:
+        fn(arg)
+    return (time.perf_counter() - start) / len(args) * 1e6
+
+
+def measure(size: int, lookups: int):
+    with SessionLocal() as db:
+        db.execute(delete(models.Pokemon))
+        db.execute(delete(models.User))
+        generate(db, pokemon=size, users=1, ratings=0)
+
+    with ReadSessionLocal() as db:
+        start = time.perf_counter()
+        Catalogue().load(db)
+        load_seconds = time.perf_counter() - start
+
+        tracemalloc.start()
+        fresh = Catalogue()
+        snapshot = fresh.load(db)
+        snapshot.ordered("dex_number")
+        footprint = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del fresh
+
+        rng = random.Random(0)
+        sample = rng.sample(snapshot.records, min(lookups, len(snapshot.records)))
+        ids = [record.id for record in sample]
+        names = [record.name for record in sample]
+        dex_numbers = [record.dex_number for record in sample]
+        cursors = [None] + [encode_cursor("id", pokemon_id) for pokemon_id in ids[:lookups // 20]]
+
+        results = []
+        for enabled in (True, False):
+            settings.catalogue_enabled = enabled
+            catalogue.load(db).ordered("id")  # built on the first page request otherwise
+            results.append({
+                "by id": per_call_us(lambda pokemon_id: crud.get_pokemon_by_id(db, pokemon_id), ids),
+                "by name": per_call_us(lambda name: crud.get_pokemon_by_name(db, name), names),
+                "by dex": per_call_us(lambda dex: crud.get_pokemon_by_dex(db, dex), dex_numbers),
+                "page of 100": per_call_us(lambda cursor: crud.get_pokemon_page(db, 100, cursor), cursors),
+            })
+            db.expunge_all()
+        settings.catalogue_enabled = True
+
+    print(f"\n{size:,} Pokemon: snapshot loads in {load_seconds * 1000:,.0f}ms and holds "
+          f"{footprint / 2**20:,.1f} MiB ({footprint / size:,.0f} bytes per Pokemon)")
+    print(f"  {'lookup':<14}{'catalogue us':>14}{'database us':>14}{'speedup':>10}")
+    for label in results[0]:
+        memory, database = results[0][label], results[1][label]
+        print(f"  {label:<14}{memory:>14.2f}{database:>14.1f}{database / memory:>9.0f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,1000000", help="comma-separated catalogue sizes")
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    migrate.upgrade(engine)
+    try:
+        for size in (int(size) for size in args.sizes.split(",")):
+            measure(size, args.lookups)
+    finally:
+        engine.dispose()
+        shutil.rmtree(TEMP, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
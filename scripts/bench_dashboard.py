@@ -0,0 +1,102 @@
+"""
+Time to first paint and bytes transferred for the analytics page.
+
+Serves a seeded temporary database with uvicorn and replays the requests a
+browser makes for ``/analytics`` in three setups:
+
+- before: compression off, and the page fetching statistics, top rated and
+  bottom rated as separate calls after it loads (the original page)
+- client-rendered: compression on, one ``/api/analytics/dashboard`` call
+- server-rendered: compression on, the data inlined in the HTML
+
+Server time and compressed size of every response are measured over HTTP.
+Time to first paint is then modelled for a network of ``--rtt`` round-trip
+latency and ``--bandwidth``: the HTML, then (in parallel) the data calls, each
+costing a round trip plus its transfer time. The CDN stylesheets block
+rendering in every setup, so a first visit waits at least one round trip for
+them. A repeat visit reuses the stylesheets but still makes the data calls.
+
+    python scripts/bench_dashboard.py [--runs 20] [--rtt 50] [--bandwidth 10]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.loadgen import AppServer, seeded_database
+
+BEFORE_CALLS = ["/api/analytics/statistics", "/api/analytics/top-rated?limit=10", "/api/analytics/bottom-rated?limit=10"]
+SETUPS = {
+    "before": {"COMPRESSION_ENABLED": "false", "ANALYTICS_SERVER_RENDER": "false"},
+    "client-rendered": {"COMPRESSION_ENABLED": "true", "ANALYTICS_SERVER_RENDER": "false"},
+    "server-rendered": {"COMPRESSION_ENABLED": "true", "ANALYTICS_SERVER_RENDER": "true"},
+}
+
+
+def fetch(client, path, runs):
+    """``(median server seconds, bytes on the wire)`` for ``path``."""
+    seconds, size = [], 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        with client.stream("GET", path) as response:
+            response.raise_for_status()
+            response.read()
+            size = response.num_bytes_downloaded
+        seconds.append(time.perf_counter() - start)
+    return statistics.median(seconds), size
+
+
+def measure(path, setup, runs, rtt, bandwidth):
+    with AppServer(path, env=SETUPS[setup]) as server, httpx.Client(base_url=server.url, timeout=30) as client:
+        client.get("/analytics")  # fill the analytics cache, as on a busy server
+        page_seconds, page_bytes = fetch(client, "/analytics", runs)
+        if setup == "before":
+            calls = BEFORE_CALLS
+        elif setup == "client-rendered":
+            calls = ["/api/analytics/dashboard?limit=10"]
+        else:
+            calls = []
+        data = [fetch(client, call, runs) for call in calls]
+
+    def cost(seconds, size):
+        return rtt + seconds + size / bandwidth
+
+    html_time = cost(page_seconds, page_bytes)
+    data_time = max((cost(*call) for call in data), default=0.0)
+    first_visit = html_time + max(data_time, rtt)
+    repeat_visit = html_time + data_time
+    total_bytes = page_bytes + sum(size for _, size in data)
+    return {
+        "requests": 1 + len(data),
+        "bytes": total_bytes,
+        "first_paint": first_visit,
+        "repeat_paint": repeat_visit,
+        "server_ms": (page_seconds + sum(seconds for seconds, _ in data)) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--rtt", type=float, default=50.0, help="network round trip in ms")
+    parser.add_argument("--bandwidth", type=float, default=10.0, help="network bandwidth in Mbit/s")
+    args = parser.parse_args()
+    rtt, bandwidth = args.rtt / 1000, args.bandwidth * 1e6 / 8
+
+    print(f"Modelled network: {args.rtt:.0f}ms round trip, {args.bandwidth:g} Mbit/s")
+    print(f"{'setup':<17}{'requests':>9}{'bytes':>9}{'server ms':>11}{'first paint':>13}"
+          f"{'repeat paint':>14}")
+    with seeded_database() as path:
+        for setup in SETUPS:
+            result = measure(path, setup, args.runs, rtt, bandwidth)
+            print(f"{setup:<17}{result['requests']:>9}{result['bytes']:>9,}{result['server_ms']:>11.1f}"
+                  f"{result['first_paint'] * 1000:>11.0f}ms{result['repeat_paint'] * 1000:>12.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Load test for the rating change feed (``/api/events``).
+
+Against a seeded temporary database and one uvicorn worker, in the same
+process as all the subscribers (on a small machine they compete for the CPU,
+which shows up in the latencies):
+
+1. opens ``--subscribers`` idle SSE connections that read everything, plus
+   ``--slow`` that never read (their socket buffers fill up), and reports the
+   server's resident memory per connection
+2. posts single ratings one at a time and measures, for every reading
+   subscriber, the delay from sending the rating to receiving its event
+3. posts a burst of ``--burst`` ratings through ``/api/rate/batch`` and checks
+   the slow-consumer policy: every reading subscriber must end up with every
+   event in order, or have received a ``reset``; stalled subscribers must be
+   left behind (not buffered for) and receive a ``reset`` once they read again.
+   The kernel buffers a few MB per socket on loopback before the server sees
+   a stalled connection, so the burst must be larger than that plus
+   ``--buffer`` (the server's ``EVENTS_QUEUE_SIZE``)
+
+    python scripts/bench_events.py [--subscribers 2000] [--slow 20] [--burst 30000] [--buffer 2000]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.loadgen import AppServer, login, percentile, seeded_database
+
+
+def rss_bytes(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+class Subscriber:
+    """A raw SSE connection that records the arrival time of each event id."""
+
+    def __init__(self, port: int, read: bool = True):
+        self.port = port
+        self.read = read
+        self.arrivals = {}
+        self.resets = 0
+        self.reader = self.writer = None
+        self._task = None
+        self._tail = b""
+
+    async def connect(self):
+        sock = socket.socket()
+        if not self.read:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        sock.setblocking(False)
+        await asyncio.get_running_loop().sock_connect(sock, ("127.0.0.1", self.port))
+        self.reader, self.writer = await asyncio.open_connection(sock=sock, limit=4096)
+        self.writer.write(f"GET /api/events HTTP/1.1\r\nHost: 127.0.0.1:{self.port}\r\n\r\n".encode())
+        await self.writer.drain()
+        if self.read:
+            self.start_reading()
+
+    def start_reading(self):
+        self._task = asyncio.create_task(self._consume())
+
+    async def _consume(self):
+        while True:
+            chunk = await self.reader.read(65536)
+            if not chunk:
+                return
+            now = time.perf_counter()
+            lines = (self._tail + chunk).split(b"\n")
+            self._tail = lines.pop()
+            for line in lines:
+                if line.startswith(b"id: "):
+                    self.arrivals[int(line[4:])] = now
+                elif line == b"event: reset":
+                    self.resets += 1
+
+    def close(self):
+        if self._task:
+            self._task.cancel()
+        self.writer.close()
+
+
+async def connect_all(subscribers, batch=200):
+    for start in range(0, len(subscribers), batch):
+        await asyncio.gather(*(subscriber.connect() for subscriber in subscribers[start:start + batch]))
+
+
+async def main_async(args, server):
+    token = login(server.url)
+    auth = {"Authorization": f"Bearer {token}"}
+    base_rss = rss_bytes(server.process.pid)
+
+    readers = [Subscriber(server.port) for _ in range(args.subscribers)]
+    slow = [Subscriber(server.port, read=False) for _ in range(args.slow)]
+    await connect_all(readers + slow)
+    # A new connection per request: a busy client can leave a kept-alive one idle past the server's timeout
+    limits = httpx.Limits(max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=server.url, timeout=60, limits=limits) as client:
+        while (await client.get("/api/cache/stats")).json()["events"]["subscribers"] < len(readers) + len(slow):
+            await asyncio.sleep(0.1)
+        await asyncio.sleep(1)
+        connected_rss = rss_bytes(server.process.pid)
+        print(f"{len(readers)} reading + {len(slow)} stalled subscribers: server RSS "
+              f"{base_rss / 2**20:.0f} -> {connected_rss / 2**20:.0f} MiB "
+              f"({(connected_rss - base_rss) / (len(readers) + len(slow)) / 1024:.1f} KiB per connection)")
+
+        # Delivery latency for single ratings; event ids follow the log's last id
+        last_id = (await client.get("/api/analytics/dashboard")).json()["last_event_id"]
+        sent = {}
+        for i in range(args.singles):
+            start = time.perf_counter()
+            response = await client.post("/api/rate", json={"pokemon_id": 1 + i % 100, "rating": (i % 10) + 0.5},
+                                         headers=auth)
+            response.raise_for_status()
+            sent[last_id + 1 + i] = start
+            await asyncio.sleep(args.single_gap / 1000)
+        await asyncio.sleep(1)
+        latencies = [
+            (subscriber.arrivals[event_id] - start) * 1000
+            for event_id, start in sent.items() for subscriber in readers if event_id in subscriber.arrivals
+        ]
+        print(f"single ratings: {len(latencies)} deliveries of {len(sent)} events to {len(readers)} subscribers, "
+              f"p50 {percentile(latencies, 50):.1f}ms p99 {percentile(latencies, 99):.1f}ms "
+              f"max {max(latencies):.1f}ms after sending")
+
+        # Burst: fast readers keep up or are reset, stalled ones are reset
+        first_burst_id = last_id + args.singles + 1
+        start = time.perf_counter()
+        for offset in range(0, args.burst, args.batch_size):
+            items = [{"pokemon_id": 1 + (offset + i) % 1000, "rating": ((offset + i) % 100) / 10}
+                     for i in range(min(args.batch_size, args.burst - offset))]
+            (await client.post("/api/rate/batch", json=items, headers=auth)).raise_for_status()
+        posted = time.perf_counter() - start
+        last_burst_id = first_burst_id + args.burst - 1
+        deadline = time.perf_counter() + 60
+        while time.perf_counter() < deadline and not all(
+            last_burst_id in subscriber.arrivals or subscriber.resets for subscriber in readers
+        ):
+            await asyncio.sleep(0.1)
+        delivered = time.perf_counter() - start
+        expected = set(range(first_burst_id, last_burst_id + 1))
+        complete = sum(expected <= subscriber.arrivals.keys() for subscriber in readers)
+        reset = sum(bool(subscriber.resets) for subscriber in readers)
+        broken = sum(not subscriber.resets and not expected <= subscriber.arrivals.keys() for subscriber in readers)
+        in_order = all(
+            list(subscriber.arrivals) == sorted(subscriber.arrivals) for subscriber in readers
+        )
+        stats = (await client.get("/api/cache/stats")).json()["events"]
+        peak_rss = rss_bytes(server.process.pid)
+        print(f"burst of {args.burst} ratings: posted in {posted:.1f}s, all delivered after {delivered:.1f}s")
+        print(f"  reading subscribers: {complete} received every event, {reset} reset, {broken} missing events "
+              f"without a reset; ids in order: {in_order}")
+        print(f"  stalled subscribers: {stats['lagging']} of {len(slow)} left behind the buffer; "
+              f"server RSS {peak_rss / 2**20:.0f} MiB")
+
+        for subscriber in slow:
+            subscriber.start_reading()
+        await asyncio.sleep(2)
+        print(f"  stalled subscribers reading again: {sum(bool(subscriber.resets) for subscriber in slow)} "
+              f"of {len(slow)} received a reset")
+
+    for subscriber in readers + slow:
+        subscriber.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=2000)
+    parser.add_argument("--slow", type=int, default=20)
+    parser.add_argument("--singles", type=int, default=50, help="single ratings for the latency measurement")
+    parser.add_argument("--single-gap", type=float, default=100, help="ms between single ratings")
+    parser.add_argument("--burst", type=int, default=30000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--buffer", type=int, default=2000, help="EVENTS_QUEUE_SIZE for the server")
+    args = parser.parse_args()
+
+    with seeded_database() as path, AppServer(path, env={
+        "EVENTS_MAX_SUBSCRIBERS": str(args.subscribers + args.slow), "EVENTS_QUEUE_SIZE": str(args.buffer),
+    }) as server:
+        asyncio.run(main_async(args, server))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Compare the row-by-row and bulk CSV import paths.
+
+Each run imports the CSV into a fresh temporary SQLite database, then the bulk
+path is run a second time against the already seeded database to check that
+re-imports are idempotent.
+
+    python scripts/bench_import.py [--csv Pokemon4Elise.csv] [--batch-size 500]
+"""
+import argparse
+import sys
+import os
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from scripts.import_csv import CSV_FILE, DEFAULT_BATCH_SIZE, parse_csv, import_rows_bulk, import_rows_rowwise
+
+
+def _quiet(stage, done, total):
+    pass
+
+
+def run(path, rows, mode, batch_size):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        start = time.perf_counter()
+        if mode == "rowwise":
+            import_rows_rowwise(session, rows)
+        else:
+            import_rows_bulk(session, rows, batch_size=batch_size, progress=_quiet)
+        elapsed = time.perf_counter() - start
+        counts = (
+            session.execute(select(func.count(models.Pokemon.id))).scalar(),
+            session.execute(select(func.count(models.Rating.id))).scalar(),
+        )
+    finally:
+        session.close()
+        engine.dispose()
+    return elapsed, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=CSV_FILE)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    rows = parse_csv(args.csv)
+    print(f"{len(rows)} rows from {args.csv}\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rowwise_path = os.path.join(tmp, "rowwise.db")
+        bulk_path = os.path.join(tmp, "bulk.db")
+
+        rowwise_time, rowwise_counts = run(rowwise_path, rows, "rowwise", args.batch_size)
+        bulk_time, bulk_counts = run(bulk_path, rows, "bulk", args.batch_size)
+        rerun_time, rerun_counts = run(bulk_path, rows, "bulk", args.batch_size)
+
+    print(f"{'mode':<16}{'seconds':>10}{'pokemon':>10}{'ratings':>10}")
+    print(f"{'rowwise':<16}{rowwise_time:>10.3f}{rowwise_counts[0]:>10}{rowwise_counts[1]:>10}")
+    print(f"{'bulk':<16}{bulk_time:>10.3f}{bulk_counts[0]:>10}{bulk_counts[1]:>10}")
+    print(f"{'bulk (re-run)':<16}{rerun_time:>10.3f}{rerun_counts[0]:>10}{rerun_counts[1]:>10}")
+    print(f"\nSpeedup: {rowwise_time / bulk_time:.1f}x")
+
+    if not (rowwise_counts == bulk_counts == rerun_counts):
+        print("Row counts differ between runs!")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
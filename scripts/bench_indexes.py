@@ -0,0 +1,91 @@
+"""
+Time the rating queries before and after the composite/covering indexes.
+
+Migrates a temporary SQLite database to head, fills it with synthetic data
+(see ``generate_data.py``) and times the crud queries the indexes target.
+Then it downgrades to the baseline revision (the old single-column indexes)
+and times them again.
+
+    python scripts/bench_indexes.py [--pokemon 5000] [--ratings 500000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+TEMP = tempfile.mkdtemp(prefix="pokemon-rater-indexes-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEMP, 'indexes.db')}"
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import crud, migrate
+from app.database import SessionLocal, engine
+from app.unrated import UnratedSampler
+from scripts.generate_data import generate
+from scripts.loadgen import percentile
+
+TYPES = ["fire", "water", "grass", "dragon", "ghost"]
+
+
+def cases(rng, users):
+    return [
+        ("rating by pokemon and user",
+         lambda db: crud.get_rating_by_pokemon_and_user(db, rng.randint(1, 1000), f"user-{rng.randrange(users)}")),
+        ("top rated (10)", lambda db: crud.get_top_rated_pokemon(db, 10)),
+        ("bottom rated (10)", lambda db: crud.get_bottom_rated_pokemon(db, 10)),
+        ("ratings by type", lambda db: crud.get_ratings_by_type(db, rng.choice(TYPES))),
+        ("ratings by generation", lambda db: crud.get_ratings_by_generation(db, rng.randint(1, 9))),
+        # A fresh sampler each time, so the user's rated set is read from the database
+        ("unrated pool for a user",
+         lambda db: UnratedSampler().sample(db, f"user-{rng.randrange(users)}", 10)),
+    ]
+
+
+def measure(db, rng, users, repeat):
+    results = {}
+    for label, call in cases(rng, users):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            call(db)
+            samples.append((time.perf_counter() - start) * 1000)
+        results[label] = (statistics.median(samples), percentile(samples, 99))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pokemon", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--ratings", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    try:
+        migrate.upgrade(engine)
+        with SessionLocal() as db:
+            start = time.perf_counter()
+            counts = generate(db, args.pokemon, args.users, args.ratings)
+            print(f"Generated {counts['pokemon']} Pokemon and {counts['ratings']} ratings "
+                  f"in {time.perf_counter() - start:.1f}s")
+            after = measure(db, random.Random(1), args.users, args.repeat)
+        migrate.downgrade(engine, "0001")
+        with SessionLocal() as db:
+            before = measure(db, random.Random(1), args.users, args.repeat)
+        migrate.upgrade(engine)
+
+        print(f"\n{'query':<28}{'before p50':>12}{'after p50':>11}{'before p99':>12}{'after p99':>11}{'speedup':>9}")
+        for label, (after_p50, after_p99) in after.items():
+            before_p50, before_p99 = before[label]
+            print(f"{label:<28}{before_p50:>10.2f}ms{after_p50:>9.2f}ms{before_p99:>10.2f}ms{after_p99:>9.2f}ms"
+                  f"{before_p50 / after_p50:>8.1f}x")
+    finally:
+        engine.dispose()
+        shutil.rmtree(TEMP, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Measure the cost of the request/SQL instrumentation.
+
+Imports the app against a seeded temporary database with instrumentation and
+profiling disabled, checks that nothing was installed (no middleware, no
+engine hooks), then sends the same requests in-process (httpx ASGI
+transport, no network) to the plain app, to the app wrapped in
+``InstrumentationMiddleware`` with engine hooks attached, and to that plus
+``ProfilerMiddleware`` (no ``?profile=`` on the requests). Rounds are
+interleaved so drift affects all three equally.
+
+    python scripts/bench_instrumentation.py [--requests 300] [--rounds 5]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import event
+
+from scripts.loadgen import seeded_database
+
+PATHS = ["/api/pokemon?limit=20", "/api/pokemon/search/pi", "/api/unrated-pokemon?limit=1", "/api/pokemon/Pikachu"]
+
+
+async def per_request_us(app, requests):
+    samples = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for i in range(requests):
+            start = time.perf_counter()
+            response = await client.get(PATHS[i % len(PATHS)])
+            samples.append(time.perf_counter() - start)
+            response.raise_for_status()
+    return statistics.median(samples) * 1e6
+
+
+async def run(args):
+    from app import instrumentation
+    from app.database import engine, read_engine
+    from app.main import app
+
+    hooks = event.contains(engine, "after_cursor_execute", instrumentation._after_cursor_execute)
+    print(f"Disabled: {len(app.user_middleware)} middleware installed, engine hooks attached: {hooks}")
+    async with app.router.lifespan_context(app):
+        plain = app
+        instrumented = instrumentation.InstrumentationMiddleware(app, route_app=app)
+        profiled = instrumentation.ProfilerMiddleware(instrumented)
+
+        def set_hooks(enabled):
+            for bound in {engine, read_engine}:
+                if enabled:
+                    instrumentation.instrument_engine(bound)
+                elif event.contains(bound, "after_cursor_execute", instrumentation._after_cursor_execute):
+                    event.remove(bound, "before_cursor_execute", instrumentation._before_cursor_execute)
+                    event.remove(bound, "after_cursor_execute", instrumentation._after_cursor_execute)
+
+        configurations = [("disabled", plain, False), ("instrumented", instrumented, True),
+                          ("instrumented + profiler", profiled, True)]
+        results = {label: [] for label, _, _ in configurations}
+        await per_request_us(plain, args.requests)  # warm up
+        for round_number in range(args.rounds):
+            # Rotate the order each round so warm-up and drift do not favour one configuration
+            shift = round_number % len(configurations)
+            for label, target, hooks in configurations[shift:] + configurations[:shift]:
+                set_hooks(hooks)
+                results[label].append(await per_request_us(target, args.requests))
+        set_hooks(False)
+
+    baseline = statistics.median(results["disabled"])
+    print(f"\n{'configuration':<26}{'median us/request':>19}{'overhead':>10}")
+    for label, samples in results.items():
+        value = statistics.median(samples)
+        print(f"{label:<26}{value:>19.0f}{(value - baseline) / baseline:>+10.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300, help="requests per configuration per round")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    with seeded_database() as path:
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+        os.environ["INSTRUMENTATION_ENABLED"] = "false"
+        os.environ["PROFILING_ENABLED"] = "false"
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
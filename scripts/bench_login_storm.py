@@ -0,0 +1,74 @@
+"""
+Measure how a burst of logins affects latency of other endpoints.
+
+Starts the app with argon2 verification inline on the event loop (the old
+behaviour) and on the bounded thread pool, then runs login workers hammering
+POST /token while probe workers fetch a cheap cached endpoint. Reports probe
+latency and how many logins succeeded or were rejected with 429.
+
+    python scripts/bench_login_storm.py [--logins 16] [--probes 4] [--duration 10]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from scripts.loadgen import AppServer, percentile, seeded_database
+
+PROBE_PATH = "/api/analytics/statistics"
+
+
+async def storm(base_url, logins, probes, duration):
+    probe_latencies = []
+    outcomes = {"ok": 0, "rejected": 0, "failed": 0}
+    limits = httpx.Limits(max_connections=logins + probes)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        deadline = time.perf_counter() + duration
+
+        async def login_worker():
+            while time.perf_counter() < deadline:
+                response = await client.post("/token", data={"username": "admin", "password": "admin123"})
+                if response.status_code == 200:
+                    outcomes["ok"] += 1
+                elif response.status_code == 429:
+                    outcomes["rejected"] += 1
+                    await asyncio.sleep(0.05)
+                else:
+                    outcomes["failed"] += 1
+
+        async def probe_worker():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                await client.get(PROBE_PATH)
+                probe_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(login_worker() for _ in range(logins)), *(probe_worker() for _ in range(probes)))
+    return probe_latencies, outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=16)
+    parser.add_argument("--probes", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    print(f"{'executor':<10}{'probe p50 ms':>14}{'probe p99 ms':>14}{'probe max ms':>14}"
+          f"{'logins ok':>11}{'429s':>7}{'failed':>8}")
+    with seeded_database() as path:
+        for executor in ("inline", "thread"):
+            with AppServer(path, env={"PASSWORD_HASH_EXECUTOR": executor}) as server:
+                httpx.get(f"{server.url}{PROBE_PATH}")  # warm the analytics cache
+                latencies, outcomes = asyncio.run(storm(server.url, args.logins, args.probes, args.duration))
+            print(f"{executor:<10}{percentile(latencies, 50) * 1000:>14.1f}{percentile(latencies, 99) * 1000:>14.1f}"
+                  f"{max(latencies) * 1000:>14.1f}{outcomes['ok']:>11}{outcomes['rejected']:>7}{outcomes['failed']:>8}")
+
+
+if __name__ == "__main__":
+    main()
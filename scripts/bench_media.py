@@ -0,0 +1,92 @@
+"""
+Benchmark the local media cache against fetching images from the upstream host.
+
+Runs the fake sprite host with added latency (standing in for
+raw.githubusercontent.com), prefetches the whole catalogue into a temporary
+cache at several concurrency levels, then serves random sprites from the app
+in offline mode and compares latency with requesting them from the upstream
+directly.
+
+    python scripts/bench_media.py [--latency 0.05] [--concurrency 1,8,32] [--duration 10]
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.media import MediaCache, catalogue_media
+from scripts.fake_pokeapi import BackgroundServer, create_app
+from scripts.loadgen import AppServer, run_load, seeded_database, summarize
+
+CATALOGUE_SIZE = 1025
+SPRITE_URL = "https://raw.githubusercontent.com/PokeAPI/sprites/master/sprites/pokemon/{dex}.png"
+ARTWORK_URL = "https://raw.githubusercontent.com/PokeAPI/sprites/master/sprites/pokemon/other/official-artwork/{dex}.png"
+
+
+def sources():
+    return catalogue_media(
+        (dex, SPRITE_URL.format(dex=dex), ARTWORK_URL.format(dex=dex)) for dex in range(1, CATALOGUE_SIZE + 1)
+    )
+
+
+async def prefetch(root, upstream_url, concurrency):
+    cache = MediaCache(root, upstream_url=upstream_url, concurrency=concurrency)
+    try:
+        start = time.perf_counter()
+        counts = await cache.prefetch(sources())
+        return counts, time.perf_counter() - start
+    finally:
+        await cache.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=4)
+    args = parser.parse_args()
+    rng = random.Random(11)
+
+    tmp = tempfile.mkdtemp(prefix="pokemon-rater-media-")
+    try:
+        with BackgroundServer(create_app(latency=args.latency)) as upstream:
+            print(f"{'prefetch concurrency':<22}{'images':>8}{'seconds':>10}{'images/s':>10}")
+            for concurrency in map(int, args.concurrency.split(",")):
+                root = os.path.join(tmp, f"media-{concurrency}")
+                counts, elapsed = asyncio.run(prefetch(root, upstream.url, concurrency))
+                print(f"{concurrency:<22}{counts['fetched']:>8}{elapsed:>10.2f}{counts['fetched'] / elapsed:>10.1f}")
+            cache_dir = root
+
+            async def from_upstream(client, worker_id):
+                dex = rng.randint(1, CATALOGUE_SIZE)
+                return "upstream", await client.get(f"{upstream.url}/PokeAPI/sprites/master/sprites/pokemon/{dex}.png")
+
+            results, elapsed = asyncio.run(run_load(upstream.url, from_upstream, args.clients, args.duration))
+            rows = [("upstream", summarize(*(results["upstream"][0], elapsed, results["upstream"][1])))]
+
+            with seeded_database() as path, AppServer(path, env={
+                "MEDIA_CACHE_DIR": cache_dir, "MEDIA_OFFLINE": "true",
+            }) as server:
+                async def from_cache(client, worker_id):
+                    dex = rng.randint(1, CATALOGUE_SIZE)
+                    return "cache", await client.get(f"/media/{dex}/sprite")
+
+                results, elapsed = asyncio.run(run_load(server.url, from_cache, args.clients, args.duration))
+                rows.append(("/media (cached)", summarize(results["cache"][0], elapsed, results["cache"][1])))
+
+        print(f"\n{'source':<18}{'rps':>8}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}")
+        for label, stats in rows:
+            print(f"{label:<18}{stats['rps']:>8.0f}{stats['p50_ms']:>9.1f}{stats['p99_ms']:>9.1f}{stats['errors']:>8}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Compare OFFSET/LIMIT paging with keyset (cursor) paging on a large catalogue.
+
+Seeds a temporary SQLite database with synthetic Pokemon, then times fetching
+individual pages at increasing depth with both ``crud.get_pokemon_list`` and
+``crud.get_pokemon_page``, and finally streams the whole table through the
+NDJSON export while tracking peak memory.
+
+    python scripts/bench_pagination.py [--rows 1000000] [--page-size 100] [--repeat 20]
+"""
+import argparse
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.pagination import encode_cursor, iter_ndjson
+
+PAGES = [1, 10, 100, 1000]
+SEED_BATCH = 50000
+
+
+def seed(db, rows):
+    for start in range(1, rows + 1, SEED_BATCH):
+        db.execute(insert(models.Pokemon), [
+            {"name": f"pokemon-{i}", "dex_number": i, "type1": "normal", "generation": 1 + i % 9}
+            for i in range(start, min(rows, start + SEED_BATCH - 1) + 1)
+        ])
+    db.commit()
+
+
+def time_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/pagination.db")
+        models.Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        start = time.perf_counter()
+        seed(db, args.rows)
+        print(f"Seeded {args.rows} rows in {time.perf_counter() - start:.1f}s")
+
+        print(f"{'page':>6}{'offset ms':>12}{'keyset ms':>12}")
+        for page in PAGES:
+            skip = (page - 1) * args.page_size
+            if skip >= args.rows:
+                break
+            # The cursor a client would hold after reading the previous page
+            cursor = encode_cursor("id", skip) if skip else None
+            offset_ms = time_ms(lambda: crud.get_pokemon_list(db, skip=skip, limit=args.page_size), args.repeat)
+            keyset_ms = time_ms(lambda: crud.get_pokemon_page(db, limit=args.page_size, cursor=cursor), args.repeat)
+            db.expunge_all()
+            print(f"{page:>6}{offset_ms:>12.2f}{keyset_ms:>12.2f}")
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        size = sum(len(chunk) for chunk in iter_ndjson(db))
+        elapsed = time.perf_counter() - start
+        rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+        print(f"NDJSON export: {size / 1e6:.1f} MB in {elapsed:.1f}s "
+              f"({args.rows / elapsed:.0f} rows/s), peak RSS grew by {rss_growth / 1024:.1f} MB")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Compare a client-per-request PokeAPI lookup with the pooled, cached service.
+
+Runs against the local stand-in from scripts/fake_pokeapi.py, so no network
+access is needed. Reports wall time and the number of TCP connections the
+stand-in saw, then repeats the lookups to check they are served from cache.
+
+    python scripts/bench_pokeapi.py [--count 100] [--latency 0.01]
+"""
+import argparse
+import asyncio
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from app.services.pokeapi import PokeAPIService, ResponseCache
+from scripts.fake_pokeapi import BackgroundServer, create_app
+
+
+async def fetch_unpooled(base_url, names):
+    """The previous behaviour: a new client per request, pokemon then species."""
+    for name in names:
+        async with httpx.AsyncClient() as client:
+            await client.get(f"{base_url}/pokemon/{name}")
+        async with httpx.AsyncClient() as client:
+            await client.get(f"{base_url}/pokemon-species/{name}")
+
+
+async def fetch_pooled(service, names):
+    return await asyncio.gather(*(service.get_pokemon_complete_data(name) for name in names))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--max-connections", type=int, default=10)
+    args = parser.parse_args()
+
+    names = [f"pokemon-{i}" for i in range(args.count)]
+    app = create_app(latency=args.latency)
+    stats = app.state.stats
+
+    with BackgroundServer(app) as server:
+        start = time.perf_counter()
+        asyncio.run(fetch_unpooled(server.url, names))
+        unpooled_time = time.perf_counter() - start
+        unpooled_connections = len(stats.connections)
+        stats.reset()
+
+        service = PokeAPIService(
+            base_url=server.url,
+            max_connections=args.max_connections,
+            concurrency=args.max_connections,
+            cache=ResponseCache(max_size=args.count * 2),
+        )
+
+        async def pooled_run():
+            await service.start()
+            try:
+                start = time.perf_counter()
+                results = await fetch_pooled(service, names)
+                cold = time.perf_counter() - start
+                requests_after_cold = service.requests_sent
+                start = time.perf_counter()
+                await fetch_pooled(service, names)
+                warm = time.perf_counter() - start
+                return results, cold, warm, requests_after_cold
+            finally:
+                await service.close()
+
+        results, cold_time, warm_time, cold_requests = asyncio.run(pooled_run())
+        pooled_connections = len(stats.connections)
+
+    print(f"{'mode':<20}{'seconds':>10}{'requests':>10}{'connections':>13}")
+    print(f"{'client per request':<20}{unpooled_time:>10.3f}{args.count * 2:>10}{unpooled_connections:>13}")
+    print(f"{'pooled (cold)':<20}{cold_time:>10.3f}{cold_requests:>10}{pooled_connections:>13}")
+    print(f"{'pooled (cached)':<20}{warm_time:>10.3f}{service.requests_sent - cold_requests:>10}{0:>13}")
+    print(f"\nCache: {service.cache.stats()}")
+
+    assert all(results), "stand-in returned no data"
+    assert pooled_connections <= args.max_connections, "connections were not reused"
+    assert stats.requests == args.count * 2, "cached lookups reached the server"
+    assert service.cache.hits == args.count * 2, "expected every second lookup to hit the cache"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark community leaderboards at millions of ratings.
+
+Seeds a temporary SQLite database with synthetic Pokemon and ratings from
+thousands of users (see ``bench_analytics.seed``), rebuilds the rankings, then
+times overall, per-type and per-generation top/bottom-N queries, the old
+row-sorting ``get_top_rated_pokemon``, and single rating writes through
+``crud.create_or_update_rating`` including the incremental ranking update.
+
+    python scripts/bench_rankings.py [--pokemon 1025] [--ratings 2000000] [--queries 500]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import aggregates, crud, models, rankings, schemas
+from scripts.bench_analytics import GENERATIONS, TYPES, seed
+from scripts.loadgen import percentile
+
+
+def time_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), percentile(samples, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pokemon", type=int, default=1025)
+    parser.add_argument("--ratings", type=int, default=2000000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--writes", type=int, default=500)
+    args = parser.parse_args()
+    rng = random.Random(5)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/rankings.db")
+        models.Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        start = time.perf_counter()
+        seed(db, args.pokemon, args.ratings, rng)
+        users = -(-args.ratings // args.pokemon)
+        print(f"Seeded {args.ratings} ratings from {users} users in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        aggregates.rebuild(db)
+        rows = rankings.rebuild(db)
+        db.commit()
+        print(f"Rebuilt aggregates and {rows} ranking rows in {time.perf_counter() - start:.1f}s")
+
+        print(f"{'query':<34}{'p50 ms':>9}{'p99 ms':>9}")
+        cases = [
+            ("top 10 overall", lambda: crud.get_community_ranking(db, 10)),
+            ("bottom 10 overall", lambda: crud.get_community_ranking(db, 10, ascending=True)),
+            ("top 10 by type (random)", lambda: crud.get_community_ranking(db, 10, pokemon_type=rng.choice(TYPES))),
+            ("top 10 by generation (random)", lambda: crud.get_community_ranking(db, 10, generation=rng.choice(GENERATIONS))),
+            ("top 100 overall", lambda: crud.get_community_ranking(db, 100)),
+        ]
+        for label, query in cases:
+            p50, p99 = time_ms(query, args.queries)
+            print(f"{label:<34}{p50:>9.2f}{p99:>9.2f}")
+        p50, p99 = time_ms(lambda: crud.get_top_rated_pokemon(db, 10), 5)
+        print(f"{'old top-rated (sorts rating rows)':<34}{p50:>9.2f}{p99:>9.2f}")
+
+        writes = [
+            (schemas.RatingCreate(pokemon_id=rng.randint(1, args.pokemon), rating=round(rng.uniform(-5, 15), 1)),
+             f"user-{rng.randint(0, users * 2)}")
+            for _ in range(args.writes)
+        ]
+        iterator = iter(writes)
+
+        def write():
+            rating, user_id = next(iterator)
+            crud.create_or_update_rating(db, rating, user_id=user_id)
+
+        p50, p99 = time_ms(write, args.writes)
+        print(f"{'rating write incl. rankings':<34}{p50:>9.2f}{p99:>9.2f}")
+        problems = rankings.check_consistency(db)
+        print(f"Ranking consistency after writes: {len(problems)} problems")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
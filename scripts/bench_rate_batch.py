@@ -0,0 +1,74 @@
+"""
+Compare rating throughput of POST /api/rate and POST /api/rate/batch.
+
+Starts the app against a freshly seeded database and re-rates the catalogue
+from one client: first with one sequential request per rating, as the rate
+page does, then with batches of increasing size (JSON array and NDJSON).
+
+    python scripts/bench_rate_batch.py [--ratings 1000] [--batch-sizes 10,100,1000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from scripts.loadgen import AppServer, login, seeded_database
+
+CATALOGUE_SIZE = 1025
+
+
+def make_ratings(count, rng):
+    return [{"pokemon_id": rng.randint(1, CATALOGUE_SIZE), "rating": round(rng.uniform(-5, 10), 1)}
+            for _ in range(count)]
+
+
+def run_single(client, ratings):
+    for rating in ratings:
+        client.post("/api/rate", json=rating).raise_for_status()
+
+
+def run_batches(client, ratings, batch_size, ndjson):
+    for start in range(0, len(ratings), batch_size):
+        batch = ratings[start:start + batch_size]
+        if ndjson:
+            response = client.post("/api/rate/batch", content="\n".join(map(json.dumps, batch)),
+                                   headers={"Content-Type": "application/x-ndjson"})
+        else:
+            response = client.post("/api/rate/batch", json=batch)
+        response.raise_for_status()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ratings", type=int, default=1000)
+    parser.add_argument("--batch-sizes", default="10,100,1000")
+    args = parser.parse_args()
+    rng = random.Random(13)
+
+    runs = [("single", None, False)]
+    for size in map(int, args.batch_sizes.split(",")):
+        runs += [(f"batch {size}", size, False), (f"ndjson {size}", size, True)]
+
+    print(f"{'mode':<14}{'seconds':>10}{'ratings/s':>12}")
+    with seeded_database() as path, AppServer(path) as server:
+        headers = {"Authorization": f"Bearer {login(server.url)}"}
+        with httpx.Client(base_url=server.url, headers=headers, timeout=120) as client:
+            for label, size, ndjson in runs:
+                ratings = make_ratings(args.ratings, rng)
+                start = time.perf_counter()
+                if size is None:
+                    run_single(client, ratings)
+                else:
+                    run_batches(client, ratings, size, ndjson)
+                elapsed = time.perf_counter() - start
+                print(f"{label:<14}{elapsed:>10.2f}{args.ratings / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
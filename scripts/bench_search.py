@@ -0,0 +1,107 @@
+"""
+Compare search latency of the in-memory index with the old ILIKE scan.
+
+Builds temporary SQLite catalogues of synthetic names (derived from the CSV)
+at each size and replays a mix of prefix, substring and misspelled queries
+through both crud.search_pokemon_ilike and crud.search_pokemon.
+
+    python scripts/bench_search.py [--sizes 1000 100000] [--queries 500]
+"""
+import argparse
+import random
+import statistics
+import sys
+import os
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.search import search_index
+from scripts.import_csv import parse_csv
+
+SUFFIXES = ["", " alpha", " beta", " gamma", " delta", " omega", " prime", " nova"]
+
+
+def synthetic_names(base, count):
+    names = []
+    for i in range(count):
+        name = base[i % len(base)]
+        suffix = SUFFIXES[(i // len(base)) % len(SUFFIXES)]
+        generation = i // (len(base) * len(SUFFIXES))
+        names.append(f"{name}{suffix}{' ' + str(generation) if generation else ''}")
+    return names
+
+
+def make_queries(base, count, rng):
+    queries = []
+    for _ in range(count):
+        name = rng.choice(base).lower()
+        kind = rng.random()
+        if kind < 0.5:
+            queries.append(name[:rng.randint(2, max(2, len(name)))])
+        elif kind < 0.8:
+            start = rng.randint(0, max(0, len(name) - 3))
+            queries.append(name[start:start + 3])
+        else:
+            position = rng.randrange(len(name))
+            queries.append(name[:position] + rng.choice("aeiou") + name[position + 1:])
+    return queries
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def timed(fn, queries):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), percentile(samples, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000])
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    base = [row["name"] for row in parse_csv()]
+    queries = make_queries(base, args.queries, rng)
+
+    print(f"{'rows':>8}  {'method':<10}{'p50 ms':>10}{'p99 ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            engine = create_engine(f"sqlite:///{tmp}/search_{size}.db")
+            models.Base.metadata.create_all(bind=engine)
+            db = sessionmaker(bind=engine)()
+            db.execute(insert(models.Pokemon), [
+                {"name": name, "dex_number": i + 1, "type1": "normal", "generation": 1}
+                for i, name in enumerate(synthetic_names(base, size))
+            ])
+            db.commit()
+
+            start = time.perf_counter()
+            search_index.build(db)
+            build_ms = (time.perf_counter() - start) * 1000
+
+            ilike = timed(lambda q: crud.search_pokemon_ilike(db, q), queries)
+            indexed = timed(lambda q: crud.search_pokemon(db, q), queries)
+            ids_only = timed(lambda q: search_index.search(q), queries)
+            print(f"{size:>8}  {'ilike':<10}{ilike[0]:>10.3f}{ilike[1]:>10.3f}")
+            print(f"{size:>8}  {'index':<10}{indexed[0]:>10.3f}{indexed[1]:>10.3f}   (build {build_ms:.0f} ms)")
+            print(f"{size:>8}  {'index ids':<10}{ids_only[0]:>10.3f}{ids_only[1]:>10.3f}   (no row fetch)")
+            db.close()
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Compare the default and fast serialization paths for the Pokemon list.
+
+Seeds a temporary SQLite database with synthetic Pokemon, then for several
+page sizes times what ``/api/pokemon`` does per request: the default path
+(ORM objects, ``response_model`` validation with ``from_attributes``,
+``jsonable_encoder``-equivalent dump, ``json.dumps``) against the
+``FAST_SERIALIZATION`` path (column tuples encoded with orjson). Reports
+milliseconds and peak traced memory per request, and checks both paths
+produce the same JSON.
+
+    python scripts/bench_serialization.py [--pokemon 10000] [--sizes 100,1000,10000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, schemas
+from app.serialization import POKEMON_COLUMNS, POKEMON_FIELDS, encode_rows
+from scripts.bench_analytics import GENERATIONS, TYPES
+
+POKEMON_LIST = TypeAdapter(List[schemas.Pokemon])
+
+
+def default_path(db, limit):
+    pokemon = crud.get_pokemon_list(db, limit=limit)
+    validated = POKEMON_LIST.validate_python(pokemon, from_attributes=True)
+    return json.dumps(POKEMON_LIST.dump_python(validated, mode="json"), separators=(",", ":")).encode()
+
+
+def fast_path(db, limit):
+    return encode_rows(POKEMON_FIELDS, crud.get_pokemon_list(db, limit=limit, columns=POKEMON_COLUMNS))
+
+
+def measure(session_factory, fn, limit, repeat):
+    samples = []
+    for _ in range(repeat):
+        db = session_factory()
+        start = time.perf_counter()
+        fn(db, limit)
+        samples.append((time.perf_counter() - start) * 1000)
+        db.close()
+    db = session_factory()
+    tracemalloc.start()
+    fn(db, limit)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    db.close()
+    return statistics.median(samples), peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pokemon", type=int, default=10000)
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    rng = random.Random(17)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/serialization.db")
+        models.Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+        with session_factory() as db:
+            db.execute(insert(models.Pokemon), [
+                {"name": f"pokemon-{i}", "dex_number": i, "type1": rng.choice(TYPES),
+                 "type2": rng.choice(TYPES + [None] * 18), "generation": rng.choice(GENERATIONS),
+                 "sprite_url": f"https://example.com/sprites/{i}.png",
+                 "artwork_url": f"https://example.com/artwork/{i}.png"}
+                for i in range(1, args.pokemon + 1)
+            ])
+            db.commit()
+            same = json.loads(default_path(db, 100)) == json.loads(fast_path(db, 100))
+        print(f"Seeded {args.pokemon} Pokemon; identical JSON: {same}")
+
+        print(f"{'rows':>6}  {'default ms':>11}{'fast ms':>9}{'speedup':>9}  {'default KiB':>12}{'fast KiB':>10}")
+        for size in map(int, args.sizes.split(",")):
+            default_ms, default_kib = measure(session_factory, default_path, size, args.repeat)
+            fast_ms, fast_kib = measure(session_factory, fast_path, size, args.repeat)
+            print(f"{size:>6}  {default_ms:>11.2f}{fast_ms:>9.2f}{default_ms / fast_ms:>8.1f}x"
+                  f"  {default_kib:>12.0f}{fast_kib:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
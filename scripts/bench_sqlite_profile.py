@@ -0,0 +1,76 @@
+"""
+Mixed read/write load test with and without the SQLite performance profile.
+
+Starts the app against a seeded temporary database, first with
+SQLITE_PROFILE=false (default rollback journal, one shared pool) and then
+with the profile (WAL, tuned PRAGMAs, single writer plus read-only pool).
+Drives concurrent rating writes alongside analytics and catalogue reads and
+reports throughput and failed requests ("database is locked" surfaces as 500s).
+
+    python scripts/bench_sqlite_profile.py [--concurrency 32] [--duration 10] [--write-ratio 0.3]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.import_csv import parse_csv
+from scripts.loadgen import AppServer, login, run_load, seeded_database, summarize
+
+READ_PATHS = [
+    "/api/analytics/top-rated?limit=10",
+    "/api/analytics/statistics",
+    "/api/analytics/by-generation/{generation}",
+    "/api/analytics/by-type/{type}",
+]
+TYPES = ["normal", "fire", "water", "grass", "electric", "psychic", "dragon", "ghost"]
+
+
+def request_mix(names, token, write_ratio):
+    auth = {"Authorization": f"Bearer {token}"}
+
+    async def make_request(client, worker_id):
+        roll = random.random()
+        if roll < write_ratio:
+            body = {"pokemon_id": random.randint(1, len(names)), "rating": round(random.uniform(0, 10), 1)}
+            return "write", await client.post("/api/rate", json=body, headers=auth)
+        if roll < write_ratio + (1 - write_ratio) / 2:
+            return "read", await client.get(f"/api/pokemon/{random.choice(names)}")
+        path = random.choice(READ_PATHS).format(generation=random.randint(1, 9), type=random.choice(TYPES))
+        return "read", await client.get(path)
+
+    return make_request
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--write-ratio", type=float, default=0.3)
+    args = parser.parse_args()
+
+    names = [row["name"] for row in parse_csv()]
+    print(f"{'profile':<9}{'kind':<7}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for profile in ("false", "true"):
+        with seeded_database({"SQLITE_PROFILE": profile}) as path:
+            with AppServer(path, env={"SQLITE_PROFILE": profile}) as server:
+                token = login(server.url)
+                results, elapsed = asyncio.run(run_load(
+                    server.url, request_mix(names, token, args.write_ratio),
+                    concurrency=args.concurrency, duration=args.duration,
+                ))
+        label = "on" if profile == "true" else "off"
+        for kind in ("read", "write", "error"):
+            if kind not in results:
+                continue
+            latencies, errors = results[kind]
+            stats = summarize(latencies, elapsed, errors)
+            print(f"{label:<9}{kind:<7}{stats['rps']:>9.1f}{stats['p50_ms']:>9.2f}"
+                  f"{stats['p99_ms']:>9.2f}{stats['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
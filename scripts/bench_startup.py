@@ -0,0 +1,102 @@
+"""
+Measure application startup: import time and time to first request.
+
+Against a seeded temporary database (already migrated by the importer):
+
+- ``import app.main`` in a fresh interpreter, minus the bare interpreter
+  start, plus the modules that cost the most (from ``python -X importtime``)
+- process start to the first successful ``/api/pokemon`` and to the first
+  non-empty search result, with uvicorn in a subprocess, for each
+  ``AUTO_MIGRATE`` setting
+
+    python scripts/bench_startup.py [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.fake_pokeapi import free_port
+from scripts.loadgen import ROOT, seeded_database
+
+
+def interpreter_seconds(code, env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, check=True)
+    return time.perf_counter() - start
+
+
+def heaviest_imports(env, top=8):
+    """``(module, cumulative ms)`` for the slowest top-level imports under app.main."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if name.startswith("   ") and not name.startswith("    "):  # direct imports of app.main
+            modules[name.strip()] = int(cumulative) / 1000
+    return sorted(modules.items(), key=lambda item: -item[1])[:top]
+
+
+def until_ok(url, params=None, check=lambda response: True, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            response = httpx.get(url, params=params, timeout=5)
+            if response.status_code == 200 and check(response):
+                return time.perf_counter()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.005)
+    raise RuntimeError(f"{url} did not answer within {timeout}s")
+
+
+def first_request(env):
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        first = until_ok(f"{base}/api/pokemon", {"limit": 1})
+        search = until_ok(f"{base}/api/pokemon/search/pika", check=lambda response: bool(response.json()))
+        return first - start, search - start
+    finally:
+        process.terminate()
+        process.wait(timeout=15)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with seeded_database() as path:
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{path}"}
+        bare = statistics.median(interpreter_seconds("pass", env) for _ in range(args.runs))
+        imported = statistics.median(interpreter_seconds("import app.main", env) for _ in range(args.runs))
+        print(f"import app.main: {(imported - bare) * 1000:.0f}ms (interpreter start {bare * 1000:.0f}ms)")
+        for module, ms in heaviest_imports(env):
+            print(f"  {module:<40}{ms:>8.0f}ms")
+
+        print(f"\n{'configuration':<22}{'first request':>15}{'first search':>14}")
+        for auto_migrate in ("true", "false"):
+            timings = [first_request({**env, "AUTO_MIGRATE": auto_migrate}) for _ in range(args.runs)]
+            first = statistics.median(timing[0] for timing in timings)
+            search = statistics.median(timing[1] for timing in timings)
+            print(f"{'AUTO_MIGRATE=' + auto_migrate:<22}{first * 1000:>13.0f}ms{search * 1000:>12.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Benchmark suite for the HTTP API, saved as JSON for comparing commits.
+
+Generates a synthetic database in a temporary directory (see
+``generate_data.py``), serves the app in-process with uvicorn, and drives
+each scenario from concurrent httpx clients for ``--duration`` seconds:
+
+    search     search-as-you-type: one request per keystroke of a random name
+    rate       fetch the next unrated Pokemon, rate it, repeat (one user per client)
+    analytics  the analytics dashboard's requests, in page order
+    login      bursts of logins by random users
+
+Every request is labelled by endpoint. The suite reports throughput,
+p50/p95/p99 latency and the mean number of SQL statements per request.
+Statements are counted server-side on every engine and returned in an
+``X-Query-Count`` header. Everything runs offline. ``--compare`` prints
+per-endpoint changes between two result files.
+
+    python scripts/bench_suite.py [--pokemon 5000] [--ratings 200000] [--duration 10] [--output results.json]
+    python scripts/bench_suite.py --compare bench-results/base.json bench-results/new.json
+"""
+import argparse
+import asyncio
+import contextvars
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from sqlalchemy import event, select
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+SCENARIOS = ("search", "rate", "analytics", "login")
+TYPES = ["normal", "fire", "water", "grass", "electric", "ice", "fighting", "poison", "ground",
+         "flying", "psychic", "bug", "rock", "ghost", "dragon", "dark", "steel", "fairy"]
+REGRESSION_THRESHOLD = 0.10
+
+query_counter = contextvars.ContextVar("query_counter", default=None)
+
+
+class QueryCountMiddleware:
+    """Count SQL statements per request and report them in ``X-Query-Count``."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        counter = [0]
+        query_counter.set(counter)
+
+        async def send_with_count(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-query-count", str(counter[0]).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_count)
+
+
+def count_queries(*engines):
+    def before_cursor_execute(*args):
+        counter = query_counter.get()
+        if counter is not None:
+            counter[0] += 1
+
+    for engine in set(engines):
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Scenario:
+    """Per-client request sequences for one scenario; ``step`` issues the next request."""
+
+    def __init__(self, name, names, users, password, tokens, rng):
+        self.name = name
+        self.names = names
+        self.users = users
+        self.password = password
+        self.tokens = tokens
+        self.rng = rng
+        self.state = {}
+        self.queries = {}
+
+    def record(self, label, response):
+        count = response.headers.get("x-query-count")
+        if count is not None:
+            self.queries.setdefault(label, []).append(int(count))
+        return label, response
+
+    async def step(self, client, worker_id):
+        return self.record(*await getattr(self, self.name)(client, worker_id))
+
+    async def search(self, client, worker_id):
+        pending = self.state.get(worker_id)
+        if not pending:
+            name = self.rng.choice(self.names).lower()
+            pending = self.state[worker_id] = [name[:i] for i in range(len(name), 0, -1)]
+        prefix = pending.pop()
+        return "GET /api/pokemon/search/{query}", await client.get(f"/api/pokemon/search/{prefix}")
+
+    async def rate(self, client, worker_id):
+        user = self.users[worker_id % len(self.users)]
+        pokemon_id = self.state.pop(worker_id, None)
+        if pokemon_id is None:
+            response = await client.get("/api/unrated-pokemon", params={"limit": 1, "user_id": user})
+            if response.status_code == 200 and response.json():
+                self.state[worker_id] = response.json()[0]["id"]
+            return "GET /api/unrated-pokemon", response
+        response = await client.post(
+            "/api/rate", json={"pokemon_id": pokemon_id, "rating": round(self.rng.uniform(-5, 15), 1)},
+            headers={"Authorization": f"Bearer {self.tokens[user]}"},
+        )
+        return "POST /api/rate", response
+
+    async def analytics(self, client, worker_id):
+        pending = self.state.get(worker_id)
+        if not pending:
+            pending = self.state[worker_id] = [
+                ("GET /api/analytics/by-generation/{generation}",
+                 f"/api/analytics/by-generation/{self.rng.randint(1, 9)}"),
+                ("GET /api/analytics/by-type/{type}", f"/api/analytics/by-type/{self.rng.choice(TYPES)}"),
+                ("GET /api/analytics/bottom-rated", "/api/analytics/bottom-rated?limit=10"),
+                ("GET /api/analytics/top-rated", "/api/analytics/top-rated?limit=10"),
+                ("GET /api/analytics/statistics", "/api/analytics/statistics"),
+            ]
+        label, url = pending.pop()
+        return label, await client.get(url)
+
+    async def login(self, client, worker_id):
+        user = self.rng.choice(self.users)
+        return "POST /token", await client.post("/token", data={"username": user, "password": self.password})
+
+
+def run_scenario(base_url, scenario, clients, duration):
+    from scripts.loadgen import run_load, summarize
+
+    results, elapsed = asyncio.run(run_load(base_url, scenario.step, clients, duration))
+    report = {}
+    for label, (latencies, errors) in sorted(results.items()):
+        stats = summarize(latencies, elapsed, errors)
+        counts = scenario.queries.get(label, [])
+        stats["queries_per_request"] = sum(counts) / len(counts) if counts else None
+        report[label] = stats
+    return report
+
+
+def print_report(results):
+    print(f"\n{'scenario / endpoint':<52}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'queries':>9}{'errors':>8}")
+    for scenario, endpoints in results["scenarios"].items():
+        print(scenario)
+        for label, stats in endpoints.items():
+            queries = stats["queries_per_request"]
+            queries = f"{queries:.1f}" if queries is not None else "-"
+            print(f"  {label:<50}{stats['rps']:>8.1f}{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}"
+                  f"{stats['p99_ms']:>9.1f}{queries:>9}{stats['errors']:>8}")
+
+
+def compare(base_path, new_path, threshold=REGRESSION_THRESHOLD):
+    """Print per-endpoint changes from ``base_path`` to ``new_path``; returns the number of regressions."""
+    with open(base_path) as handle:
+        base = json.load(handle)
+    with open(new_path) as handle:
+        new = json.load(handle)
+    print(f"base {base.get('commit')} ({base['created_at']})  ->  new {new.get('commit')} ({new['created_at']})")
+    print(f"\n{'scenario / endpoint':<52}{'rps':>16}{'p50 ms':>18}{'p99 ms':>18}{'queries':>12}")
+    regressions = 0
+
+    def change(old, value, higher_is_worse=True):
+        nonlocal regressions
+        if old is None or value is None:
+            return f"{'-':>16}"
+        delta = (value - old) / old if old else 0.0
+        worse = delta > threshold if higher_is_worse else delta < -threshold
+        regressions += worse
+        return f"{value:>8.1f} {delta:>+6.0%}{'!' if worse else ' '}"
+
+    for scenario, endpoints in new["scenarios"].items():
+        print(scenario)
+        for label, stats in endpoints.items():
+            old = base["scenarios"].get(scenario, {}).get(label)
+            if old is None:
+                print(f"  {label:<50}{'(new endpoint)':>16}")
+                continue
+            old_queries, queries = old.get("queries_per_request"), stats.get("queries_per_request")
+            print(f"  {label:<50}{change(old['rps'], stats['rps'], higher_is_worse=False)}"
+                  f"  {change(old['p50_ms'], stats['p50_ms'])}  {change(old['p99_ms'], stats['p99_ms'])}"
+                  f"  {'-' if queries is None else f'{old_queries or 0:.1f} -> {queries:.1f}':>10}")
+    print(f"\n{regressions} change(s) worse than {threshold:.0%} marked with '!'")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pokemon", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--ratings", type=int, default=200000)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients per scenario")
+    parser.add_argument("--login-clients", type=int, default=16, help="concurrent clients in the login burst")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare two result files and exit")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help=f"with --compare, exit non-zero if anything is {REGRESSION_THRESHOLD * 100:.0f}%% worse")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    if args.compare:
+        regressions = compare(*args.compare)
+        sys.exit(1 if regressions and args.fail_on_regression else 0)
+
+    tmp = tempfile.mkdtemp(prefix="pokemon-rater-suite-")
+    # The app reads its settings at import time, so point it at the temp database first
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    os.environ.setdefault("MEDIA_CACHE_DIR", os.path.join(tmp, "media"))
+    try:
+        from app import database, migrate, models
+        from app.config import settings
+        from scripts.fake_pokeapi import BackgroundServer
+        from scripts.generate_data import BENCH_PASSWORD, generate
+        from scripts.import_csv import ensure_admin_user
+        from scripts.loadgen import login
+
+        migrate.upgrade(database.engine)
+        ensure_admin_user()
+        start = time.perf_counter()
+        with database.SessionLocal() as db:
+            counts = generate(db, args.pokemon, args.users, args.ratings, seed=args.seed)
+            names = db.scalars(select(models.Pokemon.name)).all()
+        print(f"Generated {counts['pokemon']} Pokemon, {counts['users']} users and {counts['ratings']} ratings "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        from app.main import app
+        engines = [database.engine, database.read_engine]
+        if settings.database_async:
+            engines.append(database.get_async_engine().sync_engine)
+        count_queries(*engines)
+
+        rng = random.Random(args.seed)
+        users = [f"user-{i}" for i in range(counts["users"])]
+        results = {
+            "commit": git_commit(),
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "fail_on_regression")},
+            "data": counts,
+            "scenarios": {},
+        }
+        with BackgroundServer(QueryCountMiddleware(app)) as server:
+            tokens = {}
+            for scenario_name in args.scenarios.split(","):
+                clients = args.login_clients if scenario_name == "login" else args.clients
+                if scenario_name == "rate":
+                    tokens.update((user, login(server.url, user, BENCH_PASSWORD)) for user in users[:clients])
+                scenario = Scenario(scenario_name, names, users, BENCH_PASSWORD, tokens, rng)
+                print(f"Running {scenario_name} with {clients} clients for {args.duration:.0f}s...")
+                results["scenarios"][scenario_name] = run_scenario(server.url, scenario, clients, args.duration)
+
+        print_report(results)
+        if args.output:
+            os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+            with open(args.output, "w") as handle:
+                json.dump(results, handle, indent=2)
+            print(f"\nSaved results to {args.output}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
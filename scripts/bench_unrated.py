@@ -0,0 +1,99 @@
+"""
+Compare the old NOT IN + ORDER BY random() unrated query with the sampler.
+
+Seeds a temporary SQLite database with synthetic Pokemon and ratings spread
+over several users, then times repeated "next unrated" lookups for one user,
+rating each returned Pokemon as rate.html does.
+
+    python scripts/bench_unrated.py [--pokemon 100000] [--ratings 100000] [--rounds 200]
+"""
+import argparse
+import random
+import statistics
+import sys
+import os
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, schemas
+from app.unrated import unrated_sampler
+
+USERS = ["admin", "ash", "misty", "brock"]
+
+
+def old_get_unrated_pokemon(db, limit=10):
+    """The previous implementation of crud.get_unrated_pokemon."""
+    rated_pokemon_ids = db.query(models.Rating.pokemon_id).distinct().all()
+    rated_ids = [row[0] for row in rated_pokemon_ids]
+    return db.query(models.Pokemon).filter(~models.Pokemon.id.in_(rated_ids)).order_by(func.random()).limit(limit).all()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(db, lookup, rounds, user_id):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        pokemon = lookup()
+        samples.append((time.perf_counter() - start) * 1000)
+        if pokemon:
+            crud.create_or_update_rating(db, schemas.RatingCreate(pokemon_id=pokemon[0].id, rating=5), user_id=user_id)
+    return statistics.median(samples), percentile(samples, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pokemon", type=int, default=100000)
+    parser.add_argument("--ratings", type=int, default=100000)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/unrated.db")
+        models.Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        db.execute(insert(models.Pokemon), [
+            {"name": f"pokemon-{i}", "dex_number": i, "type1": "normal", "generation": 1}
+            for i in range(1, args.pokemon + 1)
+        ])
+        pairs = set()
+        while len(pairs) < args.ratings:
+            pairs.add((rng.randint(1, args.pokemon), rng.choice(USERS)))
+        db.execute(insert(models.Rating), [
+            {"pokemon_id": pokemon_id, "user_id": user_id, "rating": rng.uniform(0, 10)}
+            for pokemon_id, user_id in pairs
+        ])
+        db.commit()
+
+        print(f"{args.pokemon} Pokemon, {args.ratings} ratings over {len(USERS)} users\n")
+        print(f"{'method':<10}{'p50 ms':>10}{'p99 ms':>10}")
+        old = run(db, lambda: old_get_unrated_pokemon(db, 1), args.rounds, "admin")
+        print(f"{'not in':<10}{old[0]:>10.3f}{old[1]:>10.3f}")
+
+        start = time.perf_counter()
+        unrated_sampler.sample(db, "admin", 1)
+        build_ms = (time.perf_counter() - start) * 1000
+        new = run(db, lambda: crud.get_unrated_pokemon(db, 1, user_id="admin"), args.rounds, "admin")
+        print(f"{'sampler':<10}{new[0]:>10.3f}{new[1]:>10.3f}   (first call builds pool: {build_ms:.1f} ms)")
+
+        samples = []
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            unrated_sampler.sample(db, "admin", 1)
+            samples.append((time.perf_counter() - start) * 1000)
+        print(f"{'ids only':<10}{statistics.median(samples):>10.3f}{percentile(samples, 99):>10.3f}   (no row fetch)")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Throughput scaling from 1 to N gunicorn workers, and cache coherence between them.
+
+Seeds a temporary database, then for each worker count starts the app with
+``gunicorn -c gunicorn.conf.py`` (a shared SQLite cache via ``CACHE_URL``)
+and drives a mix of catalogue, search, analytics and rating requests. After
+each run it warms ``/api/analytics/statistics`` on every worker, posts one
+rating and counts how many of the next statistics responses still show the
+old statistics: with the shared cache that is 0, with per-process caches
+(``--no-shared-cache``) any worker that did not handle the write answers
+stale until its TTL.
+
+Scaling is bounded by the machine's cores; on one core extra workers only add
+context switches.
+
+    python scripts/bench_workers.py [--workers 1,2,4] [--concurrency 32] [--duration 10]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.import_csv import parse_csv
+from scripts.loadgen import ROOT, AppServer, login, run_load, seeded_database, summarize
+
+
+def request_mix(names, token):
+    auth = {"Authorization": f"Bearer {token}"}
+
+    async def make_request(client, worker_id):
+        roll = random.random()
+        if roll < 0.25:
+            return "pokemon", await client.get(f"/api/pokemon/{random.choice(names)}")
+        if roll < 0.45:
+            return "list", await client.get("/api/pokemon?limit=20&order_by=dex_number")
+        if roll < 0.65:
+            return "search", await client.get(f"/api/pokemon/search/{random.choice(names)[:3]}")
+        if roll < 0.95:
+            return "analytics", await client.get(random.choice(
+                ["/api/analytics/statistics", "/api/analytics/top-rated", "/api/analytics/by-type/fire"]
+            ))
+        body = {"pokemon_id": random.randint(1, len(names)), "rating": round(random.uniform(0, 10), 1)}
+        return "rate", await client.post("/api/rate", json=body, headers=auth)
+
+    return make_request
+
+
+async def stale_after_write(url, token, requests):
+    """Statistics responses that still miss a rating posted just before them."""
+    auth = {"Authorization": f"Bearer {token}"}
+    # No keep-alive and concurrent requests, so every worker accepts some of them
+    limits = httpx.Limits(max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=url, timeout=30, limits=limits) as client:
+        async def statistics():
+            responses = await asyncio.gather(*(client.get("/api/analytics/statistics") for _ in range(requests)))
+            return [response.json() for response in responses]
+
+        before = (await statistics())[0]
+        unrated = (await client.get("/api/unrated-pokemon?limit=1", headers=auth)).json()
+        # An extreme rating changes the average even if the Pokemon turns out to be rated already
+        response = await client.post("/api/rate", json={"pokemon_id": unrated[0]["id"], "rating": 15.0}, headers=auth)
+        response.raise_for_status()
+        return sum(result == before for result in await statistics())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default=None, help="comma-separated worker counts (default 1,2,...,cores)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--no-shared-cache", action="store_true", help="leave CACHE_URL unset")
+    args = parser.parse_args()
+
+    cores = multiprocessing.cpu_count()
+    counts = ([int(n) for n in args.workers.split(",")] if args.workers
+              else sorted({1, 2, *range(2, cores + 1, 2), cores}))
+    names = [row["name"] for row in parse_csv()]
+    print(f"{cores} CPU cores; shared cache {'off' if args.no_shared_cache else 'on'}")
+    print(f"{'workers':>7}{'req/s':>10}{'scaling':>9}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}{'stale':>7}")
+    baseline = None
+    with seeded_database() as path, tempfile.TemporaryDirectory(prefix="pokemon-rater-cache-") as cache_dir:
+        for workers in counts:
+            cache_url = f"sqlite:///{os.path.join(cache_dir, f'cache-{workers}.db')}"
+            env = {"WEB_CONCURRENCY": str(workers), "GUNICORN_TIMEOUT": "120",
+                   "CACHE_URL": "" if args.no_shared_cache else cache_url}
+            server = AppServer(path, env=env)
+            server.command = [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"),
+                              "--bind", f"127.0.0.1:{server.port}", "--log-level", "warning", "app.main:app"]
+            with server:
+                token = login(server.url)
+                results, elapsed = asyncio.run(run_load(
+                    server.url, request_mix(names, token), concurrency=args.concurrency, duration=args.duration
+                ))
+                stale = asyncio.run(stale_after_write(server.url, token, requests=8 * workers))
+            latencies = [value for samples, _ in results.values() for value in samples]
+            errors = sum(errors for _, errors in results.values())
+            stats = summarize(latencies, elapsed, errors)
+            baseline = baseline or stats["rps"]
+            print(f"{workers:>7}{stats['rps']:>10.1f}{stats['rps'] / baseline:>8.2f}x{stats['p50_ms']:>9.2f}"
+                  f"{stats['p99_ms']:>9.2f}{stats['errors']:>8}{stale:>7}")
+
+
+if __name__ == "__main__":
+    main()
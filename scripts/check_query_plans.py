@@ -0,0 +1,113 @@
+"""
+Check that the hot rating queries use the intended indexes.
+
+Migrates a temporary SQLite database to head, fills it with synthetic data
+(see ``generate_data.py``), runs each crud function while capturing the SQL
+it issues, and checks the ``EXPLAIN QUERY PLAN`` of every captured SELECT:
+lines that must appear (the index the query is meant to use) and lines that
+must not (full scans of ratings, sorting into a temporary B-tree). Exits 1 if
+any plan does not match, so it can run in CI after schema changes. The same
+cases run under pytest in ``tests/test_query_plans.py``.
+
+    python scripts/check_query_plans.py [--verbose]
+"""
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+
+if __name__ == "__main__":
+    # Imported by the tests, which bring their own database
+    TEMP = tempfile.mkdtemp(prefix="pokemon-rater-plans-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEMP, 'plans.db')}"
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+from app import crud, migrate
+from app.database import SessionLocal, engine
+from scripts.generate_data import generate
+
+FULL_SCAN = r"^SCAN ratings\b"
+TEMP_SORT = r"USE TEMP B-TREE"
+
+# (label, call, plan lines that must match, plan lines that must not)
+CASES = [
+    ("rating by pokemon and user", lambda db: crud.get_rating_by_pokemon_and_user(db, 5, "user-1"),
+     [r"SEARCH ratings USING INDEX (sqlite_autoindex_ratings_1|uq_ratings_pokemon_user) \(pokemon_id=\? AND user_id=\?\)"],
+     [FULL_SCAN]),
+    ("top rated", lambda db: crud.get_top_rated_pokemon(db, 10),
+     [r"SCAN ratings USING INDEX ix_ratings_rating"], [TEMP_SORT]),
+    ("bottom rated", lambda db: crud.get_bottom_rated_pokemon(db, 10),
+     [r"SCAN ratings USING INDEX ix_ratings_rating"], [TEMP_SORT]),
+    ("ratings by type", lambda db: crud.get_ratings_by_type(db, "fire"),
+     [r"MULTI-INDEX OR", r"SEARCH ratings USING COVERING INDEX ix_ratings_pokemon_rating"],
+     [FULL_SCAN, r"^SCAN pokemon\b"]),
+    ("ratings by generation", lambda db: crud.get_ratings_by_generation(db, 3),
+     [r"SEARCH pokemon USING INDEX ix_pokemon_generation",
+      r"SEARCH ratings USING COVERING INDEX ix_ratings_pokemon_rating"],
+     [FULL_SCAN]),
+    ("unrated for user", lambda db: crud.get_unrated_pokemon(db, 10, user_id="user-2"),
+     [r"SEARCH ratings USING COVERING INDEX ix_ratings_user_rating \(user_id=\?\)"], [FULL_SCAN]),
+]
+
+
+def captured_selects(db, call):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        call(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    return statements
+
+
+def query_plan(db, statement, parameters):
+    rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return [row[-1] for row in rows]
+
+
+def check_plan(db, call, required, forbidden):
+    """``(plan lines, problems)`` for the SELECTs ``call(db)`` issues."""
+    plan = [line for statement, parameters in captured_selects(db, call)
+            for line in query_plan(db, statement, parameters)]
+    problems = [f"missing {pattern!r}" for pattern in required
+                if not any(re.search(pattern, line) for line in plan)]
+    problems += [f"unexpected {line!r}" for pattern in forbidden
+                 for line in plan if re.search(pattern, line)]
+    return plan, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    migrate.upgrade(engine)
+    failures = 0
+    with SessionLocal() as db:
+        generate(db, pokemon=1025, users=50, ratings=20000)
+        for label, call, required, forbidden in CASES:
+            plan, problems = check_plan(db, call, required, forbidden)
+            failures += bool(problems)
+            print(f"{'FAIL' if problems else 'ok  '} {label}")
+            for problem in problems:
+                print(f"       {problem}")
+            if args.verbose or problems:
+                for line in plan:
+                    print(f"       | {line}")
+    engine.dispose()
+    shutil.rmtree(TEMP, ignore_errors=True)
+    print(f"{failures} of {len(CASES)} query plans did not match")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Write brotli and gzip copies of the static assets for ``PrecompressedStaticFiles``.
+
+Compresses every text asset under ``static/`` at the highest level, once,
+instead of per request. Rerun after editing an asset; until then the app
+serves the uncompressed file, since the copies are older than it. brotli
+copies need ``pip install brotli``.
+
+    python scripts/compress_static.py [--directory static]
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.compression import STATIC_EXTENSIONS, compress_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--directory", default="static")
+    args = parser.parse_args()
+
+    for root, _, files in os.walk(args.directory):
+        for name in sorted(files):
+            if not name.endswith(STATIC_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            original = os.path.getsize(path)
+            sizes = ", ".join(f"{os.path.splitext(target)[1]} {os.path.getsize(target):,}"
+                              for target in compress_file(path))
+            print(f"{path}: {original:,} bytes -> {sizes}")
+
+
+if __name__ == "__main__":
+    main()
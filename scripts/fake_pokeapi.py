@@ -0,0 +1,168 @@
+"""
+Local stand-in for PokeAPI used by the benchmark scripts.
+
+Serves deterministic ``/pokemon/{name}`` and ``/pokemon-species/{name}``
+resources, plus a solid-colour PNG for any other path ending in ``.png`` so it
+can also stand in for the sprite host (``MEDIA_UPSTREAM_URL``). It records how many requests and distinct client connections it
+has seen, so callers can check connection reuse without touching the network.
+
+    python scripts/fake_pokeapi.py --port 8765
+"""
+import argparse
+import asyncio
+import socket
+import struct
+import threading
+import time
+import zlib
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+TYPES = [
+    "normal", "fire", "water", "grass", "electric", "ice", "fighting", "poison", "ground",
+    "flying", "psychic", "bug", "rock", "ghost", "dragon", "dark", "steel", "fairy",
+]
+
+
+class Stats:
+    def __init__(self):
+        self.requests = 0
+        self.connections = set()
+        self.lock = threading.Lock()
+
+    def record(self, request):
+        with self.lock:
+            self.requests += 1
+            self.connections.add(tuple(request.client))
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.connections = set()
+
+
+def png_bytes(width: int, height: int, rgb) -> bytes:
+    """A minimal solid-colour RGB PNG."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    raw = b"".join(b"\x00" + bytes(rgb) * width for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw))
+            + chunk(b"IEND", b""))
+
+
+def _dex_for(name: str) -> int:
+    return zlib.crc32(name.lower().encode()) % 1025 + 1
+
+
+def create_app(latency: float = 0.0, fail_every: int = 0):
+    """Build the stand-in app.
+
+    ``latency`` adds a fixed delay per request and ``fail_every`` makes every
+    Nth request return a 503, for exercising retries.
+    """
+    stats = Stats()
+
+    async def maybe_delay_or_fail(request):
+        stats.record(request)
+        if latency:
+            await asyncio.sleep(latency)
+        if fail_every and stats.requests % fail_every == 0:
+            return JSONResponse({"detail": "unavailable"}, status_code=503)
+        return None
+
+    async def pokemon(request):
+        error = await maybe_delay_or_fail(request)
+        if error:
+            return error
+        name = request.path_params["name"]
+        if name.startswith("missingno"):
+            return JSONResponse({"detail": "Not found."}, status_code=404)
+        dex = _dex_for(name)
+        types = [{"slot": 1, "type": {"name": TYPES[dex % len(TYPES)]}}]
+        if dex % 2:
+            types.append({"slot": 2, "type": {"name": TYPES[(dex * 7) % len(TYPES)]}})
+        return JSONResponse({
+            "id": dex,
+            "name": name,
+            "types": types,
+            "sprites": {
+                "front_default": f"{request.base_url}sprites/{dex}.png",
+                "other": {"official-artwork": {"front_default": f"{request.base_url}sprites/artwork/{dex}.png"}},
+            },
+        })
+
+    async def species(request):
+        error = await maybe_delay_or_fail(request)
+        if error:
+            return error
+        name = request.path_params["name"]
+        if name.startswith("missingno"):
+            return JSONResponse({"detail": "Not found."}, status_code=404)
+        generation = _dex_for(name) % 9 + 1
+        return JSONResponse({
+            "name": name,
+            "generation": {"name": f"generation-{generation}", "url": f"{request.base_url}generation/{generation}/"},
+        })
+
+    async def image(request):
+        error = await maybe_delay_or_fail(request)
+        if error:
+            return error
+        path = request.path_params["path"]
+        if not path.endswith(".png") or "missing" in path:
+            return JSONResponse({"detail": "Not found."}, status_code=404)
+        seed = zlib.crc32(path.encode())
+        size = 475 if "artwork" in path else 96
+        return Response(png_bytes(size, size, (seed & 255, seed >> 8 & 255, seed >> 16 & 255)), media_type="image/png")
+
+    app = Starlette(routes=[
+        Route("/pokemon/{name}", pokemon),
+        Route("/pokemon-species/{name}", species),
+        Route("/{path:path}", image),
+    ])
+    app.state.stats = stats
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class BackgroundServer:
+    """Run an ASGI app with uvicorn on a background thread."""
+
+    def __init__(self, app, port: int = 0):
+        self.app = app
+        self.port = port or free_port()
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(create_app(latency=args.latency), host="127.0.0.1", port=args.port)
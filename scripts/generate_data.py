@@ -0,0 +1,125 @@
+"""
+Generate a synthetic catalogue, users and ratings for benchmarking.
+
+Starts from the real Pokemon in the CSV and adds made-up ones (names spliced
+from two real names, so prefix searches behave like the real catalogue) until
+the catalogue has ``--pokemon`` entries. Then creates ``--users`` accounts
+named ``user-0``, ``user-1``, ... that share ``--password``, gives each a
+random sample of ratings until ``--ratings`` exist, and rebuilds the
+aggregates and rankings. Like ``import_csv.py`` it writes to ``DATABASE_URL``
+and creates the admin user from settings::
+
+    DATABASE_URL=sqlite:///data/bench.db python scripts/generate_data.py --pokemon 5000 --ratings 500000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from app import aggregates, migrate, models, rankings
+from app.auth import get_password_hash
+from app.catalogue import bump_version
+from app.database import SessionLocal, engine
+from scripts.import_csv import CSV_FILE, ensure_admin_user, parse_csv
+
+BATCH_SIZE = 50000
+BENCH_PASSWORD = "bench-password"
+
+
+def synthetic_pokemon(rows, count: int, rng: random.Random):
+    """``rows`` followed by made-up Pokemon up to ``count`` entries in total."""
+    catalogue = [row for row in rows if row["dex_number"]][:count]
+    names = {row["name"] for row in catalogue}
+    real = list(catalogue)
+    dex = max((row["dex_number"] for row in catalogue), default=0)
+    while len(catalogue) < count:
+        first, second = rng.sample(real, 2)
+        name = first["name"][:max(2, len(first["name"]) // 2)] + second["name"][len(second["name"]) // 2:].lower()
+        while name in names:
+            name += rng.choice("aeiouxyz")
+        names.add(name)
+        dex += 1
+        catalogue.append({
+            "name": name,
+            "dex_number": dex,
+            "type1": first["type1"],
+            "type2": second["type1"] if rng.random() < 0.5 else None,
+            "generation": rng.choice((first["generation"], second["generation"])),
+            "sprite_url": first["sprite_url"],
+            "artwork_url": second["artwork_url"],
+        })
+    return catalogue
+
+
+def generate(db: Session, pokemon: int = 1025, users: int = 100, ratings: int = 50000,
+             password: str = BENCH_PASSWORD, csv_file: str = CSV_FILE, seed: int = 0) -> dict:
+    """Fill an empty database with ``pokemon`` Pokemon, ``users`` users and ``ratings`` ratings."""
+    rng = random.Random(seed)
+    catalogue = synthetic_pokemon(parse_csv(csv_file), pokemon, rng)
+    fields = ("name", "dex_number", "type1", "type2", "generation", "sprite_url", "artwork_url")
+    db.execute(insert(models.Pokemon), [{field: row[field] for field in fields} for row in catalogue])
+    bump_version(db)
+
+    # Hashing is deliberately slow, so every bench user shares one hash
+    hashed_password = get_password_hash(password)
+    db.execute(insert(models.User), [
+        {"username": f"user-{i}", "hashed_password": hashed_password, "is_active": True} for i in range(users)
+    ])
+
+    pokemon_ids = db.scalars(select(models.Pokemon.id)).all()
+    per_user = min(len(pokemon_ids), -(-ratings // max(users, 1)))
+    batch, created = [], 0
+    for i in range(users):
+        # Each user has their own taste, so per-Pokemon averages spread out
+        bias = rng.gauss(0, 1.5)
+        for pokemon_id in rng.sample(pokemon_ids, min(per_user, ratings - created)):
+            batch.append({"pokemon_id": pokemon_id, "user_id": f"user-{i}",
+                          "rating": round(min(15, max(-5, rng.gauss(5 + bias, 2.5))), 1)})
+            created += 1
+        if len(batch) >= BATCH_SIZE:
+            db.execute(insert(models.Rating), batch)
+            batch = []
+    if batch:
+        db.execute(insert(models.Rating), batch)
+
+    aggregates.rebuild(db)
+    rankings.rebuild(db)
+    db.commit()
+    return {
+        "pokemon": db.scalar(select(func.count(models.Pokemon.id))),
+        "users": users,
+        "ratings": db.scalar(select(func.count(models.Rating.id))),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pokemon", type=int, default=1025, help="catalogue size (the CSV has 1,025)")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--ratings", type=int, default=50000, help="total ratings, spread across users")
+    parser.add_argument("--password", default=BENCH_PASSWORD, help="password shared by the generated users")
+    parser.add_argument("--csv", default=CSV_FILE)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    migrate.upgrade(engine)
+    ensure_admin_user()
+    db = SessionLocal()
+    try:
+        if db.scalar(select(func.count(models.Pokemon.id))):
+            sys.exit("DATABASE_URL already has Pokemon; generate into an empty database")
+        start = time.perf_counter()
+        counts = generate(db, args.pokemon, args.users, args.ratings, args.password, args.csv, args.seed)
+        print(f"Generated {counts['pokemon']} Pokemon, {counts['users']} users and "
+              f"{counts['ratings']} ratings in {time.perf_counter() - start:.1f}s")
+    finally:
+        db.close()
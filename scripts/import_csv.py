@@ -1,32 +1,45 @@
+import argparse
 import csv
+import json
+import random
 import sys
 import os
+import time
 import asyncio
+from contextlib import nullcontext
 from pathlib import Path
 
 # Add the parent directory to the path so we can import from app
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from sqlalchemy import insert, select, update
 from sqlalchemy.orm import Session
 from app.database import SessionLocal, engine
-from app import models, crud, schemas
+from app import aggregates, migrate, models, crud, rankings, schemas
 from app.auth import get_password_hash
+from app.catalogue import bump_version
+from app.config import settings
+from app.instrumentation import instrument_engine, track
+from app.media import catalogue_media, media_cache
+from app.services.pokeapi import PokeAPIService, is_transient_error
 
 
+CSV_FILE = 'Pokemon4Elise.csv'
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_CHECKPOINT = 'data/enrich_checkpoint.json'
+DEFAULT_CONCURRENCY = 16
+ENRICHED_FIELDS = ('type1', 'type2', 'generation', 'sprite_url', 'artwork_url')
 
+# Map regions to generations
+REGION_TO_GEN = {
+    'Kanto': 1, 'Johto': 2, 'Hoenn': 3, 'Sinnoh': 4,
+    'Unova': 5, 'Kalos': 6, 'Alola': 7, 'Galar': 8,
+    'Hisui': 8, 'Paldea': 9
+}
 
 
-def import_pokemon_data():
-    """Import Pokemon data from CSV."""
-    print("Starting Pokemon data import...")
-    
-    # Ensure data directory exists
-    Path("data").mkdir(exist_ok=True)
-    
-    # Create database tables
-    models.Base.metadata.create_all(bind=engine)
-    
-    # Create admin user
+def ensure_admin_user():
+    """Create the admin user from settings if it does not exist yet."""
     db = SessionLocal()
     try:
         from app.config import settings
@@ -45,107 +58,433 @@ def import_pokemon_data():
         print(f"Error creating admin user: {e}")
     finally:
         db.close()
-    
+
+
+def parse_csv(csv_file: str = CSV_FILE):
+    """Parse the ratings spreadsheet into a list of row dicts in one pass.
+
+    Each row has the Pokemon columns plus ``rating`` (float or None) and
+    ``comment``. Rows without a name are skipped and unparseable ratings are
+    reported and dropped.
+    """
+    rows = []
+    with open(csv_file, 'r', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        next(reader)  # Skip header row
+
+        for row in reader:
+            if len(row) < 7:
+                continue
+
+            dex, region, name, rating, type1, type2, comments = row[:7]
+
+            # Skip empty names
+            if not name or name.strip() == '':
+                continue
+            name = name.strip()
+
+            try:
+                dex_num = int(dex) if dex and dex.strip() else None
+            except ValueError:
+                dex_num = None
+
+            # Generate sprite URLs based on dex number
+            sprite_url = None
+            artwork_url = None
+            if dex_num:
+                sprite_url = f"https://raw.githubusercontent.com/PokeAPI/sprites/master/sprites/pokemon/{dex_num}.png"
+                artwork_url = f"https://raw.githubusercontent.com/PokeAPI/sprites/master/sprites/pokemon/other/official-artwork/{dex_num}.png"
+
+            rating_value = None
+            if rating and rating.strip():
+                try:
+                    rating_value = float(rating)
+                except ValueError:
+                    print(f"Invalid rating for {name}: {rating}")
+
+            comment = comments.strip() if comments and comments.strip() else None
+            if comment and comment.lower() in ['nan', '']:
+                comment = None
+
+            rows.append({
+                'name': name,
+                'dex_number': dex_num,
+                'type1': type1.lower().strip() if type1 and type1.strip() else 'normal',
+                'type2': type2.lower().strip() if type2 and type2.strip() else None,
+                'generation': REGION_TO_GEN.get(region, 1),
+                'sprite_url': sprite_url,
+                'artwork_url': artwork_url,
+                'rating': rating_value,
+                'comment': comment,
+            })
+    return rows
+
+
+def report_progress(stage: str, done: int, total: int):
+    print(f"  {stage}: {done}/{total}")
+
+
+def _batches(items, batch_size):
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+
+def import_rows_rowwise(db: Session, rows, user_id: str = "admin"):
+    """Import parsed rows one at a time through the regular crud functions.
+
+    This is the original import path: a lookup, commit and refresh per row.
+    It is kept for comparison with :func:`import_rows_bulk`.
+    """
+    pokemon_count = 0
+    rating_count = 0
+    for row in rows:
+        try:
+            pokemon_data = {key: row[key] for key in schemas.PokemonCreate.model_fields}
+
+            # Check if Pokemon already exists or create it
+            pokemon_obj = crud.get_pokemon_by_name(db, row['name'])
+            if not pokemon_obj:
+                pokemon_obj = crud.create_pokemon(db, schemas.PokemonCreate(**pokemon_data))
+                pokemon_count += 1
+
+            # Create rating if it exists
+            if row['rating'] is not None:
+                rating_data = schemas.RatingCreate(
+                    pokemon_id=pokemon_obj.id,
+                    rating=row['rating'],
+                    comment=row['comment']
+                )
+                crud.create_or_update_rating(db, rating_data, user_id=user_id)
+                rating_count += 1
+        except Exception as e:
+            db.rollback()
+            print(f"Error processing {row['name']}: {e}")
+    return pokemon_count, rating_count
+
+
+def import_rows_bulk(db: Session, rows, user_id: str = "admin",
+                     batch_size: int = DEFAULT_BATCH_SIZE, progress=report_progress):
+    """Import parsed rows with batched statements in a single transaction.
+
+    Existing Pokemon and ratings are resolved up front with one query each,
+    new Pokemon and ratings are written with executemany inserts and existing
+    ratings with a bulk update by primary key, so re-running the import
+    against a seeded database only refreshes ratings and comments. Every
+    rating written is logged to ``rating_events`` in the same transaction, as
+    the app does, so running apps and ``/api/events`` pick the changes up.
+    """
+    pokemon_fields = list(schemas.PokemonCreate.model_fields)
+
+    name_to_id = dict(db.execute(select(models.Pokemon.name, models.Pokemon.id)).all())
+
+    new_pokemon = []
+    seen = set(name_to_id)
+    for row in rows:
+        if row['name'] not in seen:
+            seen.add(row['name'])
+            new_pokemon.append({key: row[key] for key in pokemon_fields})
+
+    done = 0
+    for batch in _batches(new_pokemon, batch_size):
+        db.execute(insert(models.Pokemon), batch)
+        done += len(batch)
+        progress("pokemon", done, len(new_pokemon))
+
+    if new_pokemon:
+        # Running apps reload their in-memory catalogue when they see the new version
+        bump_version(db)
+        name_to_id = dict(db.execute(select(models.Pokemon.name, models.Pokemon.id)).all())
+
+    existing_ratings = {
+        row.pokemon_id: row for row in db.execute(
+            select(models.Rating.pokemon_id, models.Rating.id, models.Rating.rating)
+            .where(models.Rating.user_id == user_id)
+        ).all()
+    }
+
+    # Later rows for the same Pokemon win, as with the row-by-row path
+    rated = {}
+    for row in rows:
+        if row['rating'] is not None:
+            rated[name_to_id[row['name']]] = row
+
+    new_ratings = []
+    updated_ratings = []
+    for pokemon_id, row in rated.items():
+        values = {'rating': row['rating'], 'comment': row['comment']}
+        if pokemon_id in existing_ratings:
+            updated_ratings.append({'id': existing_ratings[pokemon_id].id, **values})
+        else:
+            new_ratings.append({'pokemon_id': pokemon_id, 'user_id': user_id, **values})
+
+    done = 0
+    total = len(new_ratings) + len(updated_ratings)
+    for batch in _batches(new_ratings, batch_size):
+        db.execute(insert(models.Rating), batch)
+        done += len(batch)
+        progress("ratings", done, total)
+    for batch in _batches(updated_ratings, batch_size):
+        db.execute(update(models.Rating), batch)
+        done += len(batch)
+        progress("ratings", done, total)
+    events = [
+        {'pokemon_id': pokemon_id, 'user_id': user_id, 'rating': row['rating'],
+         'old_rating': existing_ratings[pokemon_id].rating if pokemon_id in existing_ratings else None}
+        for pokemon_id, row in rated.items()
+    ]
+    for batch in _batches(events, batch_size):
+        db.execute(insert(models.RatingEvent), batch)
+
+    aggregates.rebuild(db)
+    rankings.rebuild(db)
+    db.commit()
+    return len(new_pokemon), total
+
+
+def pokeapi_key(row) -> str:
+    """PokeAPI lookup key for a row: the dex number, or a slug of the name."""
+    if row['dex_number']:
+        return str(row['dex_number'])
+    slug = row['name'].lower().replace('♀', '-f').replace('♂', '-m')
+    for char in ".':":
+        slug = slug.replace(char, '')
+    return '-'.join(slug.split())
+
+
+def load_checkpoint(path: str):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_checkpoint(path: str, results):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f)
+    os.replace(tmp_path, path)
+
+
+async def fetch_with_retry(service: PokeAPIService, key: str, retries: int = 4, backoff: float = 0.5):
+    """Fetch complete data for ``key``, retrying network and 5xx errors with exponential backoff.
+
+    Other errors (4xx responses, malformed data) are permanent and raised at once.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return await service.get_pokemon_complete_data(key, raise_errors=True)
+        except Exception as e:
+            if attempt == retries or not is_transient_error(e):
+                raise
+            await asyncio.sleep(backoff * (2 ** attempt) * (1 + random.random()))
+
+
+async def enrich_rows(rows, service: PokeAPIService, concurrency: int = DEFAULT_CONCURRENCY,
+                      checkpoint_path: str = DEFAULT_CHECKPOINT, retries: int = 4,
+                      checkpoint_every: int = 50, progress=report_progress):
+    """Fetch PokeAPI data for every row with bounded concurrency.
+
+    Results are keyed by :func:`pokeapi_key` and written to ``checkpoint_path``
+    every ``checkpoint_every`` completions and on exit, so an interrupted run
+    only fetches what is still missing. Lookups that keep failing are left out
+    of the checkpoint and retried on the next run. Returns
+    ``(results, fetched, failed)``.
+    """
+    results = load_checkpoint(checkpoint_path) if checkpoint_path else {}
+    pending = list(dict.fromkeys(key for key in map(pokeapi_key, rows) if key not in results))
+    if len(pending) < len(rows):
+        print(f"Resuming from checkpoint: {len(rows) - len(pending)} already enriched")
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for key in pending:
+        queue.put_nowait(key)
+    counters = {'done': 0, 'failed': 0}
+
+    async def worker():
+        while True:
+            try:
+                key = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                results[key] = await fetch_with_retry(service, key, retries=retries)
+            except Exception as e:
+                counters['failed'] += 1
+                print(f"Giving up on {key}: {e}")
+            counters['done'] += 1
+            if counters['done'] % checkpoint_every == 0:
+                progress("enrich", counters['done'], len(pending))
+                if checkpoint_path:
+                    save_checkpoint(checkpoint_path, results)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, len(pending)) or 1)))
+    finally:
+        if checkpoint_path:
+            save_checkpoint(checkpoint_path, results)
+    return results, counters['done'] - counters['failed'], counters['failed']
+
+
+def apply_enrichment(db: Session, rows, results, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Write enriched fields back to the pokemon table with a bulk update by primary key."""
+    pokemon = {
+        row.name: row for row in db.execute(
+            select(models.Pokemon.id, models.Pokemon.name, models.Pokemon.dex_number)
+        ).all()
+    }
+    used_dex = {row.dex_number for row in pokemon.values() if row.dex_number}
+
+    updates = []
+    for row in rows:
+        data = results.get(pokeapi_key(row))
+        existing = pokemon.get(row['name'])
+        if not data or not existing:
+            continue
+        values = {'id': existing.id}
+        values.update({field: data[field] for field in ENRICHED_FIELDS})
+        if not existing.dex_number and data['dex_number'] not in used_dex:
+            values['dex_number'] = data['dex_number']
+            used_dex.add(data['dex_number'])
+        updates.append(values)
+
+    # Rows in one executemany batch must share the same keys
+    with_dex = [values for values in updates if 'dex_number' in values]
+    without_dex = [values for values in updates if 'dex_number' not in values]
+    for group in (with_dex, without_dex):
+        for batch in _batches(group, batch_size):
+            db.execute(update(models.Pokemon), batch)
+    if updates:
+        # Types and generation feed the aggregate scopes, so running apps must not keep the old records
+        bump_version(db)
+    aggregates.rebuild(db)
+    rankings.rebuild(db)
+    db.commit()
+    return len(updates)
+
+
+async def run_enrichment(rows, concurrency: int = DEFAULT_CONCURRENCY,
+                         checkpoint_path: str = DEFAULT_CHECKPOINT, retries: int = 4,
+                         base_url: str = None):
+    service = PokeAPIService(base_url=base_url, max_connections=concurrency * 2, concurrency=concurrency * 2)
+    await service.start()
+    try:
+        return await enrich_rows(rows, service, concurrency=concurrency,
+                                 checkpoint_path=checkpoint_path, retries=retries)
+    finally:
+        await service.close()
+
+
+def enrich_pokemon_data(db: Session, rows, concurrency: int = DEFAULT_CONCURRENCY,
+                        checkpoint_path: str = DEFAULT_CHECKPOINT, retries: int = 4,
+                        batch_size: int = DEFAULT_BATCH_SIZE, base_url: str = None):
+    """Enrichment stage: fetch PokeAPI data for all rows, then write it in one bulk update."""
+    print(f"Enriching {len(rows)} Pokemon from PokeAPI (concurrency {concurrency})...")
+    start = time.perf_counter()
+    results, fetched, failed = asyncio.run(run_enrichment(
+        rows, concurrency=concurrency, checkpoint_path=checkpoint_path, retries=retries, base_url=base_url
+    ))
+    fetch_time = time.perf_counter() - start
+    updated = apply_enrichment(db, rows, results, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+
+    throughput = fetched / fetch_time if fetch_time else 0
+    print(f"Enriched {updated} Pokemon ({fetched} fetched, {failed} failed)")
+    print(f"Fetch throughput: {throughput:.1f} Pokemon/sec, total wall time {elapsed:.2f}s")
+    return updated
+
+
+def prefetch_media(db: Session):
+    """Download every sprite and artwork into the local media cache."""
+    sources = catalogue_media(crud.get_media_sources(db))
+    print(f"Prefetching {len(sources)} images into {media_cache.root}...")
+    start = time.perf_counter()
+
+    async def run():
+        try:
+            return await media_cache.prefetch(sources)
+        finally:
+            await media_cache.close()
+
+    counts = asyncio.run(run())
+    print(f"Media: {counts['fetched']} fetched, {counts['cached']} already cached, "
+          f"{counts['failed']} failed in {time.perf_counter() - start:.2f}s")
+    return counts
+
+
+def import_pokemon_data(csv_file: str = CSV_FILE, mode: str = "bulk",
+                        batch_size: int = DEFAULT_BATCH_SIZE, enrich: bool = False,
+                        concurrency: int = DEFAULT_CONCURRENCY,
+                        checkpoint_path: str = DEFAULT_CHECKPOINT, media: bool = False):
+    """Import Pokemon data from CSV."""
+    print("Starting Pokemon data import...")
+
+    # Ensure data directory exists
+    Path("data").mkdir(exist_ok=True)
+
+    # Create or migrate the database tables
+    migrate.upgrade(engine)
+
+    ensure_admin_user()
+
     # Read CSV file
-    csv_file = 'Pokemon4Elise.csv'
     if not os.path.exists(csv_file):
         print(f"Error: {csv_file} not found!")
         return
-    
-    # Map regions to generations
-    region_to_gen = {
-        'Kanto': 1, 'Johto': 2, 'Hoenn': 3, 'Sinnoh': 4,
-        'Unova': 5, 'Kalos': 6, 'Alola': 7, 'Galar': 8,
-        'Hisui': 8, 'Paldea': 9
-    }
-    
+
+    rows = parse_csv(csv_file)
+    print(f"Parsed {len(rows)} rows from {csv_file}")
+
+    if settings.instrumentation_enabled:
+        instrument_engine(engine)
+    start = time.perf_counter()
     db = SessionLocal()
     try:
-        pokemon_count = 0
-        rating_count = 0
-        
-        with open(csv_file, 'r', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            headers = next(reader)  # Skip header row
-            
-            for row in reader:
-                try:
-                    if len(row) < 7:
-                        continue
-                        
-                    dex, region, name, rating, type1, type2, comments = row[:7]
-                    
-                    # Skip empty names
-                    if not name or name.strip() == '':
-                        continue
-                    
-                    name = name.strip()
-                    print(f"Processing {name}...")
-                    
-                    # Get data
-                    try:
-                        dex_num = int(dex) if dex and dex.strip() else None
-                    except ValueError:
-                        dex_num = None
-                        
-                    generation = region_to_gen.get(region, 1)
-                    type1 = type1.lower().strip() if type1 and type1.strip() else 'normal'
-                    type2 = type2.lower().strip() if type2 and type2.strip() else None
-                    
-                    # Generate sprite URLs based on dex number
-                    sprite_url = None
-                    artwork_url = None
-                    if dex_num:
-                        sprite_url = f"https://raw.githubusercontent.com/PokeAPI/sprites/master/sprites/pokemon/{dex_num}.png"
-                        artwork_url = f"https://raw.githubusercontent.com/PokeAPI/sprites/master/sprites/pokemon/other/official-artwork/{dex_num}.png"
-                    
-                    # Create Pokemon entry
-                    pokemon_data = {
-                        'name': name,
-                        'dex_number': dex_num,
-                        'type1': type1,
-                        'type2': type2,
-                        'generation': generation,
-                        'sprite_url': sprite_url,
-                        'artwork_url': artwork_url
-                    }
-                    
-                    # Check if Pokemon already exists or create it
-                    pokemon_obj = crud.get_pokemon_by_name(db, name)
-                    if not pokemon_obj:
-                        pokemon_schema = schemas.PokemonCreate(**pokemon_data)
-                        pokemon_obj = crud.create_pokemon(db, pokemon_schema)
-                        pokemon_count += 1
-                    
-                    # Create rating if it exists
-                    if rating and rating.strip():
-                        try:
-                            rating_value = float(rating)
-                            comment = comments.strip() if comments and comments.strip() else None
-                            if comment and comment.lower() in ['nan', '']:
-                                comment = None
-                            
-                            rating_data = schemas.RatingCreate(
-                                pokemon_id=pokemon_obj.id if pokemon_obj else None,
-                                rating=rating_value,
-                                comment=comment
-                            )
-                            crud.create_or_update_rating(db, rating_data, user_id="admin")
-                            rating_count += 1
-                        except ValueError:
-                            print(f"Invalid rating for {name}: {rating}")
-                    
-                except Exception as e:
-                    print(f"Error processing row: {e}")
-                    continue
-        
-        print(f"\nImport completed!")
+        aggregates.ensure_built(db)
+        rankings.ensure_built(db)
+        with track(f"import ({mode})") if settings.instrumentation_enabled else nullcontext():
+            if mode == "rowwise":
+                pokemon_count, rating_count = import_rows_rowwise(db, rows)
+            else:
+                pokemon_count, rating_count = import_rows_bulk(db, rows, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+
+        print(f"\nImport completed in {elapsed:.2f}s ({mode})")
         print(f"Pokemon imported: {pokemon_count}")
         print(f"Ratings imported: {rating_count}")
-        
+
+        if enrich:
+            enrich_pokemon_data(db, rows, concurrency=concurrency,
+                                checkpoint_path=checkpoint_path, batch_size=batch_size)
+        if media:
+            prefetch_media(db)
     finally:
         db.close()
 
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Import Pokemon and ratings from the CSV export.")
+    parser.add_argument("--csv", default=CSV_FILE, help="CSV file to import")
+    parser.add_argument("--mode", choices=["bulk", "rowwise"], default="bulk",
+                        help="bulk: batched single transaction; rowwise: one commit per row")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="rows per executemany batch in bulk mode")
+    parser.add_argument("--enrich", action="store_true",
+                        help="fetch types, generation and artwork from PokeAPI after importing")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="concurrent PokeAPI lookups during enrichment")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT,
+                        help="file used to resume an interrupted enrichment run")
+    parser.add_argument("--prefetch-media", action="store_true",
+                        help="download all sprites and artwork into the local media cache")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    import_pokemon_data()
\ No newline at end of file
+    args = parse_args()
+    import_pokemon_data(args.csv, mode=args.mode, batch_size=args.batch_size, enrich=args.enrich,
+                        concurrency=args.concurrency, checkpoint_path=args.checkpoint,
+                        media=args.prefetch_media)
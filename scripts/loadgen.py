@@ -0,0 +1,144 @@
+"""
+Helpers shared by the HTTP load-test scripts.
+
+``seeded_database`` imports the CSV into a throwaway SQLite file,
+``AppServer`` runs the app with uvicorn in a subprocess against it, and
+``run_load`` drives it from a pool of concurrent httpx clients for a fixed
+duration, collecting per-request latencies.
+"""
+import asyncio
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from scripts.fake_pokeapi import free_port
+
+
+@contextmanager
+def seeded_database(extra_env: Optional[Dict[str, str]] = None):
+    """Yield the path of a temporary SQLite database seeded from the CSV."""
+    tmp = tempfile.mkdtemp(prefix="pokemon-rater-bench-")
+    path = os.path.join(tmp, "bench.db")
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{path}", **(extra_env or {})}
+    try:
+        subprocess.run(
+            [sys.executable, os.path.join(ROOT, "scripts", "import_csv.py"),
+             "--csv", os.path.join(ROOT, "Pokemon4Elise.csv")],
+            cwd=tmp, env=env, check=True, stdout=subprocess.DEVNULL,
+        )
+        yield path
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+class AppServer:
+    """Run ``app.main:app`` under uvicorn in a subprocess."""
+
+    def __init__(self, database_path: str, env: Optional[Dict[str, str]] = None,
+                 workers: int = 1, port: int = 0, command: Optional[List[str]] = None):
+        self.port = port or free_port()
+        self.env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{database_path}",
+            **(env or {}),
+        }
+        self.command = command or [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(self.port),
+            "--workers", str(workers), "--log-level", "warning",
+        ]
+        self.process = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.process = subprocess.Popen(self.command, cwd=ROOT, env=self.env)
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("server exited during startup")
+            try:
+                httpx.get(f"{self.url}/login", timeout=1)
+                return self
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        raise RuntimeError("server did not start within 60s")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def login(base_url: str, username: str = "admin", password: str = "admin123") -> str:
+    response = httpx.post(f"{base_url}/token", data={"username": username, "password": password}, timeout=30)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(latencies: List[float], elapsed: float, errors: int = 0) -> Dict[str, float]:
+    """Throughput and latency percentiles (ms) for one run."""
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+async def run_load(base_url: str, make_request: Callable, concurrency: int = 16,
+                   duration: float = 10.0, headers: Optional[Dict[str, str]] = None):
+    """Issue requests from ``concurrency`` workers for ``duration`` seconds.
+
+    ``make_request(client, worker_id)`` performs one request and returns
+    ``(label, response)``. Returns ``{label: (latencies, errors)}`` and the
+    elapsed wall time.
+    """
+    results: Dict[str, list] = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60, headers=headers) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker(worker_id):
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    label, response = await make_request(client, worker_id)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    label, ok = "error", False
+                latencies, errors = results.setdefault(label, [[], 0])
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    results[label][1] = errors + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return {label: (latencies, errors) for label, (latencies, errors) in results.items()}, elapsed
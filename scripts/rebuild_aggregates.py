@@ -0,0 +1,41 @@
+"""
+Rebuild or verify the precomputed rating aggregates and community rankings.
+
+    python scripts/rebuild_aggregates.py           # recompute from ratings
+    python scripts/rebuild_aggregates.py --check   # report drift, exit 1 if any
+"""
+import argparse
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import aggregates, migrate, rankings
+from app.database import SessionLocal, engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="only compare stored aggregates with the ratings")
+    args = parser.parse_args()
+
+    migrate.upgrade(engine)
+    db = SessionLocal()
+    try:
+        if args.check:
+            problems = aggregates.check_consistency(db) + rankings.check_consistency(db)
+            for problem in problems:
+                print(problem)
+            print(f"{len(problems)} inconsistencies found")
+            sys.exit(1 if problems else 0)
+
+        scopes = aggregates.rebuild(db)
+        ranking_rows = rankings.rebuild(db)
+        db.commit()
+        print(f"Rebuilt aggregates for {scopes} scopes and {ranking_rows} ranking rows")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Shared test setup.
+
+The app reads its settings when it is imported, so the database is pointed at
+a temporary SQLite file before anything from ``app`` is imported. The
+``seeded`` fixture migrates it and fills it with a small synthetic catalogue
+(see ``scripts/generate_data.py``) once per session.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMP = tempfile.mkdtemp(prefix="pokemon-rater-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEMP, 'test.db')}"
+os.environ.pop("CACHE_URL", None)
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def seeded():
+    from app import migrate
+    from app.database import SessionLocal, engine
+    from scripts.generate_data import generate
+
+    migrate.prepare(engine)
+    with SessionLocal() as db:
+        generate(db, pokemon=1025, users=5, ratings=5000)
+
+
+@pytest.fixture
+def temp_dir():
+    path = tempfile.mkdtemp(dir=TEMP)
+    yield path
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if "app.database" in sys.modules:
+        sys.modules["app.database"].engine.dispose()
+    shutil.rmtree(TEMP, ignore_errors=True)
@@ -0,0 +1,96 @@
+"""ETag revalidation and write-driven invalidation of the cached analytics responses."""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import models
+from app.cache import analytics_cache
+from app.database import SessionLocal
+from app.main import app, cached_body
+
+
+@pytest.fixture
+def client(seeded):
+    with TestClient(app) as client:
+        analytics_cache.clear()
+        yield client
+
+
+@pytest.fixture
+def auth(client):
+    response = client.post("/token", data={"username": "admin", "password": "admin123"})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def single_type_pokemon(pokemon_type: str) -> models.Pokemon:
+    with SessionLocal() as db:
+        return db.query(models.Pokemon).filter(
+            models.Pokemon.type1 == pokemon_type, models.Pokemon.type2.is_(None)
+        ).first()
+
+
+def test_unchanged_response_revalidates_with_304(client):
+    first = client.get("/api/analytics/statistics")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    second = client.get("/api/analytics/statistics", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.headers["ETag"] == etag
+    assert second.content == b""
+    assert analytics_cache.stats()["hits"] >= 1
+
+
+def test_rating_invalidates_cached_statistics(client, auth):
+    first = client.get("/api/analytics/statistics")
+    pokemon = single_type_pokemon("fire")
+    client.post("/api/rate", json={"pokemon_id": pokemon.id, "rating": 123.0}, headers=auth).raise_for_status()
+
+    after = client.get("/api/analytics/statistics", headers={"If-None-Match": first.headers["ETag"]})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != first.headers["ETag"]
+    assert after.json() != first.json()
+
+
+def test_rating_only_invalidates_affected_types(client, auth):
+    fire = client.get("/api/analytics/by-type/fire")
+    water = client.get("/api/analytics/by-type/water")
+    pokemon = single_type_pokemon("fire")
+    client.post("/api/rate", json={"pokemon_id": pokemon.id, "rating": -7.5}, headers=auth).raise_for_status()
+
+    misses = analytics_cache.stats()["misses"]
+    water_after = client.get("/api/analytics/by-type/water", headers={"If-None-Match": water.headers["ETag"]})
+    assert water_after.status_code == 304
+    assert analytics_cache.stats()["misses"] == misses
+
+    fire_after = client.get("/api/analytics/by-type/fire", headers={"If-None-Match": fire.headers["ETag"]})
+    assert fire_after.status_code == 200
+    assert analytics_cache.stats()["misses"] == misses + 1
+
+
+def test_compressed_response_has_its_own_etag(client):
+    url = "/api/analytics/top-rated?limit=50"
+    gzip = client.get(url, headers={"Accept-Encoding": "gzip"})
+    identity = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert gzip.headers["Content-Encoding"] == "gzip"
+    assert "Content-Encoding" not in identity.headers
+    assert gzip.headers["ETag"] == identity.headers["ETag"][:-1] + '-gzip"'
+
+    revalidated = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": gzip.headers["ETag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == gzip.headers["ETag"]
+    mismatched = client.get(url, headers={"Accept-Encoding": "identity", "If-None-Match": gzip.headers["ETag"]})
+    assert mismatched.status_code == 200
+
+
+def test_result_computed_across_an_invalidation_is_not_cached(client):
+    async def compute():
+        analytics_cache.invalidate(["type:fire"])  # a rating committed mid-computation
+        return {"stale": True}
+
+    asyncio.run(cached_body("race", ["type:fire"], compute))
+    assert analytics_cache.get("race") is None
+    asyncio.run(cached_body("race", ["type:fire"], lambda: asyncio.sleep(0, {"fresh": True})))
+    assert analytics_cache.get("race") is not None
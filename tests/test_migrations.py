@@ -0,0 +1,56 @@
+"""Alembic migrations: fresh databases, adopting create_all databases, and drift against the models."""
+import os
+
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import create_engine, inspect
+
+from app import migrate, models
+
+
+def sqlite_engine(directory: str):
+    return create_engine(f"sqlite:///{os.path.join(directory, 'schema.db')}")
+
+
+def schema_drift(engine) -> list:
+    with engine.connect() as connection:
+        return compare_metadata(MigrationContext.configure(connection), models.Base.metadata)
+
+
+def rating_indexes(engine) -> dict:
+    return {index["name"]: index["column_names"] for index in inspect(engine).get_indexes("ratings")}
+
+
+def test_upgrade_creates_schema_matching_models(temp_dir):
+    engine = sqlite_engine(temp_dir)
+    migrate.upgrade(engine)
+    assert migrate.current_revision(engine) == migrate.head_revision()
+    assert schema_drift(engine) == []
+    engine.dispose()
+
+
+def test_upgrade_adopts_create_all_database(temp_dir):
+    engine = sqlite_engine(temp_dir)
+    models.Base.metadata.create_all(bind=engine)
+    assert migrate.current_revision(engine) is None
+    migrate.upgrade(engine)
+    assert migrate.current_revision(engine) == migrate.head_revision()
+    assert schema_drift(engine) == []
+    engine.dispose()
+
+
+def test_rating_indexes_migration(temp_dir):
+    engine = sqlite_engine(temp_dir)
+    migrate.upgrade(engine, "0001")
+    assert "ix_ratings_rating" not in rating_indexes(engine)
+
+    migrate.upgrade(engine, "0002")
+    indexes = rating_indexes(engine)
+    assert indexes["ix_ratings_pokemon_rating"] == ["pokemon_id", "rating"]
+    assert indexes["ix_ratings_rating"] == ["rating"]
+    assert indexes["ix_ratings_user_rating"] == ["user_id", "rating", "pokemon_id"]
+    assert "ix_ratings_pokemon_id" not in indexes
+
+    migrate.downgrade(engine, "0001")
+    assert "ix_ratings_rating" not in rating_indexes(engine)
+    engine.dispose()
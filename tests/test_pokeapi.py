@@ -0,0 +1,68 @@
+"""PokeAPIService against the local stand-in from scripts/fake_pokeapi.py."""
+import asyncio
+import os
+
+import pytest
+
+from app.services.pokeapi import PokeAPIService, ResponseCache
+from scripts.fake_pokeapi import BackgroundServer, create_app
+
+NAMES = [f"pokemon-{i}" for i in range(40)]
+
+
+@pytest.fixture
+def stand_in():
+    app = create_app(latency=0.005)
+    with BackgroundServer(app) as server:
+        yield server, app.state.stats
+
+
+def lookup_all(service, names=NAMES):
+    async def run():
+        await service.start()
+        try:
+            return await asyncio.gather(*(service.get_pokemon_complete_data(name) for name in names))
+        finally:
+            await service.close()
+
+    return asyncio.run(run())
+
+
+def test_lookups_share_pooled_connections(stand_in):
+    server, stats = stand_in
+    service = PokeAPIService(base_url=server.url, max_connections=4, concurrency=4,
+                             cache=ResponseCache(max_size=200))
+    results = lookup_all(service)
+    assert all(results)
+    assert stats.requests == len(NAMES) * 2
+    assert service.requests_sent == len(NAMES) * 2
+    assert 1 <= len(stats.connections) <= 4
+
+
+def test_repeated_lookups_are_served_from_cache(stand_in):
+    server, stats = stand_in
+    service = PokeAPIService(base_url=server.url, cache=ResponseCache(max_size=200))
+    first = lookup_all(service)
+    second = lookup_all(service)
+    assert second == first
+    assert stats.requests == len(NAMES) * 2
+    assert service.cache.hits == len(NAMES) * 2
+    assert service.cache.misses == len(NAMES) * 2
+
+
+def test_cache_persists_across_restarts(stand_in, temp_dir):
+    server, stats = stand_in
+    path = os.path.join(temp_dir, "pokeapi.json")
+    lookup_all(PokeAPIService(base_url=server.url, cache=ResponseCache(path=path)))
+    assert os.path.exists(path)
+
+    restarted = PokeAPIService(base_url=server.url, cache=ResponseCache(path=path))
+    lookup_all(restarted)
+    assert restarted.requests_sent == 0
+    assert stats.requests == len(NAMES) * 2
+
+
+def test_missing_pokemon_is_none(stand_in):
+    server, _ = stand_in
+    service = PokeAPIService(base_url=server.url, cache=ResponseCache())
+    assert lookup_all(service, ["missingno"]) == [None]
@@ -0,0 +1,12 @@
+"""The hot rating queries use their intended indexes (cases from scripts/check_query_plans.py)."""
+import pytest
+
+from app.database import SessionLocal
+from scripts.check_query_plans import CASES, check_plan
+
+
+@pytest.mark.parametrize("label, call, required, forbidden", CASES, ids=[case[0] for case in CASES])
+def test_query_plan(seeded, label, call, required, forbidden):
+    with SessionLocal() as db:
+        plan, problems = check_plan(db, call, required, forbidden)
+    assert not problems, "\n".join([*problems, *plan])